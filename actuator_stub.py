@@ -0,0 +1,58 @@
+"""
+Stand-in for the ESP32 command handler, for testing the control buttons without the board.
+
+Subscribes to a device's command topic and answers each command on the
+ack topic with the same id after --delay seconds, like the firmware's
+onCommand(). With --drop, every command is ignored (to exercise timeouts).
+
+    python actuator_stub.py --host localhost --device esp32_001 --delay 0.02
+    curl -X POST http://127.0.0.1:8000/control/water/   (CSRF aside)
+    curl http://127.0.0.1:8000/api/control/stats/
+"""
+import argparse
+import json
+import time
+
+import paho.mqtt.client as mqtt
+
+from smartfarm.actuators import COMMANDS, DEFAULT_DEVICE, MQTT_HOST, MQTT_PORT, ack_topic, command_topic
+
+STATES = {"water": "pump_on", "light": "light_on", "light_off": "light_off"}
+
+
+def start(host, port, device_id, delay=0.0, drop=False):
+    """Connect and start answering in paho's background thread; returns the client (call loop_stop() to stop)."""
+    def on_connect(client, userdata, flags, reason_code, properties):
+        client.subscribe(command_topic(device_id), qos=1)
+
+    def on_message(client, userdata, msg):
+        cmd = json.loads(msg.payload)
+        if drop:
+            return
+        time.sleep(delay)
+        ack = {"id": cmd["id"], "ok": cmd.get("cmd") in COMMANDS, "state": STATES.get(cmd.get("cmd"))}
+        client.publish(ack_topic(device_id), json.dumps(ack))
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"actuator-stub-{device_id}")
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(host, port, keepalive=30)
+    client.loop_start()
+    return client
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ESP32 actuator command stub")
+    parser.add_argument("--host", default=MQTT_HOST)
+    parser.add_argument("--port", type=int, default=MQTT_PORT)
+    parser.add_argument("--device", default=DEFAULT_DEVICE)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each ack")
+    parser.add_argument("--drop", action="store_true", help="never ack")
+    args = parser.parse_args()
+    client = start(args.host, args.port, args.device, args.delay, args.drop)
+    print(f"actuator stub for {args.device} on {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        client.loop_stop()
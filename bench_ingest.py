@@ -0,0 +1,50 @@
+"""
+Micro-benchmark for the shared ingestion hot path.
+
+Measures normalize() alone, then Ingestor end to end (normalize + queue +
+batched SQLite/columnar writes) into a temporary directory.
+
+    python bench_ingest.py --rows 200000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from smartfarm.ingest import build_ingestor, normalize
+
+
+def make_readings(n):
+    http = {"temp_air": 23.4, "humidity": 55.0, "temp_water": 19.5,
+            "cds_raw": 1200, "light_pct": 30, "soil_raw": 2500, "soil_pct": 60}
+    mqtt = {"temp_air": 23.4, "humidity": 55.0, "temp_water": 19.5, "soil": 60, "cds1": 1200}
+    return [dict(random.choice((http, mqtt)), device_id=f"esp32_{i % 50:03d}") for i in range(n)]
+
+
+def bench(rows):
+    readings = make_readings(rows)
+
+    start = time.perf_counter()
+    bad = []
+    for r in readings:
+        normalize(r, 0, bad)
+    elapsed = time.perf_counter() - start
+    print(f"normalize     : {rows / elapsed:,.0f} readings/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestor = build_ingestor(db_file=os.path.join(tmp, "farm.db"), store_dir=os.path.join(tmp, "store"),
+                                  max_rows=1000)
+        start = time.perf_counter()
+        for i in range(0, rows, 100):
+            ingestor.ingest_many(readings[i:i + 100], source="bench")
+        ingestor.close()
+        elapsed = time.perf_counter() - start
+        print(f"ingest+store  : {rows / elapsed:,.0f} readings/s")
+        print(f"stats         : {ingestor.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Farm ingestion benchmark")
+    parser.add_argument("--rows", type=int, default=200000)
+    bench(parser.parse_args().rows)
@@ -0,0 +1,55 @@
+"""
+Startup cost of a Django worker: time to set up Django and import every view, and the RSS after it.
+
+Each run is a fresh interpreter (like a new worker process). Prints the
+median time and RSS over the runs and which heavy modules got imported.
+
+    python bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, os, resource, sys, time
+t = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns  # urls.py와 모든 view 모듈 import
+elapsed = time.perf_counter() - t
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+    "heavy": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+HEAVY = ("cv2", "openai", "matplotlib", "numpy", "httpx", "pydantic")
+
+
+def run_once(cwd):
+    code = f"HEAVY = {HEAVY!r}\n" + CHILD
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise SystemExit(f"worker failed to start:\n{out.stderr.strip()}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Farm Django worker startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cwd", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+
+    results = [run_once(args.cwd) for _ in range(args.runs)]
+    seconds = statistics.median(r["seconds"] for r in results)
+    rss_mb = statistics.median(r["rss_kb"] for r in results) / 1024
+    print(f"startup {seconds * 1000:.0f} ms, RSS {rss_mb:.1f} MB, {results[-1]['modules']} modules "
+          f"(median of {args.runs})")
+    print(f"heavy modules loaded at startup: {', '.join(results[-1]['heavy']) or 'none'}")
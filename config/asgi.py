@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to /api/stream (server-sent events, see smartfarm.push) are
+answered here directly; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from smartfarm import push  # noqa: E402  (Django 설정이 끝난 뒤에 import)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == push.STREAM_PATH:
+        await push.stream(scope, receive, send, push.broadcaster)
+        return
+    await django_application(scope, receive, send)
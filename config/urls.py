@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from smartfarm.views import control, home, video_feed
-from smartfarm.views import current_plant, plant_report, tips, plant_counseling
+from smartfarm.views import control, control_stats, home, video_feed
+from smartfarm.views import current_plant, plant_report, tips, plant_counseling, counseling_job, counseling_stream
+from smartfarm.views import counseling_cache_stats
+from smartfarm.views import alert_list, chart, current, devices, sensor_export, sensor_readings, sensor_series
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -28,10 +30,23 @@ urlpatterns = [
     path('plant_report/', plant_report, name='plant_report'),
     path('tips/', tips, name='tips'),
     path('plant_counseling/', plant_counseling, name='plant_counseling'),
+    path('plant_counseling/jobs/<str:job_id>/', counseling_job, name='counseling_job'),
+    path('plant_counseling/jobs/<str:job_id>/stream/', counseling_stream, name='counseling_stream'),
+    path('plant_counseling/cache/', counseling_cache_stats, name='counseling_cache_stats'),
 
     # 카메라 스트림
     path("video_feed/", video_feed, name="video_feed"),
 
     # 제어 버튼
     path("control/<str:cmd>/", control, name="control"),
+    path("api/control/stats/", control_stats, name="control_stats"),
+
+    # 센서 데이터 API (JSON)
+    path("api/current", current, name="current"),
+    path("api/readings/", sensor_readings, name="sensor_readings"),
+    path("api/readings/export/", sensor_export, name="sensor_export"),
+    path("api/series/", sensor_series, name="sensor_series"),
+    path("api/chart/", chart, name="chart"),
+    path("api/alerts/", alert_list, name="alerts"),
+    path("api/devices/", devices, name="devices"),
 ]
@@ -1,12 +1,14 @@
-import sqlite3
 import paho.mqtt.client as mqtt
 import json
-from datetime import datetime
 import sys
 import traceback
 
+from smartfarm import alerts, rules, sensor_db, watchdog
+from smartfarm.actuators import CommandChannel
+from smartfarm.ingest import ValidationError, build_ingestor
+
 # ===================== CONFIGURATION ===================== #
-DB_FILE = "farm_data.db"
+DB_FILE = sensor_db.DB_FILE
 
 MQTT_BROKER_HOST = "localhost"      # Change this to your MQTT broker IP if needed
 MQTT_BROKER_PORT = 1883
@@ -16,33 +18,19 @@ MQTT_TOPIC = "farm/sensor/data"
 ENABLE_MQTT_LOG = False
 # ========================================================= #
 
+ingestor = None
+
 
 def init_db():
-    """Initialize the SQLite database and create table if it does not exist."""
+    """Initialize the SQLite database and the shared ingestion pipeline."""
+    global ingestor
     print("[INFO] Initializing SQLite database...")
     print(f"[INFO] Database file path: {DB_FILE}")
 
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        print("[INFO] Creating table 'sensor_logs' if it does not exist...")
-        cursor.execute(
-            '''
-            CREATE TABLE IF NOT EXISTS sensor_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME,
-                temp_air REAL,
-                humidity REAL,
-                temp_water REAL,
-                soil_moisture INTEGER,
-                cds1 INTEGER
-            )
-            '''
-        )
-
-        conn.commit()
-        conn.close()
+        print("[INFO] Creating rollup tables and migrating 'sensor_logs' into day partitions if needed...")
+        sensor_db.init_db(DB_FILE)
+        ingestor = build_ingestor(spool="mqtt", db_file=DB_FILE)
         print("[INFO] Database initialization completed successfully.")
     except Exception as e:
         print("[ERROR] Failed to initialize database.")
@@ -53,37 +41,22 @@ def init_db():
 
 
 def save_to_db(data_dict):
-    """Save one row of sensor data into the database with detailed debug output."""
-    print("[INFO] Preparing to save data into database...")
-    print(f"[DEBUG] Data dict received for DB insert: {data_dict}")
+    """
+    Hand one reading to the shared ingestion core.
+
+    The reading is appended to the on-disk spool before this returns; a
+    background replayer inserts it into sensor_logs and retries while the
+    database is locked, so a stall no longer drops data.
+    """
+    print(f"[DEBUG] Data dict received for ingestion: {data_dict}")
 
     try:
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        sql = '''
-            INSERT INTO sensor_logs (timestamp, temp_air, humidity, temp_water, soil_moisture, cds1)
-            VALUES (?, ?, ?, ?, ?, ?)
-        '''
-
-        temp_air = data_dict.get("temp_air")
-        humidity = data_dict.get("humidity")
-        temp_water = data_dict.get("temp_water")
-        soil = data_dict.get("soil")
-        cds1 = data_dict.get("cds1")
-
-        print(f"[DEBUG] Insert values -> timestamp: {current_time}, "
-              f"temp_air: {temp_air}, humidity: {humidity}, "
-              f"temp_water: {temp_water}, soil_moisture: {soil}, cds1: {cds1}")
-
-        cursor.execute(sql, (current_time, temp_air, humidity, temp_water, soil, cds1))
-        conn.commit()
-        conn.close()
-
-        print(f"[INFO] Successfully saved one row into database at {current_time}.")
+        row = ingestor.ingest(data_dict, source="mqtt")
+        print(f"[INFO] Queued one row for database: {row}")
+    except ValidationError as e:
+        print(f"[WARN] Rejected reading: {e}")
     except Exception as e:
-        print("[ERROR] Failed to save data into database.")
+        print("[ERROR] Failed to queue data for database.")
         print(f"[ERROR] Exception type: {type(e).__name__}")
         print(f"[ERROR] Exception message: {e}")
         traceback.print_exc()
@@ -123,12 +96,6 @@ def on_message(client, userdata, msg):
         data = json.loads(payload_str)
         print(f"[DEBUG] Parsed JSON data: {data}")
 
-        # Optional: check for expected keys
-        expected_keys = ["temp_air", "humidity", "temp_water", "soil", "cds1"]
-        for key in expected_keys:
-            if key not in data:
-                print(f"[WARN] Key '{key}' is missing in the received JSON data.")
-
         save_to_db(data)
 
     except UnicodeDecodeError as e:
@@ -178,6 +145,23 @@ def main():
     # 1. Initialize DB
     init_db()
 
+    # Automatic watering / lighting rules; their commands go straight to the device over MQTT
+    # The command channel is a second MQTT connection, so it is only opened when the rules run
+    dispatcher = None
+    if rules.ENABLED:
+        dispatcher = rules.MqttDispatcher(CommandChannel(MQTT_BROKER_HOST, MQTT_BROKER_PORT))
+        rules.attach(ingestor, dispatcher)
+        print("[INFO] Rule engine attached (set SMARTFARM_RULES=0 to disable automatic control).")
+    else:
+        print("[INFO] Automatic control is disabled (SMARTFARM_RULES=0).")
+
+    # Alarms / anomaly detection; notifications are delivered by send_alerts.py
+    detector = alerts.attach(ingestor)
+    print(f"[INFO] Alert detector attached (alerts in {alerts.ALERTS_DB}).")
+
+    # Stale-device watchdog: flags devices that stop publishing
+    device_watchdog = watchdog.attach(ingestor, "mqtt", detector.store)
+
     # 2. Set up MQTT client
     print("[INFO] Creating MQTT client instance...")
     client = mqtt.Client()
@@ -209,6 +193,7 @@ def main():
         print("       2) The host and port are correct.")
         print("       3) The network connection is stable.")
         traceback.print_exc()
+        shutdown(device_watchdog, dispatcher)
         sys.exit(1)
 
     # 4. Start network loop
@@ -231,8 +216,19 @@ def main():
         except Exception as e:
             print("[WARN] Error while disconnecting MQTT client.")
             print(f"[WARN] Exception: {e}")
+        shutdown(device_watchdog, dispatcher)
         print("[INFO] Program has been stopped. Goodbye!")
 
 
+def shutdown(device_watchdog, dispatcher):
+    """Flush the ingestor, then stop the watchdog and the rule command channel (if the rules ran)."""
+    if ingestor is not None:
+        print("[INFO] Flushing pending rows to the database...")
+        ingestor.close()
+    device_watchdog.close()
+    if dispatcher is not None:
+        dispatcher.close()
+
+
 if __name__ == "__main__":
     main()
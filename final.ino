@@ -6,6 +6,8 @@
 #include <OneWire.h>
 #include <DallasTemperature.h>
 #include <ArduinoJson.h>
+#include <Preferences.h>
+#include <time.h>
 #include <stdarg.h>
 
 // ======================= DEBUG SETTINGS ==========================
@@ -36,6 +38,11 @@ const char* ssid = "you";
 const char* password = "12345678990";
 const char* SERVER_URL = "http://192.168.182.174:5000/log";
 
+// -------------------- TIME (NTP) --------------------
+// 서버가 측정 시각을 기기 시계 기준으로 저장하도록 NTP로 시간을 맞춤
+const char* NTP_SERVER = "pool.ntp.org";
+#define GMT_OFFSET_SEC (9 * 3600)
+
 // -------------------- OBJECTS --------------------
 LiquidCrystal_I2C lcd(0x27, 16, 2);
 DHT dht(DHT_PIN, DHT22);
@@ -46,6 +53,19 @@ DallasTemperature sensors(&oneWire);
 unsigned long lastSend = 0;
 #define SEND_INTERVAL 3000
 
+// -------------------- PUMP --------------------
+// 서버 자동 제어 규칙이 /log 응답의 "commands"로 물주기 명령을 보냄
+#define WATER_MS 3000              // 물주기 명령 한 번에 펌프를 켜는 시간 (서버 rules.WATER_PULSE_MS)
+unsigned long pumpUntil = 0;       // 펌프를 끌 시각 (0이면 꺼져 있음)
+
+// -------------------- SEQUENCE --------------------
+// seq = (부팅 횟수 << 32) | 부팅 후 전송 번호  -> 재부팅해도 단조 증가
+// 서버는 (device_id, seq)로 재전송 중복을 걸러냄
+Preferences prefs;
+String deviceId;
+uint32_t bootCount = 0;
+uint32_t sendCount = 0;
+
 // ======================= WIFI ==========================
 void connectWiFi() {
   WiFi.mode(WIFI_STA);
@@ -81,13 +101,45 @@ void setup() {
   sensors.begin();
 
   pinMode(PUMP_PIN, OUTPUT);
+  digitalWrite(PUMP_PIN, LOW);
   pinMode(SOIL_PIN, INPUT);
 
+  prefs.begin("smartfarm", false);
+  bootCount = prefs.getUInt("boot", 0) + 1;
+  prefs.putUInt("boot", bootCount);
+
   connectWiFi();
+
+  deviceId = "esp32_" + WiFi.macAddress();
+  deviceId.replace(":", "");
+  configTime(GMT_OFFSET_SEC, 0, NTP_SERVER);
+}
+
+// ======================= COMMANDS ==========================
+void handleCommands(const String& body) {
+  StaticJsonDocument<512> resp;
+  if (deserializeJson(resp, body)) return;
+
+  for (JsonObject cmd : resp["commands"].as<JsonArray>()) {
+    const char* name = cmd["cmd"] | "";
+    debugPrintf("[CMD] %s (%s)\n", name, (const char*)(cmd["rule"] | ""));
+    if (strcmp(name, "water") == 0) {
+      digitalWrite(PUMP_PIN, HIGH);
+      pumpUntil = millis() + WATER_MS;
+    }
+    // 이 보드에는 식물등이 없으므로 light / light_off 는 무시
+  }
 }
 
 // ======================= LOOP ==========================
 void loop() {
+  // 물주기 시간이 끝나면 펌프 끔 (delay 없이 loop마다 확인)
+  if (pumpUntil != 0 && (long)(millis() - pumpUntil) >= 0) {
+    pumpUntil = 0;
+    digitalWrite(PUMP_PIN, LOW);
+    debugPrintf("[PUMP] off\n");
+  }
+
   if (millis() - lastSend >= SEND_INTERVAL || lastSend == 0) {
     lastSend = millis();
 
@@ -128,22 +180,32 @@ void loop() {
       http.begin(SERVER_URL);
       http.addHeader("Content-Type", "application/json");
 
-      StaticJsonDocument<256> doc;
-      doc["temp_air"]   = isnan(temp_air) ? 0 : temp_air;
-      doc["humidity"]   = isnan(hum) ? 0 : hum;
-      doc["temp_water"] = (temp_water == -127) ? 0 : temp_water;
+      StaticJsonDocument<384> doc;
+      doc["device_id"]  = deviceId;
+      doc["seq"]        = ((uint64_t)bootCount << 32) | sendCount++;
+      time_t now = time(nullptr);
+      if (now > 1600000000) {           // NTP 동기화 전에는 생략 -> 서버 수신 시각 사용
+        doc["ts"] = (long long)now;
+      }
+      // 읽기 실패한 값은 보내지 않음 (0을 보내면 실제 0도/0%와 구분할 수 없음)
+      if (!isnan(temp_air))    doc["temp_air"]   = temp_air;
+      if (!isnan(hum))         doc["humidity"]   = hum;
+      if (temp_water != -127)  doc["temp_water"] = temp_water;
       doc["cds_raw"]    = cds_raw;
       doc["light_pct"]  = light_pct;
       doc["soil_raw"]   = soil_raw;
       doc["soil_pct"]   = soil_pct;
 
-      char buffer[256];
+      char buffer[384];
       serializeJson(doc, buffer);
 
       debugPrintf("[HTTP] POST %s\n", buffer);
 
       int code = http.POST(buffer);
       debugPrintf("[HTTP] Response code=%d\n", code);
+      if (code == 200) {
+        handleCommands(http.getString());
+      }
 
       lcd.setCursor(15,1);
       lcd.print(code == 200 ? "." : "x");
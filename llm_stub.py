@@ -0,0 +1,127 @@
+"""
+Local stand-in for the OpenAI Responses API, for testing the counseling page without a key or network.
+
+Answers POST /v1/responses after a configurable delay with a canned
+reply, so queueing, timeouts and concurrency limits can be exercised.
+With "stream": true the reply is sent as response.output_text.delta
+events, one small chunk every --token-delay seconds after the first.
+
+    python llm_stub.py --port 8765 --delay 3 --token-delay 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python manage.py runserver
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "흙이 계속 축축하다면 물을 너무 자주 주고 있을 가능성이 커요. "
+    "겉흙이 2~3cm 정도 마른 뒤에 흠뻑 주고, 받침에 고인 물은 바로 버려 주세요."
+)
+CHUNK_CHARS = 4  # 스트리밍 때 조각 하나의 글자 수 (토큰 대신)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 1.0
+    token_delay = 0.02
+    calls = 0
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        cls = type(self)
+        with cls.lock:
+            cls.calls += 1
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+        if self.path.rstrip("/") != "/v1/responses":
+            self.send_error(404)
+            return
+        if request.get("stream"):
+            self.stream(request.get("model", "stub"), REPLY)
+            return
+        body = json.dumps(response_body(request.get("model", "stub"), REPLY)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self, model, text):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        done = response_body(model, text)
+        item_id = done["output"][0]["id"]
+        events = [{"type": "response.created", "response": dict(done, status="in_progress", output=[])}]
+        for i in range(0, len(text), CHUNK_CHARS):
+            events.append({"type": "response.output_text.delta", "item_id": item_id, "output_index": 0,
+                           "content_index": 0, "delta": text[i:i + CHUNK_CHARS], "logprobs": []})
+        events.append({"type": "response.completed", "response": done})
+        for n, event in enumerate(events):
+            if event["type"] == "response.output_text.delta" and n > 1:
+                time.sleep(self.token_delay)
+            event["sequence_number"] = n
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def response_body(model, text):
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+def serve(port, delay, token_delay=0.02):
+    """Start the stub in a background thread; returns the server (call shutdown() to stop)."""
+    StubHandler.delay = delay
+    StubHandler.token_delay = token_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI Responses API stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds before each reply")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    args = parser.parse_args()
+    server = serve(args.port, args.delay, args.token_delay)
+    print(f"LLM stub on http://127.0.0.1:{args.port}/v1 (delay {args.delay}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,175 @@
+"""
+Load test for the /log ingest contract.
+
+Opens N keep-alive connections (one per simulated ESP32) and has each of
+them POST readings back to back for a fixed duration, then prints
+requests/s, readings/s and latency percentiles. A server that closes the
+connection after each response (Flask's built-in server) is reconnected
+to, inside the measured latency. --batch N posts arrays of N readings
+(for /log/batch).
+
+    python loadtest_ingest.py --url http://127.0.0.1:5000/log --clients 1000 --duration 10
+
+With --server the script also starts the server under test: it runs
+that file with python in a fresh temporary working directory (so every
+run starts from empty stores), waits for the port, and stops it after
+the run. Comparing two revisions of a server is then
+
+    git show <rev>:server_final.py > /tmp/before_server_final.py
+    python loadtest_ingest.py --server /tmp/before_server_final.py --clients 50
+    python loadtest_ingest.py --server server_final.py --clients 50
+    python loadtest_ingest.py --server server_final.py --url http://127.0.0.1:5000/log/batch --batch 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+SERVER_START_TIMEOUT = 30.0
+
+
+def make_reading(node):
+    return {
+        "device_id": f"esp32_{node:04d}",
+        "temp_air": round(random.uniform(18, 30), 1),
+        "humidity": round(random.uniform(30, 80), 1),
+        "temp_water": round(random.uniform(15, 25), 1),
+        "cds_raw": random.randint(0, 4095),
+        "light_pct": random.randint(0, 99),
+        "soil_raw": random.randint(1500, 4095),
+        "soil_pct": random.randint(0, 100),
+    }
+
+
+async def client(node, host, port, path, batch, deadline, latencies, errors):
+    r = w = None
+    try:
+        while time.perf_counter() < deadline:
+            reading = [make_reading(node) for _ in range(batch)] if batch else make_reading(node)
+            body = json.dumps(reading).encode()
+            req = (
+                f"POST {path} HTTP/1.1\r\n"
+                f"Host: {host}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode() + body
+
+            start = time.perf_counter()
+            if w is None:
+                try:
+                    r, w = await asyncio.open_connection(host, port)
+                except OSError:
+                    errors.append("connect")
+                    return
+            w.write(req)
+            await w.drain()
+            head = await r.readuntil(b"\r\n\r\n")
+            length, close = 0, head.startswith(b"HTTP/1.0")
+            for line in head.split(b"\r\n"):
+                name, _, value = line.partition(b":")
+                if name.lower() == b"content-length":
+                    length = int(value)
+                elif name.lower() == b"connection":
+                    close = value.strip().lower() == b"close"
+            await r.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+
+            if head.split(b" ", 2)[1] != b"200":
+                errors.append(head.split(b"\r\n", 1)[0].decode())
+            if close:
+                w.close()
+                r = w = None
+    except (OSError, asyncio.IncompleteReadError) as e:
+        errors.append(type(e).__name__)
+    finally:
+        if w is not None:
+            w.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def run(url, clients, duration, batch=0):
+    u = urlparse(url)
+    host, port, path = u.hostname, u.port or 80, u.path or "/log"
+    latencies, errors = [], []
+
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i, host, port, path, batch, deadline, latencies, errors) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    lat = sorted(latencies)
+    print(f"clients     : {clients}")
+    print(f"duration    : {elapsed:.1f} s")
+    print(f"requests    : {len(lat)}  (errors: {len(errors)})")
+    print(f"requests/s  : {len(lat) / elapsed:.0f}")
+    print(f"readings/s  : {len(lat) * max(batch, 1) / elapsed:.0f}")
+    print(f"latency p50 : {percentile(lat, 50) * 1000:.1f} ms")
+    print(f"latency p99 : {percentile(lat, 99) * 1000:.1f} ms")
+    print(f"latency max : {(lat[-1] if lat else 0) * 1000:.1f} ms")
+
+
+def start_server(script, host, port, workdir):
+    """Run `python script` in workdir and wait until it accepts connections on (host, port)."""
+    env = dict(os.environ, SMARTFARM_LOG_LEVEL=os.getenv("SMARTFARM_LOG_LEVEL", "WARNING"))
+    # 저장소 밖에 꺼내 둔 예전 버전 스크립트도 smartfarm 패키지를 import 할 수 있도록
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [repo, env.get("PYTHONPATH")]))
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    # 자체 프로세스 그룹으로 실행 (Flask debug 리로더의 자식 프로세스까지 함께 종료)
+    proc = subprocess.Popen([sys.executable, os.path.abspath(script)], cwd=workdir, env=env,
+                            stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{script} exited with {proc.returncode}, see {log.name}")
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError(f"{script} did not listen on {host}:{port} within {SERVER_START_TIMEOUT:.0f} s")
+
+
+def stop_server(proc):
+    os.killpg(proc.pid, signal.SIGTERM)
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Farm ingest load test")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/log")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch", type=int, default=0, help="post arrays of this many readings (/log/batch)")
+    parser.add_argument("--server", help="start this server script in a temporary directory for the run")
+    args = parser.parse_args()
+
+    if not args.server:
+        asyncio.run(run(args.url, args.clients, args.duration, args.batch))
+    else:
+        u = urlparse(args.url)
+        with tempfile.TemporaryDirectory(prefix="loadtest_") as workdir:
+            server = start_server(args.server, u.hostname, u.port or 80, workdir)
+            try:
+                asyncio.run(run(args.url, args.clients, args.duration, args.batch))
+            finally:
+                stop_server(server)
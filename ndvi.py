@@ -2,13 +2,17 @@ import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 from fastiecm import fastiecm 
+from datetime import datetime
 import time
 import os
-import csv
+from smartfarm.ndvi_store import NdviStore, import_csv, summarize
 
 # --- 설정 구간 ---
 CAPTURE_INTERVAL = 30  
-CSV_FILENAME = "ndvi_log.csv"
+NDVI_DB = "ndvi.db"
+CAMERA_ID = "default"
+LEGACY_CSV = "ndvi_log.csv"   # 예전 기록 (처음 한 번만 DB로 옮김)
+TREND_HOURS = 24              # 추세 그래프에 그릴 기간
 SAVE_FOLDER = "ndvi_graph" 
 
 ICON_SIZE = (500, 500)
@@ -38,10 +42,10 @@ def load_images(paths):
 
 status_images = load_images(IMG_PATHS)
 
-if not os.path.exists(CSV_FILENAME):
-    with open(CSV_FILENAME, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Time', 'Average', 'Median'])
+store = NdviStore(NDVI_DB)
+if os.path.exists(LEGACY_CSV) and store.latest(CAMERA_ID) is None:
+    count = import_csv(LEGACY_CSV, store, CAMERA_ID)
+    print(f"{LEGACY_CSV}에서 {count}개 기록을 {NDVI_DB}로 옮겼습니다.")
 
 if not os.path.exists(SAVE_FOLDER):
     os.makedirs(SAVE_FOLDER) 
@@ -66,21 +70,16 @@ def calc_ndvi(image):
     ndvi = (b.astype(float) - r) / bottom
     return ndvi
 
-def save_summary_graph_from_csv(csv_path, graph_path, current_timestamp):
-    times = []
-    avgs = []
+def save_summary_graph(store, graph_path, current_timestamp, end_ms, camera_id=CAMERA_ID):
+    # 최근 TREND_HOURS 시간의 샘플만 범위 조회
+    samples = store.range(end_ms - TREND_HOURS * 3600 * 1000, end_ms + 1, camera_id)
+    times = [datetime.fromtimestamp(s["ts_ms"] / 1000) for s in samples]
+    avgs = [s["mean"] for s in samples]
     try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader)
-            for row in reader:
-                if not row: continue
-                times.append(row[0])
-                avgs.append(float(row[1]))
-
         if len(times) > 0:
             plt.figure(figsize=(10, 6)) 
             plt.plot(times, avgs, marker='o', color='red', label='Average', linewidth=2)
+            plt.gcf().autofmt_xdate()
             plt.title(f"NDVI Trend - {current_timestamp}")
             plt.tight_layout()
             plt.savefig(graph_path)
@@ -115,10 +114,8 @@ try:
         color_mapped_prep = ndvi_contrasted.astype(np.uint8)
         color_mapped_image = cv2.applyColorMap(color_mapped_prep, fastiecm)
 
-        # 평균값 계산
-        normalized_data = color_mapped_prep / 255.0
-        curr_avg = np.mean(normalized_data)
-        curr_mid = np.median(normalized_data)
+        # 평균값/중앙값/히스토그램 계산 (0~255 -> 0~1)
+        curr_avg, curr_mid, curr_hist = summarize(color_mapped_prep)
 
         img_key = ""
         if curr_avg < 0.1: 
@@ -149,13 +146,12 @@ try:
         if current_time - last_capture_time >= CAPTURE_INTERVAL:
             time_str = time.strftime("%H:%M:%S")
             file_timestamp = time.strftime("%Y%m%d_%H%M%S")
+            ts_ms = int(current_time * 1000)
             
-            with open(CSV_FILENAME, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([time_str, curr_avg, curr_mid])
+            store.add(ts_ms, curr_avg, curr_mid, curr_hist, camera_id=CAMERA_ID)
             
             graph_output_path = os.path.join(SAVE_FOLDER, f"trend_{file_timestamp}.png")
-            save_summary_graph_from_csv(CSV_FILENAME, graph_output_path, time_str)
+            save_summary_graph(store, graph_output_path, time_str, ts_ms)
             print(f"[Saved] {time_str}")
             last_capture_time = current_time
 
@@ -168,3 +164,4 @@ try:
 finally:
     cap.release()
     cv2.destroyAllWindows()
+    store.close()
@@ -0,0 +1,58 @@
+"""
+Replay the automatic control rules (smartfarm.rules) over stored sensor history.
+
+Runs a fresh RuleEngine over the readings in the range, in time order,
+and prints every command it would have issued, then a count per device,
+rule and command. Nothing is sent to any device.
+
+    python replay_rules.py --hours 48
+    python replay_rules.py --start 2026-10-01 --end 2026-10-08 --device esp32_001 --quiet
+"""
+import argparse
+import time
+from collections import Counter
+from datetime import datetime
+
+from smartfarm import rules, sensor_db
+
+
+def parse_time_ms(text):
+    return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def fmt_ms(ts_ms):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts_ms / 1000))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay Smart Farm control rules over stored readings")
+    parser.add_argument("--db", default=sensor_db.DB_FILE)
+    parser.add_argument("--start", help="ISO date/time (default: --hours before --end)")
+    parser.add_argument("--end", help="ISO date/time (default: now)")
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--device")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+
+    end_ms = parse_time_ms(args.end) if args.end else int(time.time() * 1000)
+    start_ms = parse_time_ms(args.start) if args.start else end_ms - int(args.hours * 3600 * 1000)
+
+    store = sensor_db.PartitionedStore(args.db)
+    engine = rules.RuleEngine()
+    summary = Counter()
+    readings = 0
+    started = time.perf_counter()
+    for row in rules.stored_rows(store, start_ms, end_ms, args.device):
+        readings += 1
+        for command in engine.evaluate(row):
+            summary[(command["device_id"], command["rule"], command["cmd"])] += 1
+            if not args.quiet:
+                print(f"{fmt_ms(command['ts_ms'])}  {command['device_id']:<20} {command['rule']:<10} "
+                      f"{command['cmd']:<10} {command['field']}={command['value']}")
+    elapsed = time.perf_counter() - started
+    store.close()
+
+    print(f"{readings} readings from {fmt_ms(start_ms)} to {fmt_ms(end_ms)} "
+          f"replayed in {elapsed:.2f}s, {sum(summary.values())} commands")
+    for (device, rule, cmd), n in sorted(summary.items()):
+        print(f"  {device:<20} {rule:<10} {cmd:<10} {n}")
@@ -0,0 +1,87 @@
+"""
+Deliver pending alert notifications from the outbox in alerts.db (smartfarm.alerts).
+
+Each alert is POSTed as JSON to ALERT_WEBHOOK_URL (a chat or push
+service webhook) or, without one, printed. Delivered entries are marked
+sent; failed ones are retried later with backoff.
+
+    ALERT_WEBHOOK_URL=https://example.com/hook python send_alerts.py
+    python send_alerts.py --once
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+
+from smartfarm.alerts import ALERTS_DB, AlertStore
+
+WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+POLL_INTERVAL = 5.0
+SEND_TIMEOUT = 10.0
+BATCH = 20
+
+logging.basicConfig(
+    level=os.getenv("SMARTFARM_LOG_LEVEL", "INFO"),
+    format='[%(asctime)s] [%(levelname)s] %(message)s'
+)
+log = logging.getLogger("SmartFarm")
+
+
+def deliver(alert, url=WEBHOOK_URL):
+    payload = {k: alert[k] for k in ("id", "ts_ms", "device_id", "field", "kind", "value", "message")}
+    if not url:
+        print(f"[ALERT] {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert['ts_ms'] / 1000))} "
+              f"{alert['message']}")
+        return
+    req = urllib.request.Request(url, data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=SEND_TIMEOUT) as resp:
+        resp.read()
+
+
+def drain(store, url=WEBHOOK_URL):
+    """Send every due outbox entry once; returns (sent, failed)."""
+    sent = failed = 0
+    while True:
+        batch = store.pending(BATCH)
+        if not batch:
+            return sent, failed
+        ok, bad = [], []
+        for alert in batch:
+            try:
+                deliver(alert, url)
+                ok.append(alert["outbox_id"])
+            except (OSError, urllib.error.URLError) as e:
+                log.warning(f"[ALERTS] delivery of alert {alert['id']} failed (attempt {alert['attempts'] + 1}): {e}")
+                bad.append(alert["outbox_id"])
+        store.mark_sent(ok)
+        store.mark_failed(bad)
+        sent += len(ok)
+        failed += len(bad)
+        if bad:
+            return sent, failed  # 실패한 항목은 backoff 뒤에 다시 (이번에는 더 보내지 않음)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Farm alert notification sender")
+    parser.add_argument("--db", default=ALERTS_DB)
+    parser.add_argument("--once", action="store_true", help="send what is due and exit")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args()
+
+    store = AlertStore(args.db)
+    try:
+        while True:
+            sent, failed = drain(store)
+            if sent or failed:
+                log.info(f"[ALERTS] sent {sent}, failed {failed}")
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
@@ -0,0 +1,214 @@
+"""
+Asyncio HTTP ingest server for many ESP32 nodes.
+
+Same contract as server_final.py (POST /log with one JSON reading,
+POST /log/batch with a list), but every connection is a lightweight
+coroutine with HTTP/1.1 keep-alive. Each request is handed to the
+shared ingestion core on a small thread pool, so the event loop never
+runs the spool append or the listeners (rules, alerts.db, watchdog
+snapshot) and keeps accepting and parsing other requests meanwhile; the
+background writer then does the database work.
+
+    python server_async.py
+    python loadtest_ingest.py --clients 1000   # in another terminal
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from smartfarm import alerts, rules, watchdog
+from smartfarm.ingest import ValidationError, build_ingestor
+
+HOST = "0.0.0.0"
+PORT = 5000
+
+FLUSH_MAX_ROWS = 500
+FLUSH_INTERVAL = 1.0
+
+# ingest(spool 기록 + 리스너)를 실행하는 스레드 수 (이벤트 루프 밖에서 실행)
+INGEST_THREADS = 8
+
+MAX_BATCH_SIZE = 1000
+MAX_BODY_BYTES = 256 * 1024
+# 아무 요청 없이 이 시간(초)이 지나면 keep-alive 연결을 닫음
+KEEPALIVE_TIMEOUT = 75
+
+logging.basicConfig(
+    level=os.getenv("SMARTFARM_LOG_LEVEL", "INFO"),
+    format='[%(asctime)s] [%(levelname)s] %(message)s'
+)
+log = logging.getLogger("SmartFarm")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+def parse_json(body):
+    try:
+        return json.loads(body)
+    except (UnicodeDecodeError, ValueError):
+        raise HttpError(400, "json_parse")
+
+
+def with_commands(payload, commands, rows):
+    """Add the rule engine's commands waiting for the devices in `rows` (smartfarm.rules.PendingCommands)."""
+    pending = commands.take(r["device_id"] for r in rows) if commands is not None else None
+    if pending:
+        payload["commands"] = pending
+    return payload
+
+
+def handle_log(ingestor, body, commands=None):
+    try:
+        row = ingestor.ingest(parse_json(body), source="http")
+    except ValidationError:
+        raise HttpError(400, "not_an_object")
+    return with_commands({"status": "ok"}, commands, [row] if row else [])
+
+
+def handle_batch(ingestor, body, commands=None):
+    data = parse_json(body)
+    readings = data.get("readings") if isinstance(data, dict) else data
+    if not isinstance(readings, list):
+        raise HttpError(400, "not_a_list")
+    if len(readings) > MAX_BATCH_SIZE:
+        raise HttpError(413, "batch_too_large")
+    try:
+        rows = ingestor.ingest_many(readings, source="http")
+    except ValidationError:
+        raise HttpError(400, "not_an_object")
+    return with_commands({"status": "ok", "count": len(rows)}, commands, rows)
+
+
+ROUTES = {
+    "/log": handle_log,
+    "/log/batch": handle_batch,
+}
+
+
+class IngestServer:
+    def __init__(self, ingestor, commands=None, threads=INGEST_THREADS):
+        self.ingestor = ingestor
+        self.commands = commands
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ingest")
+
+    def respond(self, w, status, payload, keep_alive):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        w.write(head.encode("latin-1") + body)
+
+    async def read_request(self, r):
+        """Return (method, path, headers, body) or None when the peer closed."""
+        try:
+            raw = await asyncio.wait_for(r.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(400, "header_too_large")
+
+        lines = raw.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "bad_request_line")
+
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        headers[":version"] = version
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "bad_content_length")
+        if length < 0:
+            raise HttpError(400, "bad_content_length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "body_too_large")
+        body = await r.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], headers, body
+
+    async def handle_connection(self, r, w):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    req = await self.read_request(r)
+                except HttpError as e:
+                    self.respond(w, e.status, {"status": "error", "reason": e.reason}, False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if req is None:
+                    break
+
+                method, path, headers, body = req
+                conn = headers.get("connection", "").lower()
+                keep_alive = conn != "close" and (headers[":version"] == "HTTP/1.1" or conn == "keep-alive")
+
+                handler = ROUTES.get(path)
+                if handler is None:
+                    self.respond(w, 404, {"status": "error", "reason": "not_found"}, keep_alive)
+                elif method != "POST":
+                    self.respond(w, 405, {"status": "error", "reason": "method_not_allowed"}, keep_alive)
+                else:
+                    try:
+                        payload = await loop.run_in_executor(self.executor, handler, self.ingestor, body,
+                                                             self.commands)
+                        self.respond(w, 200, payload, keep_alive)
+                    except HttpError as e:
+                        self.respond(w, e.status, {"status": "error", "reason": e.reason}, keep_alive)
+                    except Exception:
+                        log.exception("Unexpected error while handling request")
+                        self.respond(w, 500, {"status": "error", "reason": "internal"}, False)
+                        break
+
+                await w.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            w.close()
+
+
+async def serve(host=HOST, port=PORT, ingestor=None):
+    server_obj = IngestServer(ingestor or build_ingestor(spool="http", max_rows=FLUSH_MAX_ROWS, interval=FLUSH_INTERVAL),
+                              rules.PendingCommands())
+    # 자동 제어 규칙: 명령은 해당 기기의 다음 /log 응답 "commands"로 전달
+    rules.attach(server_obj.ingestor, server_obj.commands)
+    detector = alerts.attach(server_obj.ingestor)  # 경보 / 이상 탐지 (알림 전송은 send_alerts.py)
+    device_watchdog = watchdog.attach(server_obj.ingestor, "http", detector.store)  # 응답이 끊긴 기기 감시
+    server = await asyncio.start_server(server_obj.handle_connection, host, port, backlog=2048)
+    log.info(f"Smart Farm async ingest server running (port {port})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        server_obj.executor.shutdown(wait=True)
+        server_obj.ingestor.close()
+        device_watchdog.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        log.info("Stopped.")
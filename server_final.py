@@ -1,50 +1,95 @@
 from flask import Flask, request, jsonify
-import csv, os
-from datetime import datetime
+import atexit
 import logging
+import os
+
+from smartfarm import alerts, rules, watchdog
+from smartfarm.ingest import ValidationError, build_ingestor
 
 app = Flask(__name__)
-CSV_FILE = "sensor_data.csv"
+
+HOST = "0.0.0.0"
+PORT = 5000
+SERVER_THREADS = 8
+
+# 한 번의 /log/batch 요청에서 받을 수 있는 최대 측정값 개수
+MAX_BATCH_SIZE = 1000
 
 # ---------------- LOG CONFIG ----------------
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("SMARTFARM_LOG_LEVEL", "INFO"),
     format='[%(asctime)s] [%(levelname)s] %(message)s'
 )
 log = logging.getLogger("SmartFarm")
 
+# 정규화 + 배치 저장은 MQTT 쪽과 같은 ingestion 코어에서 처리
+ingestor = build_ingestor(spool="http")
+atexit.register(ingestor.close)
+
+# 자동 제어 규칙: HTTP 기기에는 다음 /log 응답의 "commands"로 명령을 전달
+pending_commands = rules.PendingCommands()
+rules.attach(ingestor, pending_commands)
+
+# 경보 / 이상 탐지 (alerts.db에 기록, 알림 전송은 send_alerts.py)
+detector = alerts.attach(ingestor)
+
+# 응답이 끊긴 기기 감시 (기기별 상태는 liveness/http.json, /api/devices/)
+device_watchdog = watchdog.attach(ingestor, "http", detector.store)
+atexit.register(device_watchdog.close)
+
+
+def with_commands(payload, rows):
+    commands = pending_commands.take(r["device_id"] for r in rows)
+    if commands:
+        payload["commands"] = commands
+    return payload
+
+
 # ---------------- ROUTE ----------------
 @app.route("/log", methods=["POST"])
 def log_data():
-    log.debug("========== NEW DATA ==========")
-    log.debug(f"Remote IP: {request.remote_addr}")
-    log.debug(f"Raw body: {request.data}")
+    data = request.get_json(force=True, silent=True)
+    if data is None:
+        log.warning(f"JSON parse error from {request.remote_addr}")
+        return jsonify({"status": "error", "reason": "json_parse"}), 400
 
     try:
-        data = request.get_json(force=True)
-    except Exception as e:
-        log.error(f"JSON parse error: {e}")
-        return jsonify({"status": "error", "reason": "json_parse"}), 400
+        row = ingestor.ingest(data, source="http")
+    except ValidationError:
+        return jsonify({"status": "error", "reason": "not_an_object"}), 400
 
-    log.debug(f"Parsed JSON: {data}")
+    return jsonify(with_commands({"status": "ok"}, [row] if row else [])), 200
 
-    # timestamp + ��� ���� �ڵ� ����
-    row = {"timestamp": datetime.now().isoformat()}
-    row.update(data)
 
-    file_exists = os.path.exists(CSV_FILE)
+@app.route("/log/batch", methods=["POST"])
+def log_batch():
+    data = request.get_json(force=True, silent=True)
+    if data is None:
+        log.warning(f"JSON parse error from {request.remote_addr}")
+        return jsonify({"status": "error", "reason": "json_parse"}), 400
+
+    # [{...}, {...}] 또는 {"readings": [{...}, ...]} 둘 다 허용
+    readings = data.get("readings") if isinstance(data, dict) else data
+    if not isinstance(readings, list):
+        return jsonify({"status": "error", "reason": "not_a_list"}), 400
+    if len(readings) > MAX_BATCH_SIZE:
+        return jsonify({"status": "error", "reason": "batch_too_large", "max": MAX_BATCH_SIZE}), 413
 
-    with open(CSV_FILE, "a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=row.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
+    try:
+        rows = ingestor.ingest_many(readings, source="http")
+    except ValidationError:
+        return jsonify({"status": "error", "reason": "not_an_object"}), 400
 
-    log.info(f"[SAVED] {row}")
+    return jsonify(with_commands({"status": "ok", "count": len(rows)}, rows)), 200
 
-    return jsonify({"status": "ok"}), 200
 
 # ---------------- MAIN ----------------
 if __name__ == "__main__":
-    log.info("Smart Farm HTTP Server running (port 5000)")
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    log.info(f"Smart Farm HTTP Server running (port {PORT})")
+    try:
+        from waitress import serve
+    except ImportError:
+        log.warning("waitress is not installed, falling back to Flask threaded server")
+        app.run(host=HOST, port=PORT, debug=False, threaded=True)
+    else:
+        serve(app, host=HOST, port=PORT, threads=SERVER_THREADS)
@@ -0,0 +1,174 @@
+"""
+Actuator commands (watering, plant light) sent to the ESP32 over MQTT.
+
+One CommandChannel per process keeps a persistent client connected to
+the broker (paho runs its network loop in a background thread and
+reconnects on its own). Every command gets an id and goes out on the
+device's command topic; the firmware answers on the reply topic with the
+same id:
+
+    smartfarm/lab/<device>/cmd        {"id": "...", "cmd": "water", "ts_ms": ...}
+    smartfarm/lab/<device>/cmd/ack    {"id": "...", "ok": true, "state": "..."}
+
+send() returns when the ack arrives or the timeout expires. The round
+trip (publish to ack arrival) is returned with the result and kept for
+stats(), along with counts per outcome.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import paho.mqtt.client as mqtt
+
+log = logging.getLogger("SmartFarm")
+
+MQTT_HOST = os.getenv("MQTT_HOST", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+TOPIC_PREFIX = "smartfarm/lab"
+DEFAULT_DEVICE = "esp32_001"
+
+COMMANDS = ("water", "light", "light_off")
+ACK_TIMEOUT = 3.0       # 기기 응답(ack)을 기다리는 시간 (초)
+CONNECT_WAIT = 1.0      # 브로커에 아직 연결 중이면 이만큼만 기다림
+LATENCY_WINDOW = 200    # stats()의 지연시간 분위수는 최근 이만큼의 명령으로 계산
+
+# send() 결과 status
+OK = "ok"               # ack 받음
+FAILED = "failed"       # ack는 왔지만 기기가 실행하지 못했다고 응답 (ok=false)
+TIMEOUT = "timeout"     # 시간 안에 ack가 오지 않음
+OFFLINE = "offline"     # 브로커에 연결되어 있지 않음
+
+
+def command_topic(device_id, prefix=TOPIC_PREFIX):
+    return f"{prefix}/{device_id}/cmd"
+
+
+def ack_topic(device_id, prefix=TOPIC_PREFIX):
+    return f"{prefix}/{device_id}/cmd/ack"
+
+
+class _Pending:
+    __slots__ = ("event", "sent", "ack", "acked")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.sent = time.perf_counter()
+        self.ack = None
+        self.acked = None
+
+
+class CommandChannel:
+    def __init__(self, host=MQTT_HOST, port=MQTT_PORT, prefix=TOPIC_PREFIX):
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._pending = {}  # 명령 id -> _Pending
+        self._connected = threading.Event()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {OK: 0, FAILED: 0, TIMEOUT: 0, OFFLINE: 0, "late_acks": 0}
+
+        # 프로세스마다 다른 client id (같은 id로 붙으면 브로커가 앞 연결을 끊음)
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2,
+                                  client_id=f"smartfarm-web-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.reconnect_delay_set(min_delay=1, max_delay=10)
+        self.client.connect_async(host, port, keepalive=30)
+        self.client.loop_start()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            log.warning("MQTT connect to %s:%s refused: %s", self.host, self.port, reason_code)
+            return
+        # 모든 기기의 ack를 구독 (재연결될 때마다 다시 구독)
+        client.subscribe(ack_topic("+", self.prefix), qos=1)
+        self._connected.set()
+        log.info("MQTT command channel connected to %s:%s", self.host, self.port)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self._connected.clear()
+        if reason_code.is_failure:
+            log.warning("MQTT command channel disconnected: %s", reason_code)
+
+    def _on_message(self, client, userdata, msg):
+        arrived = time.perf_counter()
+        try:
+            ack = json.loads(msg.payload.decode("utf-8"))
+            command_id = ack["id"]
+        except (UnicodeDecodeError, ValueError, TypeError, KeyError):
+            log.warning("Ignoring malformed ack on %s: %r", msg.topic, msg.payload[:200])
+            return
+        with self._lock:
+            pending = self._pending.get(command_id)
+            if pending is None:
+                self.counts["late_acks"] += 1  # 이미 시간 초과된 명령 (또는 다른 프로세스가 보낸 명령)
+                return
+            pending.ack, pending.acked = ack, arrived
+        pending.event.set()
+
+    def send(self, device_id, cmd, timeout=ACK_TIMEOUT, **args):
+        """
+        Publish `cmd` to the device and wait for its ack.
+        Returns {"id", "device_id", "cmd", "status", "latency_ms", "ack"}; status is one of
+        OK, FAILED, TIMEOUT, OFFLINE, latency_ms is None unless an ack arrived.
+        """
+        command_id = uuid.uuid4().hex[:12]
+        result = {"id": command_id, "device_id": device_id, "cmd": cmd, "status": OFFLINE,
+                  "latency_ms": None, "ack": None}
+        if not self._connected.wait(min(timeout, CONNECT_WAIT)):
+            self._record(result)
+            return result
+
+        pending = _Pending()
+        with self._lock:
+            self._pending[command_id] = pending
+        try:
+            payload = json.dumps({"id": command_id, "cmd": cmd, "ts_ms": int(time.time() * 1000), **args})
+            pending.sent = time.perf_counter()
+            info = self.client.publish(command_topic(device_id, self.prefix), payload, qos=1)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                self._record(result)
+                return result
+
+            if pending.event.wait(timeout):
+                result["ack"] = pending.ack
+                result["latency_ms"] = round((pending.acked - pending.sent) * 1000, 1)
+                result["status"] = OK if pending.ack.get("ok", True) else FAILED
+            else:
+                result["status"] = TIMEOUT
+        finally:
+            with self._lock:
+                self._pending.pop(command_id, None)
+        self._record(result)
+        return result
+
+    def _record(self, result):
+        with self._lock:
+            self.counts[result["status"]] += 1
+            if result["latency_ms"] is not None:
+                self._latencies.append(result["latency_ms"])
+        log.info("command %s %s -> %s: %s (%s ms)", result["id"], result["cmd"], result["device_id"],
+                 result["status"], result["latency_ms"])
+
+    def stats(self):
+        """Counts per outcome and ack round-trip percentiles (ms) over the recent commands."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {"connected": self._connected.is_set(), **self.counts}
+        if latencies:
+            pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+            stats["latency_ms"] = {"p50": pick(0.5), "p95": pick(0.95), "max": latencies[-1],
+                                   "samples": len(latencies)}
+        else:
+            stats["latency_ms"] = None
+        return stats
+
+    def close(self):
+        self.client.disconnect()
+        self.client.loop_stop()
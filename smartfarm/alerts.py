@@ -0,0 +1,354 @@
+"""
+Alarms and anomaly detection on the telemetry stream.
+
+An AlertDetector is an Ingestor listener (ordered, so each device's
+readings arrive in ts_ms order) keeping a few numbers per (device,
+field) and checking every reading in constant time:
+
+    low / high   fixed limits (저온/고온, 과건조/과습, ...; FIELD_CHECKS)
+    fault        FAULT_SAMPLES readings in a row that are missing or a
+                 firmware placeholder: final.ino leaves out a NaN DHT
+                 reading and a -127 (disconnected) DS18B20, the MQTT
+                 firmware sends -127 as is
+    zscore       |value - EWMA mean| > Z_LIMIT EWMA standard deviations
+    rate         change faster than the field's max_rate per minute
+                 (between consecutive readings, over at least a minute)
+    stuck        value unchanged for stuck_ms (frozen sensor)
+    dropout      gap since the device's previous reading longer than
+                 DROPOUT_FACTOR times its usual (EWMA) interval
+
+An alert is raised when a condition starts, not on every reading while
+it lasts. The same (device, field, kind) is not raised again within
+COOLDOWN_MS, and each device may raise at most ALERT_BURST alerts at
+once, refilled at ALERTS_PER_HOUR; the rest are only counted. All of
+this runs on the readings' ts_ms, so replaying history gives the same
+alerts.
+
+Raised alerts go to an AlertStore (alerts.db): the alert log, and in the
+same transaction an outbox row per alert that send_alerts.py delivers
+and marks sent (retrying with backoff on failure).
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+log = logging.getLogger("SmartFarm")
+
+ALERTS_DB = "alerts.db"
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+
+EWMA_ALPHA = 0.02        # 최근 약 100개 측정값 기준의 평균/분산
+WARMUP_SAMPLES = 50      # 이만큼 쌓이기 전에는 z-score를 보지 않음
+Z_LIMIT = 5.0
+RATE_MIN_SPAN_MS = MINUTE_MS  # 변화율은 최소 1분 간격으로 환산 (몇 초 간격의 잡음이 급변으로 보이지 않도록)
+FAULT_SAMPLES = 3
+DROPOUT_FACTOR = 5.0
+DROPOUT_MIN_MS = MINUTE_MS
+COOLDOWN_MS = 30 * MINUTE_MS
+ALERT_BURST = 5
+ALERTS_PER_HOUR = 12
+
+FIELD_LABELS = {"temp_air": "대기온도", "humidity": "습도", "temp_water": "수온", "soil_pct": "토양 수분"}
+
+
+class FieldCheck:
+    def __init__(self, low=None, high=None, labels=("낮음", "높음"), max_rate=None, stuck_ms=None,
+                 min_std=0.3, sentinels=()):
+        self.low = low
+        self.high = high
+        self.labels = labels          # (low 알림 이름, high 알림 이름)
+        self.max_rate = max_rate      # 1분당 최대 변화량
+        self.stuck_ms = stuck_ms
+        self.min_std = min_std        # 센서 분해능 몇 단계 정도: 값이 거의 안 변할 때 z-score가 튀지 않도록
+        self.sentinels = frozenset(sentinels)
+
+
+# 한계값은 ESP32based_SmartFarm.ino의 TEMP_/HUMIDITY_/WATER_TEMP_ MIN/MAX와 같음
+FIELD_CHECKS = {
+    "temp_air": FieldCheck(10.0, 40.0, ("저온", "고온"), max_rate=5.0, stuck_ms=2 * HOUR_MS),
+    "humidity": FieldCheck(30.0, 90.0, ("저습", "고습"), max_rate=20.0, stuck_ms=2 * HOUR_MS, min_std=1.0),
+    # DS18B20이 끊기면 -127 (MQTT 펌웨어는 그대로 보냄)
+    "temp_water": FieldCheck(15.0, 30.0, ("저수온", "고수온"), max_rate=3.0, stuck_ms=6 * HOUR_MS,
+                             sentinels=(-127.0,)),
+    "soil_pct": FieldCheck(20, 85, ("과건조", "과습"), max_rate=30.0, min_std=2.0),
+}
+
+
+def _message(device_id, field, kind, value, check=None):
+    name = FIELD_LABELS.get(field, field)
+    if kind == "low":
+        return f"{device_id}: {check.labels[0]} ({name} {value:g})"
+    if kind == "high":
+        return f"{device_id}: {check.labels[1]} ({name} {value:g})"
+    if kind == "fault":
+        return f"{device_id}: {name} 센서 오류 ({'값 없음' if value is None else f'{value:g}'})"
+    if kind == "zscore":
+        return f"{device_id}: {name} 값이 평소와 크게 다름 ({value:g})"
+    if kind == "rate":
+        return f"{device_id}: {name} 급변 ({value:g})"
+    if kind == "stuck":
+        return f"{device_id}: {name} 값이 {check.stuck_ms // MINUTE_MS}분 넘게 그대로 ({value:g})"
+    if kind == "dropout":
+        return f"{device_id}: {value:g}분 동안 측정값 수신 없음"
+    return f"{device_id}: {name} {kind}"
+
+
+class _FieldState:
+    __slots__ = ("n", "mean", "var", "last", "last_ts", "changed_ts", "bad")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.last = None
+        self.last_ts = None
+        self.changed_ts = None
+        self.bad = 0
+
+
+class _DeviceState:
+    __slots__ = ("last_ts", "n", "interval", "tokens", "tokens_ts")
+
+    def __init__(self, ts_ms):
+        self.last_ts = None
+        self.n = 0
+        self.interval = None
+        self.tokens = float(ALERT_BURST)
+        self.tokens_ts = ts_ms
+
+
+class AlertDetector:
+    def __init__(self, store=None, checks=FIELD_CHECKS):
+        self.store = store
+        self.checks = checks
+        self._lock = threading.Lock()
+        self._fields = {}      # (device_id, field) -> _FieldState
+        self._devices = {}     # device_id -> _DeviceState
+        self._active = set()   # 지금 조건이 계속되는 중인 (device_id, field, kind)
+        self._raised = {}      # (device_id, field, kind) -> 마지막으로 알림을 올린 ts_ms
+        self.counts = Counter()
+
+    def __call__(self, rows):
+        """Ingestor listener: check each row and store the raised alerts."""
+        alerts = []
+        with self._lock:
+            for row in rows:
+                alerts.extend(self._check_row(row))
+        if alerts and self.store is not None:
+            try:
+                self.store.add(alerts)
+            except sqlite3.Error:
+                log.exception(f"[ALERTS] failed to store {len(alerts)} alerts")
+
+    def check(self, row):
+        """Alerts raised by one reading (updates the detector's state)."""
+        with self._lock:
+            return self._check_row(row)
+
+    def _check_row(self, row):
+        ts_ms, device_id = row["ts_ms"], row["device_id"]
+        device = self._devices.get(device_id)
+        if device is None:
+            device = self._devices[device_id] = _DeviceState(ts_ms)
+        alerts = []
+
+        # 수신 공백: 평소 간격의 DROPOUT_FACTOR배 넘게 비었으면 (다음 측정값이 왔을 때 알림)
+        gap = ts_ms - device.last_ts if device.last_ts is not None else 0
+        dropout = (device.n >= 3 and device.interval is not None
+                   and gap > max(DROPOUT_MIN_MS, DROPOUT_FACTOR * device.interval))
+        if gap > 0 and not dropout:
+            device.interval = gap if device.interval is None else device.interval + EWMA_ALPHA * (gap - device.interval)
+        self._update(alerts, device, ts_ms, device_id, "device", "dropout", dropout, round(gap / MINUTE_MS, 1))
+        device.last_ts = ts_ms if device.last_ts is None else max(device.last_ts, ts_ms)
+        device.n += 1
+
+        for field, check in self.checks.items():
+            value = row.get(field)
+            key = (device_id, field)
+            state = self._fields.get(key)
+            if state is None:
+                if value is None:
+                    continue  # 이 센서가 없는 기기
+                state = self._fields[key] = _FieldState()
+
+            if value is None or value in check.sentinels:
+                state.bad += 1
+                self._update(alerts, device, ts_ms, device_id, field, "fault", state.bad >= FAULT_SAMPLES, value)
+                continue  # 잘못된 값으로는 통계를 갱신하지 않음
+            state.bad = 0
+            self._update(alerts, device, ts_ms, device_id, field, "fault", False, value)
+
+            self._update(alerts, device, ts_ms, device_id, field, "low",
+                         check.low is not None and value < check.low, value, check)
+            self._update(alerts, device, ts_ms, device_id, field, "high",
+                         check.high is not None and value > check.high, value, check)
+
+            zscore = False
+            if state.n >= WARMUP_SAMPLES:
+                std = max(math.sqrt(state.var), check.min_std)
+                zscore = abs(value - state.mean) / std > Z_LIMIT
+            self._update(alerts, device, ts_ms, device_id, field, "zscore", zscore, value)
+
+            rate = False
+            if check.max_rate is not None and state.last_ts is not None and ts_ms > state.last_ts:
+                span = max(ts_ms - state.last_ts, RATE_MIN_SPAN_MS)
+                rate = abs(value - state.last) * MINUTE_MS / span > check.max_rate
+            self._update(alerts, device, ts_ms, device_id, field, "rate", rate, value)
+
+            if value != state.last:
+                state.changed_ts = ts_ms
+            stuck = check.stuck_ms is not None and ts_ms - state.changed_ts >= check.stuck_ms
+            self._update(alerts, device, ts_ms, device_id, field, "stuck", stuck, value, check)
+
+            # EWMA 평균/분산 갱신
+            if state.n == 0:
+                state.mean = float(value)
+            else:
+                diff = value - state.mean
+                incr = EWMA_ALPHA * diff
+                state.mean += incr
+                state.var = (1 - EWMA_ALPHA) * (state.var + diff * incr)
+            state.n += 1
+            state.last, state.last_ts = value, ts_ms
+        return alerts
+
+    def _update(self, alerts, device, ts_ms, device_id, field, kind, condition, value, check=None):
+        key = (device_id, field, kind)
+        if not condition:
+            self._active.discard(key)
+            return
+        if key in self._active:
+            return  # 이미 알린 상태가 계속되는 중
+        self._active.add(key)
+
+        last = self._raised.get(key)
+        if last is not None and ts_ms - last < COOLDOWN_MS:
+            self.counts["suppressed_cooldown"] += 1
+            return
+        # 기기별 알림 수 제한 (토큰 버킷)
+        device.tokens = min(ALERT_BURST, device.tokens + (ts_ms - device.tokens_ts) * ALERTS_PER_HOUR / HOUR_MS)
+        device.tokens_ts = ts_ms
+        if device.tokens < 1:
+            self.counts["suppressed_rate"] += 1
+            return
+        device.tokens -= 1
+        self._raised[key] = ts_ms
+        self.counts[kind] += 1
+        alerts.append({"ts_ms": ts_ms, "device_id": device_id, "field": field, "kind": kind, "value": value,
+                       "message": _message(device_id, field, kind, value, check)})
+
+    def stats(self):
+        with self._lock:
+            return {"devices": len(self._devices), "active": len(self._active), **self.counts}
+
+
+def attach(ingestor, store=None):
+    """Subscribe an AlertDetector writing to `store` (default: a new AlertStore on ALERTS_DB)."""
+    detector = AlertDetector(store if store is not None else AlertStore())
+    ingestor.subscribe(detector)
+    return detector
+
+
+DDL = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts_ms INTEGER NOT NULL,
+    device_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_device_id ON alerts (device_id, id);
+CREATE TABLE IF NOT EXISTS alert_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    alert_id INTEGER NOT NULL REFERENCES alerts (id),
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_ms INTEGER NOT NULL,
+    sent_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS alert_outbox_pending ON alert_outbox (next_ms) WHERE status = 'pending';
+"""
+
+ALERT_COLUMNS = "id, ts_ms, device_id, field, kind, value, message"
+MAX_ATTEMPTS = 8
+RETRY_MS = 30 * 1000   # 실패하면 30초, 1분, 2분, ... 뒤에 다시 (최대 1시간)
+
+
+def _alert(row):
+    return dict(zip(("id", "ts_ms", "device_id", "field", "kind", "value", "message"), row))
+
+
+class AlertStore:
+    def __init__(self, path=ALERTS_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(DDL)
+
+    def add(self, alerts):
+        """Append alerts to the log, each with a pending outbox row, in one transaction."""
+        now_ms = int(time.time() * 1000)
+        with self.lock, self.conn:
+            for a in alerts:
+                cur = self.conn.execute(
+                    "INSERT INTO alerts (ts_ms, device_id, field, kind, value, message) VALUES (?, ?, ?, ?, ?, ?)",
+                    (a["ts_ms"], a["device_id"], a["field"], a["kind"], a["value"], a["message"]))
+                self.conn.execute("INSERT INTO alert_outbox (alert_id, next_ms) VALUES (?, ?)",
+                                  (cur.lastrowid, now_ms))
+
+    def recent(self, limit=50, device_id=None, before_id=None):
+        """The newest alerts, newest first; before_id pages back from an alert id."""
+        where, params = [], []
+        if device_id is not None:
+            where.append("device_id = ?")
+            params.append(device_id)
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        sql = f"SELECT {ALERT_COLUMNS} FROM alerts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [_alert(r) for r in rows]
+
+    def pending(self, limit=20, now_ms=None):
+        """Outbox entries due for delivery, oldest first: alert dicts with "outbox_id" and "attempts"."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT o.id, o.attempts, {', '.join('a.' + c for c in ALERT_COLUMNS.split(', '))} "
+                "FROM alert_outbox o JOIN alerts a ON a.id = o.alert_id "
+                "WHERE o.status = 'pending' AND o.next_ms <= ? ORDER BY o.next_ms, o.id LIMIT ?",
+                (now_ms, limit)).fetchall()
+        return [{"outbox_id": r[0], "attempts": r[1], **_alert(r[2:])} for r in rows]
+
+    def mark_sent(self, outbox_ids):
+        now_ms = int(time.time() * 1000)
+        with self.lock, self.conn:
+            self.conn.executemany("UPDATE alert_outbox SET status = 'sent', sent_ms = ? WHERE id = ?",
+                                  [(now_ms, i) for i in outbox_ids])
+
+    def mark_failed(self, outbox_ids):
+        """Retry later with exponential backoff; give up after MAX_ATTEMPTS."""
+        now_ms = int(time.time() * 1000)
+        with self.lock, self.conn:
+            for i in outbox_ids:
+                self.conn.execute(
+                    "UPDATE alert_outbox SET attempts = attempts + 1, "
+                    "next_ms = ? + min(? << attempts, ?), "
+                    "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END WHERE id = ?",
+                    (now_ms, RETRY_MS, HOUR_MS, MAX_ATTEMPTS, i))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
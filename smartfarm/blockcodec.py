@@ -0,0 +1,246 @@
+"""
+Compressed blocks for cold sensor partitions.
+
+One block holds up to BLOCK_ROWS readings of one device:
+
+    header    magic, count, first/last ts_ms, number of fields
+    ts        delta-of-delta timestamps, zigzag varints
+    per field name, encoding, decimal exponent, present count, min, max,
+              payload length, [presence bitmap], payload
+
+Values are encoded one of two ways, whichever applies:
+
+    decimal   every value is an exact k-decimal number (23.4, 61, 2048):
+              round(v * 10**k) as zigzag-varint deltas, usually one byte
+    xor       Gorilla-style XOR with the previous float64 bit pattern,
+              trimmed to its meaningful bytes (one length byte per value)
+
+Unlike the Gorilla paper everything is byte aligned, so decode() is a
+handful of NumPy array operations (no per-value Python loop). Byte
+alignment costs at least one byte per value, so each section is also
+deflated when that makes it smaller: slowly changing series are mostly
+zero deltas. The per-field min/max lets a scan skip a block without
+decoding it.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"SFB1"
+BLOCK_ROWS = 4096
+
+HEADER = struct.Struct("<4sIqqB")         # magic, count, first_ts, last_ts, n_fields
+TS_HEADER = struct.Struct("<BI")          # deflated, payload length
+FIELD_HEADER = struct.Struct("<BBIddI")   # encoding, exponent, present, min, max, payload length
+
+DECIMAL = 0
+XOR = 1
+DEFLATED = 0x80  # encoding 바이트의 최상위 비트: 페이로드가 zlib으로 압축됨
+MAX_EXPONENT = 4
+_MAX_EXACT = float(1 << 53)
+
+
+# ---------- varints ----------
+def _zigzag(v):
+    v = v.astype(np.int64)
+    return ((v << 1) ^ (v >> 63)).view(np.uint64)
+
+
+def _unzigzag(z):
+    return (z >> np.uint64(1)).view(np.int64) ^ -(z & np.uint64(1)).view(np.int64)
+
+
+def _varint_encode(z):
+    """Unsigned LEB128 encoding of a uint64 array, vectorized."""
+    n = len(z)
+    if n == 0:
+        return b""
+    lengths = np.ones(n, dtype=np.int64)
+    for k in range(1, 10):
+        lengths += z >= np.uint64(1 << (7 * k))
+    starts = np.cumsum(lengths) - lengths
+    owner = np.repeat(np.arange(n), lengths)
+    pos = np.arange(len(owner)) - starts[owner]
+    out = (z[owner] >> (np.uint64(7) * pos.astype(np.uint64))) & np.uint64(0x7F)
+    out |= (pos < lengths[owner] - 1).astype(np.uint64) << np.uint64(7)
+    return out.astype(np.uint8).tobytes()
+
+
+def _varint_decode(buf):
+    b = np.frombuffer(buf, dtype=np.uint8)
+    if len(b) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    ends = (b & 0x80) == 0
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    owner = np.cumsum(ends) - ends
+    pos = np.arange(len(b)) - starts[owner]
+    parts = (b & 0x7F).astype(np.uint64) << (np.uint64(7) * pos.astype(np.uint64))
+    return np.bitwise_or.reduceat(parts, starts)
+
+
+# ---------- timestamps ----------
+def _encode_ts(ts):
+    # 첫 간격, 이후는 간격의 변화량 (주기가 일정하면 대부분 0)
+    dod = np.diff(np.diff(ts), prepend=0)
+    return _varint_encode(_zigzag(dod))
+
+
+def _decode_ts(first_ts, count, buf):
+    deltas = np.cumsum(_unzigzag(_varint_decode(buf)))
+    ts = np.empty(count, dtype=np.int64)
+    ts[0] = first_ts
+    ts[1:] = first_ts + np.cumsum(deltas)
+    return ts
+
+
+# ---------- values ----------
+def _decimal_exponent(values):
+    """Smallest k for which values are exactly round(v * 10**k) / 10**k, or None."""
+    for k in range(MAX_EXPONENT + 1):
+        scale = 10.0 ** k
+        scaled = np.round(values * scale)
+        if np.all(np.abs(scaled) < _MAX_EXACT) and np.array_equal(scaled / scale, values):
+            return k
+    return None
+
+
+def _encode_values(values):
+    k = _decimal_exponent(values)
+    if k is not None:
+        ints = np.round(values * 10.0 ** k).astype(np.int64)
+        return DECIMAL, k, _varint_encode(_zigzag(np.diff(ints, prepend=0)))
+
+    bits = values.view(np.uint64)
+    residual = bits ^ np.concatenate(([np.uint64(0)], bits[:-1]))
+    # 의미 있는 바이트만 남김: 하위 0 바이트 수(tz)와 남은 바이트 수(m)를 한 바이트에
+    nonzero = np.stack([(residual >> np.uint64(8 * i)) & np.uint64(0xFF) for i in range(8)], axis=1) != 0
+    any_nz = nonzero.any(axis=1)
+    tz = np.where(any_nz, nonzero.argmax(axis=1), 0)
+    top = np.where(any_nz, 8 - nonzero[:, ::-1].argmax(axis=1), 0)
+    m = top - tz
+    owner = np.repeat(np.arange(len(values)), m)
+    pos = np.arange(len(owner)) - (np.cumsum(m) - m)[owner]
+    payload = (residual[owner] >> (np.uint64(8) * (tz[owner] + pos).astype(np.uint64))) & np.uint64(0xFF)
+    heads = (tz << 4 | m).astype(np.uint8)
+    return XOR, 0, heads.tobytes() + payload.astype(np.uint8).tobytes()
+
+
+def _decode_values(encoding, exponent, count, buf):
+    if encoding == DECIMAL:
+        ints = np.cumsum(_unzigzag(_varint_decode(buf)))
+        return ints.astype(np.float64) / 10.0 ** exponent
+
+    heads = np.frombuffer(buf, dtype=np.uint8, count=count)
+    payload = np.frombuffer(buf, dtype=np.uint8, offset=count)
+    m = (heads & 0x0F).astype(np.int64)
+    tz = (heads >> 4).astype(np.int64)
+    residual = np.zeros(count, dtype=np.uint64)
+    has = np.flatnonzero(m)
+    if len(has):
+        starts = np.cumsum(m) - m
+        owner = np.repeat(np.arange(count), m)
+        pos = np.arange(len(owner)) - starts[owner]
+        parts = payload.astype(np.uint64) << (np.uint64(8) * (tz[owner] + pos).astype(np.uint64))
+        residual[has] = np.bitwise_or.reduceat(parts, starts[has])
+    return np.bitwise_xor.accumulate(residual).view(np.float64)
+
+
+def _deflate(payload):
+    packed = zlib.compress(payload, 6)
+    if len(packed) < len(payload):
+        return True, packed
+    return False, payload
+
+
+def _inflate(deflated, buf):
+    return zlib.decompress(buf) if deflated else buf
+
+
+# ---------- blocks ----------
+def encode(ts, fields):
+    """
+    Encode one block. `ts` is an int64 array (ascending), `fields` maps a
+    field name to a float64 array of the same length with NaN for missing.
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    count = len(ts)
+    parts = [b""]
+    n_fields = 0
+    for name, values in fields.items():
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        n_present = int(present.sum())
+        if n_present == 0:
+            continue
+        kept = values[present]
+        encoding, exponent, payload = _encode_values(kept)
+        deflated, payload = _deflate(payload)
+        if deflated:
+            encoding |= DEFLATED
+        name_bytes = name.encode("ascii")
+        parts.append(bytes([len(name_bytes)]) + name_bytes)
+        parts.append(FIELD_HEADER.pack(encoding, exponent, n_present, kept.min(), kept.max(), len(payload)))
+        if n_present < count:
+            parts.append(np.packbits(present).tobytes())
+        parts.append(payload)
+        n_fields += 1
+
+    deflated, ts_bytes = _deflate(_encode_ts(ts))
+    parts[0] = HEADER.pack(MAGIC, count, int(ts[0]), int(ts[-1]), n_fields) + TS_HEADER.pack(deflated, len(ts_bytes)) + ts_bytes
+    return b"".join(parts)
+
+
+def _fields(buf, count, offset, n_fields):
+    """Yield (name, encoding, exponent, present, min, max, bitmap slice, payload slice) without decoding."""
+    for _ in range(n_fields):
+        size = buf[offset]
+        name = bytes(buf[offset + 1:offset + 1 + size]).decode("ascii")
+        offset += 1 + size
+        encoding, exponent, present, lo, hi, length = FIELD_HEADER.unpack_from(buf, offset)
+        offset += FIELD_HEADER.size
+        bitmap = None
+        if present < count:
+            nbytes = (count + 7) // 8
+            bitmap = (offset, nbytes)
+            offset += nbytes
+        yield name, encoding, exponent, present, lo, hi, bitmap, (offset, length)
+        offset += length
+
+
+def header(buf):
+    """(count, first_ts, last_ts, {field: (min, max)}) from a block, without decoding values."""
+    magic, count, first_ts, last_ts, n_fields = HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("not a sensor block")
+    _, ts_len = TS_HEADER.unpack_from(buf, HEADER.size)
+    offset = HEADER.size + TS_HEADER.size + ts_len
+    ranges = {f[0]: (f[4], f[5]) for f in _fields(buf, count, offset, n_fields)}
+    return count, first_ts, last_ts, ranges
+
+
+def decode(buf, names=None):
+    """Decode a block into (ts, {field: float64 array with NaN for missing}); `names` limits the fields."""
+    buf = memoryview(buf)
+    magic, count, first_ts, last_ts, n_fields = HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("not a sensor block")
+    deflated, ts_len = TS_HEADER.unpack_from(buf, HEADER.size)
+    offset = HEADER.size + TS_HEADER.size
+    ts = _decode_ts(first_ts, count, _inflate(deflated, buf[offset:offset + ts_len]))
+    offset += ts_len
+
+    out = {}
+    for name, encoding, exponent, present, lo, hi, bitmap, (start, length) in _fields(buf, count, offset, n_fields):
+        if names is not None and name not in names:
+            continue
+        payload = _inflate(encoding & DEFLATED, buf[start:start + length])
+        values = _decode_values(encoding & ~DEFLATED, exponent, present, payload)
+        if bitmap is not None:
+            mask = np.unpackbits(np.frombuffer(buf[bitmap[0]:bitmap[0] + bitmap[1]], dtype=np.uint8),
+                                 count=count).astype(bool)
+            full = np.full(count, np.nan)
+            full[mask] = values
+            values = full
+        out[name] = values
+    return ts, out
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger("SmartFarm")
+
+
+class BufferedWriter:
+    """
+    Collect rows in memory and hand them to a sink in batches.
+
+    A background thread flushes when `max_rows` rows are pending or when
+    `interval` seconds have passed since the last flush, whichever comes first.
+    """
+
+    def __init__(self, sink, max_rows=200, interval=1.0):
+        self.sink = sink
+        self.max_rows = max_rows
+        self.interval = interval
+        self._rows = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="buffered-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, row):
+        self.put_many([row])
+
+    def put_many(self, rows):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BufferedWriter is closed")
+            self._rows.extend(rows)
+            if len(self._rows) >= self.max_rows:
+                self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._rows)
+
+    def _take(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def _write(self, rows):
+        if not rows:
+            return
+        try:
+            self.sink.write(rows)
+            log.debug(f"[FLUSH] {len(rows)} rows")
+        except Exception:
+            log.exception(f"[FLUSH] failed to write {len(rows)} rows")
+
+    def _run(self):
+        deadline = time.monotonic() + self.interval
+        while True:
+            with self._cond:
+                while not self._closed and len(self._rows) < self.max_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            self.flush()
+            deadline = time.monotonic() + self.interval
+            if closed:
+                return
+
+    def flush(self):
+        """Write everything pending right now, from the calling thread."""
+        with self._write_lock:
+            with self._cond:
+                rows = self._take()
+            self._write(rows)
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.sink.close()
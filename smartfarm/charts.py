@@ -0,0 +1,183 @@
+"""
+Trend charts rendered on demand, as PNG or as the JSON series behind them.
+
+    ndvi     mean and median of the NDVI samples (smartfarm.ndvi_store)
+    sensor   one field of one device (query.chart_series, min/max buckets)
+
+Every series is reduced to about one point per horizontal pixel before
+drawing. Figures come from a FigurePool: Agg figures are created once and
+cleared between requests, so a request pays for drawing, not for
+building a figure and its canvas. Results are kept in an LRU keyed by
+(kind, target, range, size, format, data version). The data version is
+the NDVI store's version() or, for sensor charts, the newest reading's
+timestamp capped at the end of the range, so a chart of a finished range
+stays cached and one that reaches "now" is redrawn only when new data
+arrives.
+"""
+import hashlib
+import io
+import json
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from smartfarm import downsample, query, rollups
+
+FORMATS = ("png", "json")
+DPI = 100
+MIN_SIZE = (200, 150)
+MAX_SIZE = (2000, 1200)
+DEFAULT_SIZE = (800, 400)
+
+FIGURE_POOL_SIZE = 4
+CACHE_ENTRIES = 64
+
+NDVI_LINES = (("mean", "red", "Average"), ("median", "blue", "Median"))
+
+
+class FigurePool:
+    """Idle Agg figures shared between requests; at most `size` are kept."""
+
+    def __init__(self, size=FIGURE_POOL_SIZE):
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def figure(self, width, height):
+        try:
+            fig = self._idle.get_nowait()
+        except queue.Empty:
+            fig = Figure(dpi=DPI)
+            FigureCanvasAgg(fig)
+        fig.set_size_inches(width / DPI, height / DPI)
+        try:
+            yield fig
+        finally:
+            fig.clear()
+            try:
+                self._idle.put_nowait(fig)
+            except queue.Full:
+                pass
+
+
+class ChartCache:
+    """LRU of rendered bodies; build() runs outside the lock, so one slow chart does not block hits."""
+
+    def __init__(self, entries=CACHE_ENTRIES):
+        self.entries = entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.entries:
+                self._items.popitem(last=False)
+        return value
+
+
+pool = FigurePool()
+cache = ChartCache()
+
+
+def check_size(width, height):
+    if not (MIN_SIZE[0] <= width <= MAX_SIZE[0] and MIN_SIZE[1] <= height <= MAX_SIZE[1]):
+        raise ValueError(f"size must be between {MIN_SIZE[0]}x{MIN_SIZE[1]} and {MAX_SIZE[0]}x{MAX_SIZE[1]}")
+
+
+def ndvi_series(store, camera_id, start_ms, end_ms, points):
+    """{"mean": [[ts_ms, v], ...], "median": [...]} with at most `points` samples (LTTB on the mean)."""
+    samples = store.range(start_ms, end_ms, camera_id)
+    ts = np.array([s["ts_ms"] for s in samples], dtype=np.int64)
+    keep = downsample.lttb(ts, [s["mean"] for s in samples], points)
+    return {name: [[int(ts[i]), samples[i][name]] for i in keep.tolist()] for name, _, _ in NDVI_LINES}
+
+
+def sensor_series(store, device_id, field, start_ms, end_ms, points, raw=None):
+    _, series = query.chart_series(store, device_id, field, start_ms, end_ms, points, "minmax", raw)
+    return {field: series}
+
+
+def render_png(series, lines, title, width, height, ylim=None):
+    with pool.figure(width, height) as fig:
+        ax = fig.add_subplot()
+        drawn = False
+        for name, color, label in lines:
+            points = series.get(name)
+            if not points:
+                continue
+            data = np.array(points, dtype=np.float64)
+            # 현지 시각 기준 matplotlib 날짜(1970-01-01부터 일 수)
+            days = (data[:, 0] + rollups.TZ_OFFSET_MS) / rollups.DAY_MS
+            ax.plot(days, data[:, 1], color=color, label=label, linewidth=1.5)
+            drawn = True
+        if drawn:
+            ax.xaxis_date()
+            ax.legend(loc="upper left")
+            fig.autofmt_xdate()
+        else:
+            ax.text(0.5, 0.5, "No data", ha="center", va="center", transform=ax.transAxes)
+        if ylim:
+            ax.set_ylim(*ylim)
+        ax.set_title(title)
+        ax.grid(True, linestyle="--", alpha=0.5)
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=DPI)
+        return buf.getvalue()
+
+
+def _json(series, start_ms, end_ms):
+    return json.dumps({"start": start_ms, "end": end_ms, "series": series},
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _cached(key, build):
+    """(etag, body) of a chart, built only if its key is not cached."""
+    etag = '"' + hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).hexdigest() + '"'
+    return etag, cache.get(key, build)
+
+
+def ndvi_chart(store, camera_id, start_ms, end_ms, width, height, fmt="png"):
+    key = ("ndvi", camera_id, start_ms, end_ms, width, height, fmt, store.version())
+
+    def build():
+        series = ndvi_series(store, camera_id, start_ms, end_ms, width)
+        if fmt == "json":
+            return _json(series, start_ms, end_ms)
+        return render_png(series, NDVI_LINES, "NDVI Trend", width, height, ylim=(0, 1.05))
+
+    return _cached(key, build)
+
+
+def sensor_chart(store, reader, device_id, field, start_ms, end_ms, width, height, fmt="png", raw=None):
+    """
+    `reader` is the latest-reading SnapshotReader, whose newest ts_ms versions the data;
+    `raw` is where raw readings are read from (see rollups.query_series).
+    """
+    _, _, devices = reader.current()
+    newest = devices.get(device_id, {}).get("ts_ms")
+    version = min(newest, end_ms) if newest is not None else None
+    key = ("sensor", device_id, field, start_ms, end_ms, width, height, fmt, version)
+
+    def build():
+        series = sensor_series(store, device_id, field, start_ms, end_ms, width, raw)
+        if fmt == "json":
+            return _json(series, start_ms, end_ms)
+        return render_png(series, ((field, "tab:green", field),), f"{device_id} {field}", width, height)
+
+    return _cached(key, build)
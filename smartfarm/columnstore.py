@@ -0,0 +1,492 @@
+"""
+Append-only columnar storage for sensor telemetry.
+
+Layout on disk:
+
+    <root>/schema.json          column name -> dtype, in column order
+    <root>/manifest.json        sealed chunks with row count and time range
+    <root>/devices.json         device_id -> code stored in the "device" column
+    <root>/chunk_000001/<column>.bin
+    <root>/chunk_000002/<column>.bin   (last chunk stays open for appends)
+
+Every column file is a raw little-endian array of its schema dtype, so a
+chunk can be appended to with a plain write and read back with np.memmap
+without parsing anything. Columns can be added later; chunks written
+before a column existed read back as "missing" for it (NaN for floats,
+the dtype's minimum for integers).
+
+Each device_id gets a small integer code on its first row, recorded in
+devices.json with the timestamp of that row. raw_series() reads one
+field of one device through the same memory maps; query.RawSeries serves
+sub-minute chart ranges from it.
+
+Several processes may append to the same store (the HTTP servers and the
+MQTT subscriber); writers serialize on an flock of <root>/.lock and
+re-read the on-disk state before each append.
+"""
+import csv
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: 한 프로세스만 쓴다고 가정
+    fcntl = None
+
+log = logging.getLogger("SmartFarm")
+
+# 고정 스키마: 측정 시각(epoch ms) + ESP32(final.ino)가 보내는 필드
+SCHEMA = (
+    ("ts_ms", "<i8"),
+    ("temp_air", "<f4"),
+    ("humidity", "<f4"),
+    ("temp_water", "<f4"),
+    ("cds_raw", "<i4"),
+    ("light_pct", "<i4"),
+    ("soil_raw", "<i4"),
+    ("soil_pct", "<i4"),
+    # 이후 추가된 컬럼 (스키마 진화: 예전 청크에서는 missing으로 읽힘)
+    ("recv_ms", "<i8"),
+    ("seq", "<i8"),
+    ("device", "<i4"),  # device_id 코드 (devices.json)
+)
+DEVICE_COLUMN = "device"
+
+CHUNK_ROWS = 1 << 16
+
+# float32로 저장한 값을 읽을 때 반올림할 소수 자릿수 (DHT22 0.1, DS18B20 0.0625 °C 분해능이면 충분)
+FLOAT32_DECIMALS = 4
+
+
+def missing_value(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return np.nan
+    return np.iinfo(dtype).min
+
+
+def is_missing(values):
+    """Boolean mask of missing entries in a column array."""
+    if values.dtype.kind == "f":
+        return np.isnan(values)
+    return values == np.iinfo(values.dtype).min
+
+
+def _write_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp, path)
+
+
+class ColumnStore:
+    def __init__(self, root, schema=SCHEMA, chunk_rows=CHUNK_ROWS, auto_add=False, readonly=False):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.auto_add = auto_add
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._files = {}
+        self._lock_fd = None
+        self.devices = {}  # device_id -> {"code", "since_ms"}
+        self._devices_stat = None
+
+        if not readonly:
+            os.makedirs(root, exist_ok=True)
+        with self._writer_lock():
+            self.columns = self._load_schema(schema)
+            self.chunks = []
+            self._open_index = 1
+            self._open_rows, self._open_min, self._open_max = 0, None, None
+            self._refresh()
+
+    # ---------- schema / manifest ----------
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _chunk_dir(self, index):
+        return self._path(f"chunk_{index:06d}")
+
+    def _load_schema(self, schema):
+        path = self._path("schema.json")
+        columns = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                columns = dict(json.load(f)["columns"])
+
+        changed = False
+        for name, dtype in schema:
+            dtype = np.dtype(dtype).str
+            if name not in columns:
+                columns[name] = dtype
+                changed = True
+            elif columns[name] != dtype:
+                raise ValueError(f"column '{name}' is stored as {columns[name]}, schema says {dtype}")
+
+        if changed and not self.readonly:
+            _write_json(path, {"columns": list(columns.items())})
+        return columns
+
+    def _load_manifest(self):
+        path = self._path("manifest.json")
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["chunks"]
+
+    def _save_manifest(self):
+        _write_json(self._path("manifest.json"), {"chunks": self.chunks})
+
+    def _load_devices(self):
+        path = self._path("devices.json")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return
+        if (st.st_ino, st.st_mtime_ns) != self._devices_stat:
+            with open(path, "r", encoding="utf-8") as f:
+                self.devices = json.load(f)["devices"]
+            self._devices_stat = (st.st_ino, st.st_mtime_ns)
+
+    def _register_devices(self, rows):
+        """Give each new device_id in rows the next code; since_ms is its earliest ts_ms in this batch."""
+        new = {}
+        for r in rows:
+            device_id = r.get("device_id")
+            if device_id is None or device_id in self.devices or r.get("ts_ms") is None:
+                continue
+            since = new.get(device_id)
+            new[device_id] = r["ts_ms"] if since is None else min(since, r["ts_ms"])
+        if not new:
+            return
+        for device_id, since_ms in new.items():
+            self.devices[device_id] = {"code": len(self.devices) + 1, "since_ms": int(since_ms)}
+        path = self._path("devices.json")
+        _write_json(path, {"devices": self.devices})
+        st = os.stat(path)
+        self._devices_stat = (st.st_ino, st.st_mtime_ns)
+
+    @contextmanager
+    def _writer_lock(self):
+        if self.readonly or fcntl is None:
+            yield
+            return
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self._path(".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up chunks, columns and rows appended by other processes."""
+        known = list(self.columns)
+        self.columns = self._load_schema(tuple(self.columns.items()))
+        self._load_devices()
+        chunks = self._load_manifest()
+        if len(chunks) != len(self.chunks):
+            self._close_files()
+            self.chunks = chunks
+            self._open_index = chunks[-1]["index"] + 1 if chunks else 1
+            self._open_rows = -1
+        ts_rows = self._column_rows(self._open_index, "ts_ms")
+        if ts_rows != self._open_rows or known != list(self.columns):
+            self._close_files()
+            self._open_rows, self._open_min, self._open_max = self._scan_open_chunk()
+
+    def add_column(self, name, dtype="<f8"):
+        """Schema evolution: add a column; older rows read back as missing."""
+        with self._lock, self._writer_lock():
+            self._refresh()
+            self._add_column(name, dtype)
+
+    def _add_column(self, name, dtype):
+        if name in self.columns:
+            return
+        dtype = np.dtype(dtype)
+        self.columns[name] = dtype.str
+        _write_json(self._path("schema.json"), {"columns": list(self.columns.items())})
+        # 열려 있는 청크는 모든 컬럼 길이가 같아야 하므로 기존 행만큼 채워 둠
+        if self._open_rows:
+            fill = np.full(self._open_rows, missing_value(dtype), dtype=dtype)
+            f = self._column_file(name)
+            f.write(fill.tobytes())
+            f.flush()
+        log.info(f"[SCHEMA] added column {name} ({dtype.str})")
+
+    # ---------- open chunk ----------
+    def _column_rows(self, index, name):
+        path = os.path.join(self._chunk_dir(index), f"{name}.bin")
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(self.columns[name]).itemsize
+
+    def _scan_open_chunk(self):
+        """Row count and time range of the open chunk, repairing torn appends."""
+        chunk_dir = self._chunk_dir(self._open_index)
+        if not os.path.isdir(chunk_dir):
+            return 0, None, None
+
+        present = [name for name in self.columns if os.path.exists(os.path.join(chunk_dir, f"{name}.bin"))]
+        rows = min((self._column_rows(self._open_index, name) for name in present), default=0)
+        if not self.readonly:
+            for name, dtype in self.columns.items():
+                path = os.path.join(chunk_dir, f"{name}.bin")
+                if name not in present:
+                    # 이 청크를 쓰는 사이에 SCHEMA에 추가된 컬럼: 기존 행만큼 missing으로 채움
+                    np.full(rows, missing_value(dtype), dtype=dtype).tofile(path)
+                elif os.path.getsize(path) != rows * np.dtype(dtype).itemsize:
+                    with open(path, "ab") as f:
+                        f.truncate(rows * np.dtype(dtype).itemsize)
+        if rows == 0:
+            return 0, None, None
+        ts = np.memmap(os.path.join(chunk_dir, "ts_ms.bin"), dtype=self.columns["ts_ms"], mode="r", shape=(rows,))
+        return rows, int(ts.min()), int(ts.max())
+
+    def _column_file(self, name):
+        f = self._files.get(name)
+        if f is None:
+            chunk_dir = self._chunk_dir(self._open_index)
+            os.makedirs(chunk_dir, exist_ok=True)
+            f = open(os.path.join(chunk_dir, f"{name}.bin"), "ab")
+            self._files[name] = f
+        return f
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def _seal(self):
+        self._close_files()
+        self.chunks.append({
+            "index": self._open_index,
+            "rows": self._open_rows,
+            "ts_min": self._open_min,
+            "ts_max": self._open_max,
+        })
+        self._save_manifest()
+        self._open_index += 1
+        self._open_rows, self._open_min, self._open_max = 0, None, None
+
+    # ---------- write ----------
+    def _to_array(self, name, rows):
+        dtype = np.dtype(self.columns[name])
+        miss = missing_value(dtype)
+        if name == DEVICE_COLUMN:
+            values = [self.devices.get(r.get("device_id"), {}).get("code") for r in rows]
+        else:
+            values = [r.get(name) for r in rows]
+        values = [miss if v is None else v for v in values]
+        try:
+            return np.asarray(values, dtype=dtype)
+        except (TypeError, ValueError):
+            out = np.empty(len(values), dtype=dtype)
+            for i, v in enumerate(values):
+                try:
+                    out[i] = v
+                except (TypeError, ValueError):
+                    log.warning(f"[SCHEMA] bad value for {name}: {v!r}")
+                    out[i] = miss
+            return out
+
+    def write(self, rows):
+        """Append rows (dicts keyed by column name). Unknown keys are ignored unless auto_add."""
+        if not rows:
+            return
+        if self.readonly:
+            raise RuntimeError("ColumnStore opened read-only")
+
+        with self._lock, self._writer_lock():
+            self._refresh()
+            self._register_devices(rows)
+            if self.auto_add:
+                for key in {k for r in rows for k in r} - self.columns.keys():
+                    if any(isinstance(r.get(key), (int, float)) for r in rows):
+                        self._add_column(key, "<f8")
+
+            start = 0
+            while start < len(rows):
+                part = rows[start:start + self.chunk_rows - self._open_rows]
+                self._append(part)
+                start += len(part)
+                if self._open_rows >= self.chunk_rows:
+                    self._seal()
+
+    def _append(self, rows):
+        arrays = {name: self._to_array(name, rows) for name in self.columns}
+        for name, arr in arrays.items():
+            f = self._column_file(name)
+            f.write(arr.tobytes())
+            f.flush()
+
+        ts = arrays["ts_ms"]
+        lo, hi = int(ts.min()), int(ts.max())
+        self._open_min = lo if self._open_min is None else min(self._open_min, lo)
+        self._open_max = hi if self._open_max is None else max(self._open_max, hi)
+        self._open_rows += len(rows)
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    # ---------- read ----------
+    def _chunk_views(self):
+        """(index, rows, ts_min, ts_max) for every chunk including the open one."""
+        # 다른 프로세스가 계속 쓰고 있을 수 있으므로 매번 디스크 상태를 다시 확인
+        with self._writer_lock():
+            self._refresh()
+        views = [(c["index"], c["rows"], c["ts_min"], c["ts_max"]) for c in self.chunks]
+        if self._open_rows:
+            views.append((self._open_index, self._open_rows, self._open_min, self._open_max))
+        return views
+
+    def _map(self, index, name, rows):
+        dtype = np.dtype(self.columns[name])
+        path = os.path.join(self._chunk_dir(index), f"{name}.bin")
+        if not os.path.exists(path):
+            return np.full(rows, missing_value(dtype), dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+    def iter_chunks(self, columns=None, start_ms=None, end_ms=None, device_id=None):
+        """
+        Yield one dict of column arrays per chunk overlapping [start_ms, end_ms),
+        only the rows of device_id if given. Arrays are memory-mapped slices
+        whenever the matching rows are contiguous.
+        """
+        columns = list(columns or self.columns)
+        with self._lock:
+            views = self._chunk_views()
+            code = None
+            if device_id is not None:
+                code = self.devices.get(device_id, {}).get("code")
+                if code is None:
+                    return
+
+        for index, rows, ts_min, ts_max in views:
+            if start_ms is not None and ts_max < start_ms:
+                continue
+            if end_ms is not None and ts_min >= end_ms:
+                continue
+
+            sel = slice(None)
+            if (start_ms is not None and ts_min < start_ms) or (end_ms is not None and ts_max >= end_ms) \
+                    or code is not None:
+                mask = np.ones(rows, dtype=bool)
+                if start_ms is not None or end_ms is not None:
+                    ts = self._map(index, "ts_ms", rows)
+                    if start_ms is not None:
+                        mask &= ts >= start_ms
+                    if end_ms is not None:
+                        mask &= ts < end_ms
+                if code is not None:
+                    mask &= self._map(index, DEVICE_COLUMN, rows) == code
+                idx = np.flatnonzero(mask)
+                if not len(idx):
+                    continue
+                sel = slice(idx[0], idx[-1] + 1) if idx[-1] - idx[0] + 1 == len(idx) else idx
+
+            yield {name: self._map(index, name, rows)[sel] for name in columns}
+
+    def read(self, columns=None, start_ms=None, end_ms=None, device_id=None):
+        """Column arrays for [start_ms, end_ms); a single chunk is returned without copying."""
+        columns = list(columns or self.columns)
+        parts = list(self.iter_chunks(columns, start_ms, end_ms, device_id))
+        if not parts:
+            return {name: np.empty(0, dtype=self.columns[name]) for name in columns}
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([p[name] for p in parts]) for name in columns}
+
+    def device_since(self, device_id):
+        """ts_ms of the first row stored for device_id (earlier rows may only be in SQLite), or None."""
+        with self._lock:
+            self._load_devices()
+            entry = self.devices.get(device_id)
+        return None if entry is None else entry["since_ms"]
+
+    def raw_series(self, device_id, field, start_ms, end_ms):
+        """(ts_ms, value) arrays of one field over [start_ms, end_ms), like PartitionedStore.raw_series."""
+        ts_parts, value_parts = [], []
+        for part in self.iter_chunks(("ts_ms", field), start_ms, end_ms, device_id):
+            values = part[field]
+            keep = ~is_missing(values)
+            ts_parts.append(np.asarray(part["ts_ms"][keep], dtype=np.int64))
+            values = values[keep]
+            values = values.astype(np.float64)
+            if part[field].dtype.kind == "f" and part[field].dtype.itemsize < 8:
+                # float32 -> float64 그대로면 23.3 -> 23.299999237... 이므로 센서 분해능 자리까지 반올림
+                values = np.round(values, FLOAT32_DECIMALS)
+            value_parts.append(values)
+        if not ts_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        ts = np.concatenate(ts_parts)
+        values = np.concatenate(value_parts)
+        order = np.argsort(ts, kind="stable")
+        return ts[order], values[order]
+
+    def __len__(self):
+        with self._lock:
+            return sum(v[1] for v in self._chunk_views())
+
+
+def import_csv(store, csv_path, device_id="default"):
+    """
+    Load an old header-from-first-row sensor_data.csv into the store; returns (imported, rejected).
+
+    The old writer took its header from the first payload, so a row with a
+    different number of fields cannot be matched to the header's columns;
+    such rows (and rows without a readable timestamp) are logged and
+    rejected instead of being stored under the wrong names. Rows without a
+    device_id column are stored as `device_id`.
+    """
+    rows, rejected = [], 0
+    with open(csv_path, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        for rec in reader:
+            if not rec:
+                continue
+            if len(rec) != len(header):
+                log.warning(f"[IMPORT] {csv_path}:{reader.line_num}: {len(rec)} fields, header has {len(header)}")
+                rejected += 1
+                continue
+            row = {k: v for k, v in zip(header, rec) if k and v != ""}
+            try:
+                row["ts_ms"] = int(datetime.fromisoformat(row.pop("timestamp")).timestamp() * 1000)
+            except (KeyError, ValueError):
+                log.warning(f"[IMPORT] {csv_path}:{reader.line_num}: no valid timestamp")
+                rejected += 1
+                continue
+            for k, v in row.items():
+                if k not in ("ts_ms", "device_id"):
+                    try:
+                        row[k] = float(v)
+                    except ValueError:
+                        row[k] = None
+            row.setdefault("device_id", device_id)
+            rows.append(row)
+    store.write(rows)
+    return len(rows), rejected
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 4 or sys.argv[1] != "import":
+        print("usage: python -m smartfarm.columnstore import <sensor_data.csv> <store dir>")
+        sys.exit(1)
+    store = ColumnStore(sys.argv[3])
+    imported, rejected = import_csv(store, sys.argv[2])
+    print(f"imported {imported} rows into {sys.argv[3]} ({rejected} rejected)")
+    store.close()
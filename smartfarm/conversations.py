@@ -0,0 +1,74 @@
+"""
+Counseling conversations stored in the database instead of the session.
+
+The session keeps only the conversation id. Messages are appended one
+row at a time (smartfarm.models.Message), and every read is bounded:
+
+    page(conv, before_id)   the PAGE_SIZE messages before a message id, for display
+    prompt_history(conv)    the newest messages that fit in HISTORY_TOKENS
+                            (at most HISTORY_MESSAGES), for the LLM prompt
+
+Both are a LIMIT query on the (conversation_id, id) index, so the cost
+of a message does not grow with the length of the conversation.
+"""
+from django.utils import timezone
+
+from smartfarm.models import Conversation, Message
+
+PAGE_SIZE = 30
+HISTORY_MESSAGES = 12
+HISTORY_TOKENS = 1200
+
+
+def estimate_tokens(text):
+    # 토크나이저 없이 대략: 한글 한 글자(UTF-8 3바이트) ≈ 1토큰, 영문 약 3글자 ≈ 1토큰
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+def get_or_create(conversation_id):
+    """The conversation with this id, or a new one if it does not exist (or the id is None)."""
+    if conversation_id is not None:
+        conversation = Conversation.objects.filter(pk=conversation_id).first()
+        if conversation is not None:
+            return conversation
+    return Conversation.objects.create()
+
+
+def append(conversation_id, sender, text):
+    return Message.objects.create(conversation_id=conversation_id, sender=sender, text=text,
+                                  tokens=estimate_tokens(text))
+
+
+def as_dict(message):
+    """Template form of a message (same keys as the old session list)."""
+    return {
+        "id": message.id,
+        "sender": message.sender,
+        "text": message.text,
+        "time": timezone.localtime(message.created_at).strftime("%H:%M"),
+    }
+
+
+def page(conversation_id, before_id=None, limit=PAGE_SIZE):
+    """(messages oldest first, whether older messages exist) for the `limit` messages before `before_id`."""
+    qs = Message.objects.filter(conversation_id=conversation_id)
+    if before_id is not None:
+        qs = qs.filter(id__lt=before_id)
+    rows = list(qs.order_by("-id")[:limit + 1])
+    return [as_dict(m) for m in reversed(rows[:limit])], len(rows) > limit
+
+
+def prompt_history(conversation_id, before_id=None, max_tokens=HISTORY_TOKENS, max_messages=HISTORY_MESSAGES):
+    """[{"role": "user"|"assistant", "content": text}, ...] of the newest messages within the token budget."""
+    qs = Message.objects.filter(conversation_id=conversation_id)
+    if before_id is not None:
+        qs = qs.filter(id__lt=before_id)
+    history = []
+    used = 0
+    for sender, text, tokens in qs.order_by("-id").values_list("sender", "text", "tokens")[:max_messages]:
+        if used + tokens > max_tokens:
+            break
+        used += tokens
+        history.append({"role": "user" if sender == "user" else "assistant", "content": text})
+    history.reverse()
+    return history
@@ -0,0 +1,101 @@
+"""
+Downsampling of chart series to a fixed number of points.
+
+    lttb(x, y, n)            Largest-Triangle-Three-Buckets: indices of n points
+                             that keep the visual shape of the line
+    minmax(x, lo, hi, n)     per time bucket the lowest and the highest point,
+                             so spikes survive at any zoom level
+
+Both run as whole-array NumPy operations in O(n). In the original LTTB
+each bucket's triangle starts at the point chosen in the bucket before,
+a sequential dependency. lttb() instead makes `passes` passes over all
+buckets at once: the first uses the previous bucket's average as the
+left corner, each later one the point the pass before chose there.
+After p passes the first p buckets are exactly those of the sequential
+algorithm, and with passes >= n_out - 2 the whole result is. The default
+of two passes deliberately stops short of that: a bucket can then get a
+different point when the first pass chose differently in the bucket
+before it (on noisy series roughly one bucket in ten to one in three), which
+still keeps the shape of the line for a chart.
+"""
+import numpy as np
+
+
+def _bucket_argmax(values, starts, bucket):
+    """Index of the (first) largest value in each contiguous bucket."""
+    peak = np.maximum.reduceat(values, starts)
+    hits = np.flatnonzero(values == peak[bucket])
+    owner = bucket[hits]
+    return hits[np.concatenate(([True], owner[1:] != owner[:-1]))]
+
+
+def lttb(x, y, n_out, passes=2):
+    """
+    Indices (ascending) of the n_out points to keep, always the first and
+    the last; every point if the series is not longer.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+
+    # 양 끝점은 고정, 가운데 n-2개 점을 n_out-2개 버킷으로 나눔
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    inner = np.arange(1, n - 1)
+    bucket = np.searchsorted(edges, inner, side="right") - 1
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+
+    cx = np.concatenate((mean_x[1:], [x[-1]]))[bucket]
+    cy = np.concatenate((mean_y[1:], [y[-1]]))[bucket]
+    px, py = x[1:n - 1], y[1:n - 1]
+    starts = edges[:-1] - 1
+
+    # 1차: 이전 버킷 평균을 왼쪽 꼭짓점으로, 2차부터: 앞 차수에서 이전 버킷이 고른 점을 꼭짓점으로
+    left_x = np.concatenate(([x[0]], mean_x[:-1]))
+    left_y = np.concatenate(([y[0]], mean_y[:-1]))
+    for _ in range(max(passes, 1)):
+        ax, ay = left_x[bucket], left_y[bucket]
+        area = np.abs((ax - cx) * (py - ay) - (ax - px) * (cy - ay))
+        chosen = _bucket_argmax(area, starts, bucket)
+        left_x = np.concatenate(([x[0]], px[chosen[:-1]]))
+        left_y = np.concatenate(([y[0]], py[chosen[:-1]]))
+    return np.concatenate(([0], chosen + 1, [n - 1]))
+
+
+def minmax(x, lo, hi, n_out):
+    """
+    (x, y) arrays of at most n_out points: for each of n_out // 2 equal time
+    buckets the point with the lowest `lo` and the one with the highest `hi`,
+    in time order. Pass the same array twice for plain values, or the
+    min/max columns of a rollup to keep the extremes inside each bucket.
+    """
+    if n_out < 2:
+        raise ValueError("minmax needs at least 2 points")
+    x = np.asarray(x, dtype=np.float64)
+    lo = np.asarray(lo, dtype=np.float64)
+    hi = np.asarray(hi, dtype=np.float64)
+    n = len(x)
+    n_buckets = n_out // 2
+    if n <= n_out:
+        return x, (lo + hi) / 2
+
+    span = x[-1] - x[0]
+    bucket = np.minimum(((x - x[0]) * n_buckets / span).astype(np.int64), n_buckets - 1) if span else np.zeros(n, np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    owner = np.cumsum(np.concatenate(([0], bucket[1:] != bucket[:-1])))
+    low = _bucket_argmax(-lo, starts, owner)
+    high = _bucket_argmax(hi, starts, owner)
+
+    # 같은 점이 최저/최고이면 한 번만, 시간 순으로 정렬
+    keys = np.concatenate((low, high))
+    values = np.concatenate((lo[low], hi[high]))
+    times = x[keys]
+    order = np.lexsort((keys, times))
+    keys, times, values = keys[order], times[order], values[order]
+    keep = np.concatenate(([True], (keys[1:] != keys[:-1]) | (values[1:] != values[:-1])))
+    return times[keep], values[keep]
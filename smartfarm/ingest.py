@@ -0,0 +1,313 @@
+"""
+Shared ingestion core for every sensor front end.
+
+The MQTT subscriber (connect.py.py) and the HTTP servers (server_final.py,
+server_async.py) all hand raw JSON readings to an Ingestor. It maps the
+different firmware field names onto one canonical set, converts types in
+a single generated function, and queues the rows on one writer that
+delivers them to the storage sinks in batches. With a spool directory the
+rows are first appended to a write-ahead spool on disk (smartfarm.spool),
+so a locked or slow database delays storage instead of losing readings.
+
+Readings may carry the device's own clock (`ts` in seconds or `ts_ms`) and
+a per-device sequence number (`seq`). ts_ms is then the sample time and
+recv_ms the server arrival time; repeated (device_id, seq) pairs are
+dropped, and subscribers see each device's readings in ts_ms order.
+
+With `latest_path` the Ingestor also keeps the newest reading of each
+device in memory and publishes it to that file (smartfarm.latest) for
+the web process's /api/current.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from smartfarm.buffered_writer import BufferedWriter
+from smartfarm.columnstore import ColumnStore
+from smartfarm.latest import LATEST_DIR, LatestSnapshot
+from smartfarm.ordering import ReorderBuffer, SeqTracker
+from smartfarm.sensor_db import DB_FILE, SqliteSink
+from smartfarm.spool import SpooledWriter
+
+log = logging.getLogger("SmartFarm")
+
+STORE_DIR = "sensor_store"
+# 프런트엔드(프로세스)마다 spool/<이름> 디렉터리를 따로 사용
+SPOOL_ROOT = "spool"
+
+FLUSH_MAX_ROWS = 200
+FLUSH_INTERVAL = 1.0
+
+DEFAULT_DEVICE_ID = "default"
+
+# 기기 시계가 이보다 이전이면(NTP 미동기화, millis() 기반 등) 서버 수신 시각을 사용
+MIN_DEVICE_MS = 1577836800000  # 2020-01-01
+# 서버 시각보다 이만큼 넘게 미래인 기기 시각은 잘못된 값으로 처리
+MAX_CLOCK_AHEAD_MS = 5 * 60 * 1000
+
+REORDER_WINDOW_MS = 2000
+
+# 저장 dtype(columnstore: int32 / int64)에 들어가는 범위. 각 dtype의 최솟값은 "값 없음" 표시로 쓰이므로 제외
+INT32_RANGE = (-2**31 + 1, 2**31 - 1)
+INT64_RANGE = (-2**63 + 1, 2**63 - 1)
+
+# 정규화된 필드 이름과 타입 (int는 int32 범위)
+FIELDS = (
+    ("device_id", "str"),
+    ("temp_air", "float"),
+    ("humidity", "float"),
+    ("temp_water", "float"),
+    ("cds_raw", "int"),
+    ("light_pct", "int"),
+    ("soil_raw", "int"),
+    ("soil_pct", "int"),
+)
+
+# 펌웨어마다 다른 필드 이름 -> 정규화된 이름
+#   final.ino (HTTP):                 temp_air, humidity, cds_raw, soil_pct ...
+#   MQTT (connect.py.py):             soil, cds1
+#   ESP32based_SmartFarm.ino (MQTT):  id, air_temp, air_humidity, water_temp_1, cds_raw_1
+ALIASES = {
+    "device_id": ("id", "device"),
+    "temp_air": ("air_temp",),
+    "humidity": ("air_humidity",),
+    "temp_water": ("water_temp_1", "water_temp"),
+    "cds_raw": ("cds1", "cds_raw_1"),
+    "soil_pct": ("soil", "soil_moisture"),
+}
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def _to_float(v):
+    if isinstance(v, bool):
+        raise TypeError(v)
+    v = float(v)
+    if not math.isfinite(v):
+        raise ValueError(v)
+    return v
+
+
+def _to_int(v, bounds=INT32_RANGE):
+    """Integer within `bounds` (the storage dtype), else ValueError like any other bad value."""
+    if isinstance(v, bool):
+        raise TypeError(v)
+    if not isinstance(v, int):
+        f = _to_float(v)
+        if not f.is_integer():
+            raise ValueError(v)
+        v = int(f)
+    if not bounds[0] <= v <= bounds[1]:
+        raise ValueError(v)
+    return v
+
+
+def _to_int64(v):
+    return _to_int(v, INT64_RANGE)
+
+
+def _to_str(v):
+    if isinstance(v, (dict, list)):
+        raise TypeError(v)
+    return str(v)
+
+
+def _device_ms(v, recv_ms):
+    """
+    Device timestamp in epoch ms; `ts` values below 1e12 are taken as seconds.
+    The result is at most MAX_CLOCK_AHEAD_MS past recv_ms, so always fits in int64.
+    """
+    ms = _to_float(v)
+    if ms < 1e12:
+        ms *= 1000
+    if ms < MIN_DEVICE_MS:
+        return recv_ms
+    if ms > recv_ms + MAX_CLOCK_AHEAD_MS:
+        raise ValueError(v)
+    return int(ms)
+
+
+def compile_normalizer(fields=FIELDS, aliases=ALIASES):
+    """
+    Generate normalize(data, recv_ms, bad) for the given schema.
+
+    Alias lookups and converters are unrolled into straight-line code once,
+    so the per-reading cost is a handful of dict lookups and calls.
+    Fields that fail conversion are set to None and their names appended to `bad`.
+    """
+    lines = [
+        "def normalize(data, recv_ms, bad):",
+        "    row = {'ts_ms': recv_ms, 'recv_ms': recv_ms, 'seq': None}",
+        "    v = data.get('ts_ms')",
+        "    if v is None: v = data.get('ts')",
+        "    if v is not None:",
+        "        try: row['ts_ms'] = _device_ms(v, recv_ms)",
+        "        except (TypeError, ValueError): bad.append('ts')",
+        "    v = data.get('seq')",
+        "    if v is not None:",
+        "        try: row['seq'] = _int64(v)",
+        "        except (TypeError, ValueError): bad.append('seq')",
+    ]
+    for name, kind in fields:
+        lines.append(f"    v = data.get({name!r})")
+        for alt in aliases.get(name, ()):
+            lines.append(f"    if v is None: v = data.get({alt!r})")
+        lines.append("    if v is not None:")
+        lines.append(f"        try: v = _{kind}(v)")
+        lines.append(f"        except (TypeError, ValueError): bad.append({name!r}); v = None")
+        lines.append(f"    row[{name!r}] = v")
+    lines.append("    if row['device_id'] is None: row['device_id'] = _default_device")
+    lines.append("    return row")
+
+    namespace = {"_float": _to_float, "_int": _to_int, "_int64": _to_int64, "_str": _to_str, "_device_ms": _device_ms,
+                 "_default_device": DEFAULT_DEVICE_ID}
+    exec(compile("\n".join(lines), "<smartfarm.ingest.normalize>", "exec"), namespace)
+    return namespace["normalize"]
+
+
+normalize = compile_normalizer()
+
+
+class FanOutSink:
+    """Write each batch to several sinks; one failing sink does not block the others."""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def write(self, rows):
+        for sink in self.sinks:
+            try:
+                sink.write(rows)
+            except Exception:
+                log.exception(f"[INGEST] {type(sink).__name__} failed on {len(rows)} rows")
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class Ingestor:
+    def __init__(self, sinks, max_rows=FLUSH_MAX_ROWS, interval=FLUSH_INTERVAL, spool_dir=None,
+                 reorder_window_ms=REORDER_WINDOW_MS, latest_path=None):
+        if spool_dir:
+            self.writer = SpooledWriter(sinks, spool_dir, max_rows=max_rows, interval=interval)
+        else:
+            self.writer = BufferedWriter(FanOutSink(sinks), max_rows=max_rows, interval=interval)
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._seqs = SeqTracker()
+        self._reorder = ReorderBuffer(reorder_window_ms)
+        self._order_lock = threading.Lock()
+        self._listeners = []
+        self._unordered = []
+        self.latest = None
+        if latest_path:
+            self.latest = LatestSnapshot(latest_path)
+            self.subscribe(self.latest, ordered=False)
+
+    def subscribe(self, listener, ordered=True):
+        """
+        Call listener(rows) with each device's readings in ts_ms order as they leave the reorder window.
+        With ordered=False the listener gets every new reading right away, in arrival order.
+        """
+        if ordered:
+            self._listeners.append(listener)
+        else:
+            self._unordered.append(listener)
+
+    def ingest(self, data, source="http", recv_ms=None):
+        """Normalize one reading and queue it for storage. Returns the stored row, or None for a duplicate."""
+        rows = self.ingest_many([data], source, recv_ms)
+        return rows[0] if rows else None
+
+    def ingest_many(self, readings, source="http", recv_ms=None):
+        """
+        Normalize a batch of readings and queue the new ones for storage.
+        Rejects the whole batch if any entry is not an object; returns the rows accepted.
+        """
+        start = time.perf_counter_ns()
+        if recv_ms is None:
+            recv_ms = int(time.time() * 1000)
+
+        bad = []
+        rows = []
+        for data in readings:
+            if not isinstance(data, dict):
+                self._count(source, rejected=len(readings))
+                raise ValidationError("reading must be a JSON object")
+            rows.append(normalize(data, recv_ms, bad))
+
+        released = []
+        with self._order_lock:
+            fresh = [r for r in rows if r["seq"] is None or not self._seqs.is_duplicate(r["device_id"], r["seq"])]
+            if fresh:
+                self.writer.put_many(fresh)
+            if self._listeners:
+                late = self._reorder.late
+                for r in fresh:
+                    released.extend(self._reorder.push(r, recv_ms))
+                released.extend(self._reorder.drain(recv_ms))
+                late = self._reorder.late - late
+            else:
+                late = 0
+
+        if fresh and self._unordered:
+            self._notify(fresh, self._unordered)
+        if released:
+            self._notify(released)
+        if bad:
+            log.warning(f"[INGEST] {source}: dropped invalid fields {sorted(set(bad))}")
+        self._count(source, rows=len(fresh), duplicates=len(rows) - len(fresh), late=late,
+                    bad_fields=len(bad), normalize_ns=time.perf_counter_ns() - start)
+        return fresh
+
+    def _notify(self, rows, listeners=None):
+        for listener in self._listeners if listeners is None else listeners:
+            try:
+                listener(rows)
+            except Exception:
+                log.exception(f"[INGEST] listener {listener!r} failed")
+
+    def _count(self, source, **counts):
+        with self._stats_lock:
+            for key, n in counts.items():
+                self._stats[key] += n
+                self._stats[f"{source}.{key}"] += n
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["pending"] = self.writer.pending()
+        if isinstance(self.writer, SpooledWriter):
+            stats["spool_backlog_bytes"] = self.writer.backlog_bytes()
+        return stats
+
+    def flush(self):
+        with self._order_lock:
+            released = self._reorder.drain()
+        if released:
+            self._notify(released)
+        self.writer.flush()
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        if self.latest is not None:
+            self.latest.close()
+
+
+def build_ingestor(spool=None, db_file=DB_FILE, store_dir=STORE_DIR, **kwargs):
+    """
+    Ingestor writing to sensor_logs in SQLite and to the columnar store.
+    `spool` names this front end's spool directory under SPOOL_ROOT and its
+    latest-reading file under LATEST_DIR; None disables both.
+    """
+    if spool is not None:
+        kwargs.setdefault("spool_dir", os.path.join(SPOOL_ROOT, spool))
+        kwargs.setdefault("latest_path", os.path.join(LATEST_DIR, f"{spool}.json"))
+    return Ingestor([SqliteSink(db_file), ColumnStore(store_dir)], **kwargs)
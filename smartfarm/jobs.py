@@ -0,0 +1,165 @@
+"""
+Background jobs for slow calls made on behalf of a web request (LLM replies).
+
+A request submits a job and gets its id back at once; the call runs on a
+small worker pool and the page polls status(id) until it is finished:
+
+    queued -> running -> done | error
+                      -> timeout   (not finished within `timeout` seconds)
+
+At most `workers` calls run at the same time and at most `max_pending`
+jobs wait or run; submit() raises QueueFull beyond that instead of
+letting the backlog grow. A timed-out call cannot be interrupted (give
+the client library its own timeout), but its result is dropped and a job
+still waiting for a worker is cancelled. Finished jobs are forgotten
+after `keep` seconds.
+
+Side effects of a result (saving a reply) belong in on_done(result,
+*args, **kwargs), not in fn: it runs only for a result that arrived in
+time, and the job cannot time out while it runs, so a job reported as
+timed out never saves a late result.
+
+A queue created with stream=True passes fn an `on_text` callback; text
+reported through it is kept with the job, so output(id, offset) can hand
+a partial reply to the page while the call is still running.
+
+Jobs live in the memory of one web process, so the pages that submit and
+poll must be served by the same process: runserver, or a single WSGI or
+ASGI worker process. The reply stream (views.counseling_stream) works
+under both.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("SmartFarm")
+
+QUEUED, RUNNING, DONE, ERROR, TIMEOUT = "queued", "running", "done", "error", "timeout"
+FINISHED = (DONE, ERROR, TIMEOUT)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.monotonic()
+        self.finished = None
+        self.future = None
+        self.chunks = []
+        self.saving = False  # 결과를 받아 on_done 실행 중 (이때는 시간 초과로 바꾸지 않음)
+
+    def as_dict(self):
+        data = {"id": self.id, "status": self.status}
+        if self.status == DONE:
+            data["result"] = self.result
+        elif self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    def __init__(self, fn, workers=4, max_pending=32, timeout=60.0, keep=600.0, stream=False, on_done=None):
+        self.fn = fn
+        self.on_done = on_done
+        self.stream = stream
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, *args, **kwargs):
+        """Queue fn(*args, **kwargs); returns the job id. Raises QueueFull when too many are pending."""
+        with self._lock:
+            self._expire()
+            pending = sum(1 for job in self._jobs.values() if job.status not in FINISHED)
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs pending")
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, args, kwargs)
+        return job.id
+
+    def _run(self, job, args, kwargs):
+        with self._lock:
+            if job.status != QUEUED:
+                return  # 기다리는 동안 시간 초과됨
+            job.status = RUNNING
+        call_kwargs = dict(kwargs, on_text=lambda text: self._add_text(job, text)) if self.stream else kwargs
+        try:
+            result, error = self.fn(*args, **call_kwargs), None
+        except Exception as e:
+            log.exception(f"[JOB] {job.id} failed")
+            result, error = None, f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            self._check_timeout(job, time.monotonic())
+            if job.status != RUNNING:
+                log.info(f"[JOB] {job.id} finished after timing out, result dropped")
+                return
+            job.saving = error is None and self.on_done is not None
+        if job.saving:
+            try:
+                self.on_done(result, *args, **kwargs)
+            except Exception as e:
+                log.exception(f"[JOB] {job.id} on_done failed")
+                result, error = None, f"{type(e).__name__}: {e}"
+        with self._lock:
+            job.status = DONE if error is None else ERROR
+            job.result, job.error = result, error
+            job.finished = time.monotonic()
+            job.saving = False
+
+    def _add_text(self, job, text):
+        with self._lock:
+            if job.status == RUNNING:
+                job.chunks.append(text)
+
+    def _check_timeout(self, job, now):
+        if job.status not in FINISHED and not job.saving and now - job.created > self.timeout:
+            job.status = TIMEOUT
+            job.error = f"no result within {self.timeout:g}s"
+            job.finished = now
+            if job.future is not None:
+                job.future.cancel()  # 아직 대기 중이면 실행하지 않음
+
+    def _expire(self):
+        now = time.monotonic()
+        for job in list(self._jobs.values()):
+            self._check_timeout(job, now)
+            if job.finished is not None and now - job.finished > self.keep:
+                del self._jobs[job.id]
+
+    def status(self, job_id):
+        """The job as a dict ({"id", "status", "result" | "error"}), or None if unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._check_timeout(job, time.monotonic())
+            return job.as_dict()
+
+    def output(self, job_id, offset=0):
+        """(status, text reported since chunk `offset`, new offset), or None if unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._check_timeout(job, time.monotonic())
+            return job.status, "".join(job.chunks[offset:]), len(job.chunks)
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
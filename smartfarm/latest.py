@@ -0,0 +1,129 @@
+"""
+Latest reading per device, shared between processes without the database.
+
+Each ingestion process keeps a LatestSnapshot subscribed to its Ingestor
+and rewrites <LATEST_DIR>/<name>.json (atomically, at most every
+WRITE_INTERVAL seconds) when a newer reading arrives. Web processes hold
+a SnapshotReader, which merges those files into one compact JSON body
+and re-reads them only when a file's mtime or size changes, so serving
+/api/current is a few stat() calls and, with If-None-Match, a 304.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+log = logging.getLogger("SmartFarm")
+
+LATEST_DIR = "latest"
+WRITE_INTERVAL = 0.5
+
+
+class LatestSnapshot:
+    """Ingestor listener keeping the newest value of every field per device and publishing it to a file."""
+
+    def __init__(self, path, interval=WRITE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._timer = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._rows = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def __call__(self, rows):
+        changed = False
+        with self._lock:
+            for row in rows:
+                old = self._rows.get(row["device_id"])
+                if old is not None and row["ts_ms"] < old["ts_ms"]:
+                    continue
+                # 필드마다 마지막으로 받은 값을 유지 (일부 필드만 보내는 기기도 있음)
+                merged = dict(old) if old else {}
+                merged.update((k, v) for k, v in row.items() if v is not None and k != "seq")
+                self._rows[row["device_id"]] = merged
+                changed = True
+            if changed and self._timer is None:
+                self._timer = threading.Timer(self.interval, self.write)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def get(self, device_id):
+        with self._lock:
+            return self._rows.get(device_id)
+
+    def items(self):
+        """(device_id, row) for every device, as loaded from the file or received since."""
+        with self._lock:
+            return list(self._rows.items())
+
+    def write(self):
+        with self._lock:
+            self._timer = None
+            payload = json.dumps(self._rows, ensure_ascii=False, separators=(",", ":"))
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError:
+            log.exception(f"[LATEST] failed to write {self.path}")
+
+    def close(self):
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+            self.write()
+
+
+class SnapshotReader:
+    """Merged view of every <name>.json in LATEST_DIR, cached until one of them changes."""
+
+    def __init__(self, root=LATEST_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._signature = None
+        self._devices = {}
+        self._body = b'{"ts_ms":null,"devices":{}}'
+        self._etag = '"0"'
+
+    def _scan(self):
+        try:
+            entries = [e for e in os.scandir(self.root) if e.name.endswith(".json")]
+        except FileNotFoundError:
+            return ()
+        return tuple(sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in entries))
+
+    def current(self):
+        """(etag, JSON body bytes, {device_id: row}) for the newest reading of every device."""
+        signature = self._scan()
+        with self._lock:
+            if signature != self._signature:
+                self._reload(signature)
+            return self._etag, self._body, self._devices
+
+    def _reload(self, signature):
+        devices = {}
+        for name, _, _ in signature:
+            try:
+                with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                continue  # 쓰는 중이거나 손상된 파일은 다음 요청에서 다시 읽음
+            for device, row in rows.items():
+                if device not in devices or row["ts_ms"] > devices[device]["ts_ms"]:
+                    devices[device] = row
+
+        newest = max((row["ts_ms"] for row in devices.values()), default=None)
+        body = json.dumps({"ts_ms": newest, "devices": devices}, ensure_ascii=False,
+                          separators=(",", ":"), sort_keys=True).encode("utf-8")
+        self._signature = signature
+        self._devices = devices
+        self._body = body
+        self._etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
@@ -1,3 +1,22 @@
 from django.db import models
 
-# Create your models here.
+
+class Conversation(models.Model):
+    """식물 상담 대화 하나. 세션에는 이 id만 저장."""
+
+    plant_type = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class Message(models.Model):
+    """대화의 메시지 한 개 (추가만 하고 고치지 않음). tokens는 프롬프트 길이 제한용 추정치."""
+
+    SENDER_CHOICES = [("user", "user"), ("bot", "bot")]
+
+    # 외래키 인덱스가 SQLite에서는 (conversation_id, id) 순서라서
+    # 최근 N개 / 특정 id 이전 N개 조회가 이 인덱스만으로 끝남
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
+    sender = models.CharField(max_length=8, choices=SENDER_CHOICES)
+    text = models.TextField()
+    tokens = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,34 @@
+"""
+NDVI summary for the plant report, read from the NDVI sample store.
+
+The report only looks at the last few samples. CachedSummary fetches
+them with NdviStore.recent() (an index seek) and keeps the computed
+result until the store's version() changes, so a page view costs one
+index lookup.
+"""
+import threading
+
+from smartfarm.ndvi_store import DEFAULT_CAMERA
+
+RECENT_ROWS = 5
+
+
+class CachedSummary:
+    """compute(samples) over the newest `n` samples of a camera, recomputed only when a sample is added."""
+
+    def __init__(self, store, compute, n=RECENT_ROWS, camera_id=DEFAULT_CAMERA):
+        self.store = store
+        self.compute = compute
+        self.n = n
+        self.camera_id = camera_id
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+
+    def get(self):
+        version = self.store.version()
+        with self._lock:
+            if self._value is None or version != self._version:
+                self._value = self.compute(self.store.recent(self.n, self.camera_id))
+                self._version = version
+            return self._value
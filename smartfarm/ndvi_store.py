@@ -0,0 +1,156 @@
+"""
+Time-indexed store for NDVI samples.
+
+ndvi.py records one sample per capture: the epoch-ms timestamp, the
+camera (or plant) id, the mean and median of the normalized NDVI image
+and a HIST_BINS histogram of its pixels, in a small SQLite file
+
+    ndvi.db   -> table ndvi_samples, indexed on (camera_id, ts_ms) and ts_ms
+
+Readers (ndvi.py's trend graph, the plant report, the SSE push) share
+range() / recent() / latest(), which seek in those indexes instead of
+parsing a whole log, and version() to notice new samples cheaply.
+
+The old ndvi_log.csv kept only HH:MM:SS; import_csv() brings it over,
+reconstructing the dates from the order of the rows (see there).
+"""
+import csv
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+NDVI_DB = "ndvi.db"
+DEFAULT_CAMERA = "default"
+
+# 정규화된 NDVI(0~1)를 16칸으로 나눈 픽셀 수 히스토그램
+HIST_BINS = 16
+
+DDL = """
+CREATE TABLE IF NOT EXISTS ndvi_samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts_ms INTEGER NOT NULL,
+    camera_id TEXT NOT NULL,
+    mean REAL NOT NULL,
+    median REAL NOT NULL,
+    hist BLOB
+);
+CREATE INDEX IF NOT EXISTS ndvi_samples_camera_ts ON ndvi_samples (camera_id, ts_ms);
+CREATE INDEX IF NOT EXISTS ndvi_samples_ts ON ndvi_samples (ts_ms);
+"""
+
+COLUMNS = "ts_ms, camera_id, mean, median, hist"
+
+
+def summarize(levels):
+    """
+    (mean, median, histogram) of an 8-bit NDVI image (0..255 -> 0..1).
+    Works from one 256-level bincount, so it is cheaper than np.mean plus
+    np.median over the float image and gives the same numbers (up to rounding).
+    """
+    counts = np.bincount(np.asarray(levels, dtype=np.uint8).ravel(), minlength=256)
+    n = int(counts.sum())
+    if n == 0:
+        return None, None, [0] * HIST_BINS
+    mean = float(counts @ np.arange(256)) / n / 255.0
+    # 짝수 개이면 가운데 두 값의 평균 (np.median과 같음)
+    cumulative = np.cumsum(counts)
+    lo = int(np.searchsorted(cumulative, (n - 1) // 2, side="right"))
+    hi = int(np.searchsorted(cumulative, n // 2, side="right"))
+    median = (lo + hi) / 2 / 255.0
+    hist = counts.reshape(HIST_BINS, -1).sum(axis=1)
+    return mean, median, [int(c) for c in hist]
+
+
+def _sample(row):
+    ts_ms, camera_id, mean, median, hist = row
+    return {
+        "ts_ms": ts_ms,
+        "camera_id": camera_id,
+        "mean": mean,
+        "median": median,
+        "hist": np.frombuffer(hist, dtype="<u4").tolist() if hist else None,
+    }
+
+
+class NdviStore:
+    def __init__(self, path=NDVI_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(DDL)
+
+    def add(self, ts_ms, mean, median, hist=None, camera_id=DEFAULT_CAMERA):
+        blob = np.asarray(hist, dtype="<u4").tobytes() if hist is not None else None
+        with self.lock, self.conn:
+            self.conn.execute(f"INSERT INTO ndvi_samples ({COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                              (int(ts_ms), camera_id, float(mean), float(median), blob))
+
+    def range(self, start_ms, end_ms, camera_id=DEFAULT_CAMERA):
+        """Samples with start_ms <= ts_ms < end_ms, oldest first; camera_id=None for every camera."""
+        if camera_id is None:
+            sql = f"SELECT {COLUMNS} FROM ndvi_samples WHERE ts_ms >= ? AND ts_ms < ? ORDER BY ts_ms, id"
+            params = (start_ms, end_ms)
+        else:
+            sql = (f"SELECT {COLUMNS} FROM ndvi_samples WHERE camera_id = ? AND ts_ms >= ? AND ts_ms < ? "
+                   "ORDER BY ts_ms, id")
+            params = (camera_id, start_ms, end_ms)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [_sample(r) for r in rows]
+
+    def recent(self, n, camera_id=DEFAULT_CAMERA):
+        """The newest n samples of a camera, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {COLUMNS} FROM ndvi_samples WHERE camera_id = ? ORDER BY ts_ms DESC, id DESC LIMIT ?",
+                (camera_id, n)).fetchall()
+        return [_sample(r) for r in reversed(rows)]
+
+    def latest(self, camera_id=DEFAULT_CAMERA):
+        rows = self.recent(1, camera_id)
+        return rows[0] if rows else None
+
+    def version(self):
+        """Changes whenever a sample is added (also by another process); one index lookup."""
+        with self.lock:
+            return self.conn.execute("SELECT max(id) FROM ndvi_samples").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def import_csv(csv_path, store, camera_id=DEFAULT_CAMERA, last_day=None):
+    """
+    Copy an old ndvi_log.csv (Time, Average, Median) into the store; returns the row count.
+
+    The CSV has no dates. Rows were appended in capture order, so walking
+    back from the last row (taken to be on `last_day`, by default the
+    file's modification date) a time later than the row after it means
+    the day before. Gaps of a whole day or more cannot be recovered.
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = [r for r in csv.reader(f) if r and r[0] != "Time"]
+    if last_day is None:
+        last_day = date.fromtimestamp(os.path.getmtime(csv_path))
+
+    samples = []
+    day = last_day
+    next_clock = None
+    for row in reversed(rows):
+        clock = datetime.strptime(row[0], "%H:%M:%S").time()
+        if next_clock is not None and clock > next_clock:
+            day -= timedelta(days=1)
+        next_clock = clock
+        ts_ms = int(time.mktime(datetime.combine(day, clock).timetuple()) * 1000)
+        samples.append((ts_ms, float(row[1]), float(row[2])))
+
+    for ts_ms, mean, median in reversed(samples):
+        store.add(ts_ms, mean, median, camera_id=camera_id)
+    return len(samples)
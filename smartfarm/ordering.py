@@ -0,0 +1,94 @@
+"""
+Per-device duplicate detection and reordering for the ingest stream.
+
+ESP32 nodes may resend a reading after a failed POST, or flush a burst of
+buffered readings after a reconnect. SeqTracker drops repeats of a
+(device_id, seq) pair it has seen recently (the sensor_logs unique index
+catches older ones), and ReorderBuffer hands readings to stream consumers
+in device-timestamp order once they are older than the reorder window.
+"""
+import heapq
+import itertools
+
+
+class SeqTracker:
+    """Remember the last `window` sequence numbers per device."""
+
+    def __init__(self, window=4096):
+        self.window = window
+        self._devices = {}
+
+    def is_duplicate(self, device_id, seq):
+        state = self._devices.get(device_id)
+        if state is None:
+            self._devices[device_id] = [seq, {seq}]
+            return False
+
+        highest, seen = state
+        if seq in seen:
+            return True
+        if seq < highest - self.window:
+            # 기억 범위보다 오래된 번호 -> DB 유니크 인덱스가 판단
+            return False
+
+        seen.add(seq)
+        if seq > highest:
+            state[0] = highest = seq
+            if len(seen) > 2 * self.window:
+                state[1] = {s for s in seen if s >= highest - self.window}
+        return False
+
+
+class ReorderBuffer:
+    """
+    Release readings per device in ts_ms order.
+
+    A reading is held until the device's newest timestamp is `window_ms`
+    past it, or it has waited `window_ms` of wall time, whichever is first.
+    Readings older than what was already released are "late": they are
+    passed through immediately so consumers can merge them in place.
+    """
+
+    def __init__(self, window_ms=2000):
+        self.window_ms = window_ms
+        self._heaps = {}
+        self._newest = {}
+        self._released = {}
+        self._tie = itertools.count()
+        self.late = 0
+
+    def push(self, row, now_ms):
+        device = row["device_id"]
+        ts = row["ts_ms"]
+        if ts <= self._released.get(device, -1):
+            self.late += 1
+            return [row]
+
+        heap = self._heaps.setdefault(device, [])
+        heapq.heappush(heap, (ts, next(self._tie), now_ms, row))
+        if ts > self._newest.get(device, -1):
+            self._newest[device] = ts
+        return self._release(device, now_ms)
+
+    def _release(self, device, now_ms):
+        heap = self._heaps[device]
+        limit = self._newest[device] - self.window_ms
+        out = []
+        while heap and (heap[0][0] <= limit or heap[0][2] <= now_ms - self.window_ms):
+            ts, _, _, row = heapq.heappop(heap)
+            self._released[device] = ts
+            out.append(row)
+        return out
+
+    def drain(self, now_ms=None):
+        """Release everything that has waited long enough; everything if now_ms is None."""
+        out = []
+        for device, heap in self._heaps.items():
+            if now_ms is None:
+                while heap:
+                    ts, _, _, row = heapq.heappop(heap)
+                    self._released[device] = ts
+                    out.append(row)
+            else:
+                out.extend(self._release(device, now_ms))
+        return out
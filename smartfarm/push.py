@@ -0,0 +1,187 @@
+"""
+Server-sent events for live sensor readings and NDVI samples.
+
+The ASGI entry point (config/asgi.py) routes STREAM_PATH here. While at
+least one browser is connected, one watcher task per web process polls
+the cross-process sources every POLL_INTERVAL seconds:
+
+    sensor   latest/*.json written by the ingestion processes (smartfarm.latest)
+    ndvi     the NDVI sample store written by ndvi.py (smartfarm.ndvi_store)
+
+and offers each change to every client. A client keeps only the newest
+pending event per (event, key), so a burst of readings, or a browser
+that reads slowly, collapses into one event per device instead of a
+growing queue. A client whose connection does not take an event within
+SEND_TIMEOUT is dropped. Idle clients cost one sleeping coroutine and a
+keep-alive comment every KEEPALIVE seconds.
+"""
+import asyncio
+import json
+import logging
+
+from smartfarm.latest import SnapshotReader
+from smartfarm.ndvi_store import DEFAULT_CAMERA, NdviStore
+
+log = logging.getLogger("SmartFarm")
+
+STREAM_PATH = "/api/stream"
+POLL_INTERVAL = 0.25
+KEEPALIVE = 15.0
+SEND_TIMEOUT = 10.0
+
+
+class SensorSource:
+    """Per-device changes of the latest-reading snapshot."""
+
+    def __init__(self, reader=None):
+        self.reader = reader or SnapshotReader()
+        self._devices = {}
+
+    def snapshot(self):
+        _, _, self._devices = self.reader.current()
+        return [("sensor", device, row) for device, row in self._devices.items()]
+
+    def poll(self):
+        _, _, devices = self.reader.current()
+        if devices is self._devices:
+            return []
+        previous, self._devices = self._devices, devices
+        return [("sensor", device, row) for device, row in devices.items() if previous.get(device) != row]
+
+
+class NdviSource:
+    """The newest NDVI sample of a camera, re-read only when the store's version changes."""
+
+    def __init__(self, store=None, camera_id=DEFAULT_CAMERA):
+        self.store = store
+        self.camera_id = camera_id
+        self._version = None
+        self._sample = None
+
+    def _read(self):
+        if self.store is None:
+            self.store = NdviStore()  # 첫 연결 때 열기
+        version = self.store.version()
+        if version is None or version == self._version:
+            return False
+        self._version = version
+        sample = self.store.latest(self.camera_id)
+        if sample is None:
+            return False
+        self._sample = {"ts_ms": sample["ts_ms"], "avg": sample["mean"], "median": sample["median"],
+                        "hist": sample["hist"]}
+        return True
+
+    def snapshot(self):
+        self._read()
+        return [("ndvi", self.camera_id, self._sample)] if self._sample else []
+
+    def poll(self):
+        return [("ndvi", self.camera_id, self._sample)] if self._read() else []
+
+
+class Client:
+    def __init__(self):
+        self.pending = {}  # (event, key) -> data, 키마다 최신 값 하나만 유지
+        self.wakeup = asyncio.Event()
+
+    def offer(self, event, key, data):
+        self.pending[(event, key)] = data
+        self.wakeup.set()
+
+    def take(self):
+        items, self.pending = self.pending, {}
+        self.wakeup.clear()
+        return items
+
+
+class Broadcaster:
+    def __init__(self, sources, interval=POLL_INTERVAL):
+        self.sources = list(sources)
+        self.interval = interval
+        self.clients = set()
+        self._task = None
+
+    def add(self, client):
+        self.clients.add(client)
+        for source in self.sources:
+            for item in source.snapshot():
+                client.offer(*item)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+
+    def remove(self, client):
+        self.clients.discard(client)
+
+    def publish(self, event, key, data):
+        for client in self.clients:
+            client.offer(event, key, data)
+
+    async def _watch(self):
+        # 연결된 브라우저가 없으면 감시도 멈춤
+        while self.clients:
+            for source in self.sources:
+                try:
+                    changes = source.poll()
+                except Exception:
+                    log.exception(f"[PUSH] {type(source).__name__} poll failed")
+                    continue
+                for item in changes:
+                    self.publish(*item)
+            await asyncio.sleep(self.interval)
+
+
+def sse_event(event, data):
+    """One text/event-stream event with a compact JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+def encode_events(items):
+    return "".join(sse_event(event, data) for (event, _), data in items.items()).encode("utf-8")
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def stream(scope, receive, send, broadcaster):
+    """ASGI handler for one text/event-stream connection."""
+    client = Client()
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await asyncio.wait_for(send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),  # nginx 등 프록시에서 버퍼링하지 않도록
+            ],
+        }), SEND_TIMEOUT)
+        broadcaster.add(client)
+        while True:
+            waiter = asyncio.ensure_future(client.wakeup.wait())
+            done, _ = await asyncio.wait({waiter, disconnected}, timeout=KEEPALIVE,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                waiter.cancel()
+                break
+            if waiter in done:
+                body = encode_events(client.take())
+            else:
+                waiter.cancel()
+                body = b": keepalive\n\n"
+            # 느린 클라이언트: 그동안 쌓인 이벤트는 키마다 최신 값으로 덮어써짐
+            await asyncio.wait_for(send({"type": "http.response.body", "body": body, "more_body": True}),
+                                   SEND_TIMEOUT)
+    except (asyncio.TimeoutError, OSError):
+        log.info("[PUSH] dropping slow or closed client")
+    finally:
+        broadcaster.remove(client)
+        disconnected.cancel()
+
+
+broadcaster = Broadcaster([SensorSource(), NdviSource()])
@@ -0,0 +1,258 @@
+"""
+Time-range reads over the partitioned sensor store for the JSON API.
+
+Readings come back in (ts_ms, device_id) order, merged from the plain
+rows of hot partitions (read straight from the sensor_logs_ts covering
+index) and the compressed blocks of cold ones. Pages are addressed by a
+keyset cursor "<ts_ms>.<n>": the timestamp of the last row returned and
+how many rows with that timestamp have been returned so far. The next
+page seeks to ts_ms in the index instead of counting OFFSET rows, and
+rows are fetched in small batches, so neither a deep page nor a full
+export holds more than one batch (or one day's blocks) in memory.
+"""
+import heapq
+import itertools
+import json
+import threading
+
+import numpy as np
+
+from smartfarm import blockcodec, downsample, rollups, sensor_db
+from smartfarm.columnstore import ColumnStore
+from smartfarm.ingest import FIELDS as INGEST_FIELDS, STORE_DIR
+
+DEFAULT_PAGE = 1000
+MAX_PAGE = 10000
+FETCH_ROWS = 2000
+
+# 차트용 시계열: 목표 점 수의 몇 배 정도만 읽어서 다운샘플링
+CHART_METHODS = ("lttb", "minmax")
+MAX_CHART_POINTS = 5000
+CHART_OVERSAMPLE = 4
+
+FIELD_NAMES = [field for field, _ in rollups.FIELDS]
+INT_FIELDS = {name for name, kind in INGEST_FIELDS if kind == "int"}
+
+_store = None
+_raw = None
+_store_lock = threading.Lock()
+
+
+def get_store(path=sensor_db.DB_FILE):
+    """Process-wide store for read requests, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = sensor_db.PartitionedStore(path)
+        return _store
+
+
+class RawSeries:
+    """
+    raw_series() for rollups.query_series: memory-mapped slices of the
+    columnar store (smartfarm.columnstore) from the first reading it holds
+    for the device on, the partitioned SQLite store before that (readings
+    stored before the device reached the columnar store).
+    """
+
+    def __init__(self, store, columns):
+        self.store = store
+        self.columns = columns
+
+    def raw_series(self, device_id, field, start_ms, end_ms):
+        since = self.columns.device_since(device_id)
+        if since is None or since >= end_ms:
+            return self.store.raw_series(device_id, field, start_ms, end_ms)
+        ts, values = self.columns.raw_series(device_id, field, max(start_ms, since), end_ms)
+        if start_ms < since:
+            old_ts, old_values = self.store.raw_series(device_id, field, start_ms, since)
+            ts, values = np.concatenate([old_ts, ts]), np.concatenate([old_values, values])
+        return ts, values
+
+
+def get_raw(path=sensor_db.DB_FILE, store_dir=STORE_DIR):
+    """Process-wide RawSeries over get_store() and a read-only view of the columnar store."""
+    global _raw
+    store = get_store(path)
+    with _store_lock:
+        if _raw is None:
+            _raw = RawSeries(store, ColumnStore(store_dir, readonly=True))
+        return _raw
+
+
+def encode_cursor(ts_ms, n):
+    return f"{ts_ms}.{n}"
+
+
+def decode_cursor(cursor):
+    """(ts_ms, rows already returned at ts_ms); raises ValueError on a malformed cursor."""
+    ts, _, n = cursor.partition(".")
+    ts, n = int(ts), int(n or 0)
+    if n < 0:
+        raise ValueError(cursor)
+    return ts, n
+
+
+def check_fields(fields):
+    if not fields:
+        return list(FIELD_NAMES)
+    unknown = [f for f in fields if f not in rollups.FIELD_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return list(fields)
+
+
+def _value(field, v):
+    if v is None or v != v:  # NaN
+        return None
+    if field in INT_FIELDS:
+        return int(v)
+    return v
+
+
+def _plain_rows(store, day, start_ms, end_ms, device_id, fields):
+    """Rows of one partition's sensor_logs in (ts_ms, device_id, id) order, FETCH_ROWS at a time."""
+    columns = ", ".join(rollups.FIELD_COLUMNS[f] for f in fields)
+    where = "ts_ms < ?"
+    params = [end_ms]
+    if device_id is not None:
+        where += " AND device_id = ?"
+        params.append(device_id)
+
+    key = None
+    while True:
+        with store.lock:
+            alias = store.attach(day)
+            if alias is None:
+                return
+            if key is None:
+                seek, seek_params = "ts_ms >= ?", [start_ms]
+            else:
+                seek, seek_params = "(ts_ms, device_id, id) > (?, ?, ?)", list(key)
+            batch = store.conn.execute(
+                f"SELECT ts_ms, device_id, id, {columns} FROM {alias}.sensor_logs "
+                f"WHERE {seek} AND {where} ORDER BY ts_ms, device_id, id LIMIT {FETCH_ROWS}",
+                seek_params + params,
+            ).fetchall()
+        for r in batch:
+            yield r[0], r[1], [_value(f, v) for f, v in zip(fields, r[3:])]
+        if len(batch) < FETCH_ROWS:
+            return
+        key = batch[-1][:3]
+
+
+def _block_rows(store, day, start_ms, end_ms, device_id, fields):
+    """Decoded rows of one partition's compressed blocks in (ts_ms, device_id) order."""
+    sql = "SELECT device_id, data FROM {alias}.sensor_blocks WHERE start_ms < ? AND end_ms >= ?"
+    params = [end_ms, start_ms]
+    if device_id is not None:
+        sql += " AND device_id = ?"
+        params.append(device_id)
+    sql += " ORDER BY id"  # 같은 시각의 행 순서가 페이지마다 같아야 커서로 건너뛸 수 있음
+    with store.lock:
+        alias = store.attach(day)
+        if alias is None:
+            return
+        blocks = store.conn.execute(sql.format(alias=alias), params).fetchall()
+    if not blocks:
+        return
+
+    names = set(fields)
+    per_block = []
+    for device, data in blocks:
+        ts, values = blockcodec.decode(data, names)
+        keep = (ts >= start_ms) & (ts < end_ms)
+        columns = [values[f][keep].tolist() if f in values else itertools.repeat(None) for f in fields]
+        rows = [
+            (t, device, [_value(f, v) for f, v in zip(fields, vals)])
+            for t, *vals in zip(ts[keep].tolist(), *columns)
+        ]
+        per_block.append(rows)
+    yield from heapq.merge(*per_block, key=lambda r: (r[0], r[1]))
+
+
+def iter_readings(store, start_ms, end_ms, device_id=None, fields=None, cursor=None):
+    """Yield (ts_ms, device_id, [values]) over [start_ms, end_ms), resuming after `cursor`."""
+    fields = check_fields(fields)
+    skip_ts, skip = None, 0
+    if cursor:
+        skip_ts, skip = decode_cursor(cursor)
+        start_ms = max(start_ms, skip_ts)
+
+    for day in store.days(start_ms, end_ms):
+        rows = heapq.merge(
+            _plain_rows(store, day, start_ms, end_ms, device_id, fields),
+            _block_rows(store, day, start_ms, end_ms, device_id, fields),
+            key=lambda r: (r[0], r[1]),
+        )
+        for row in rows:
+            if skip and row[0] == skip_ts:
+                skip -= 1
+                continue
+            yield row
+
+
+def stream_page(store, start_ms, end_ms, device_id=None, fields=None, cursor=None, limit=DEFAULT_PAGE):
+    """
+    One page as JSON text chunks, written while the rows are read:
+    {"fields": [...], "rows": [[ts_ms, device_id, v...], ...], "next_cursor": "..." | null}
+    """
+    fields = check_fields(fields)
+    prev_ts, prev_n = decode_cursor(cursor) if cursor else (None, 0)
+    rows = iter_readings(store, start_ms, end_ms, device_id, fields, cursor)
+
+    yield '{"fields":' + json.dumps(fields) + ',"rows":['
+    last_ts, n, count = prev_ts, prev_n, 0
+    buf = []
+    for ts, device, values in itertools.islice(rows, limit):
+        buf.append(json.dumps([ts, device] + values, separators=(",", ":")))
+        n = n + 1 if ts == last_ts else 1
+        last_ts = ts
+        count += 1
+        if len(buf) >= 500:
+            yield ("," if count > len(buf) else "") + ",".join(buf)
+            buf = []
+    if buf:
+        yield ("," if count > len(buf) else "") + ",".join(buf)
+
+    more = count == limit and next(rows, None) is not None
+    next_cursor = encode_cursor(last_ts, n) if more else None
+    yield '],"next_cursor":' + json.dumps(next_cursor) + "}"
+
+
+def stream_ndjson(store, start_ms, end_ms, device_id=None, fields=None):
+    """Every reading in the range as newline-delimited JSON objects, for exports."""
+    fields = check_fields(fields)
+    buf = []
+    for ts, device, values in iter_readings(store, start_ms, end_ms, device_id, fields):
+        obj = {"ts_ms": ts, "device_id": device}
+        obj.update(zip(fields, values))
+        buf.append(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+        if len(buf) >= 500:
+            yield "\n".join(buf) + "\n"
+            buf = []
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+
+def chart_series(store, device_id, field, start_ms, end_ms, points, method="lttb", raw=None):
+    """
+    About `points` (ts_ms, value) pairs of one field for a chart, whatever the range.
+    The rollup level is chosen so that roughly CHART_OVERSAMPLE * points
+    buckets are read, then LTTB (or min/max buckets) picks the points to send.
+    Returns (resolution_ms read, [[ts_ms, value], ...]); raw readings come from `raw` (see rollups.query_series).
+    """
+    resolution_ms = (end_ms - start_ms) // (points * CHART_OVERSAMPLE)
+    rows = rollups.query_series(store, device_id, field, start_ms, end_ms, resolution_ms, raw)
+    if not rows:
+        return resolution_ms, []
+    data = np.array(rows, dtype=np.float64)
+    ts, avg, low, high = data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+    if len(rows) <= points:
+        xs, ys = ts, avg
+    elif method == "minmax":
+        xs, ys = downsample.minmax(ts, low, high, points)
+    else:
+        keep = downsample.lttb(ts, avg, points)
+        xs, ys = ts[keep], avg[keep]
+    return resolution_ms, [[int(t), v] for t, v in zip(xs.tolist(), ys.tolist())]
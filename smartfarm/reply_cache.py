@@ -0,0 +1,145 @@
+"""
+Cache of counseling replies for repeated questions.
+
+Entries are keyed by the plant type and a normalized form of the
+question (Unicode NFKC, lower case, punctuation and extra spaces
+removed), so "잎이 노래져요!" and "잎이  노래져요" share one reply. The
+cache is an LRU bounded by entry count and total reply size, and entries
+expire after `ttl` seconds.
+
+With `similarity` > 0, a question without an exact entry can also reuse
+the reply to the most similar cached question of the same plant type.
+Questions are compared as hashed 2-3-gram vectors (cosine) over their
+jamo, i.e. with Hangul syllables decomposed (NFD), so 노래져요 and
+노래졌어요 still share most n-grams. This needs nothing beyond NumPy and
+costs one matrix-vector product. Similar is not the same question;
+keep the threshold high (0.8 or more) or leave it off.
+
+stats() reports hits (exact / similar), misses and the hit rate.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+VECTOR_DIM = 1024
+NGRAMS = (2, 3)
+
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _SPACES.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+def vectorize(text):
+    """Unit-length hashed jamo n-gram counts of normalized text."""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    padded = " " + unicodedata.normalize("NFD", text) + " "
+    for n in NGRAMS:
+        for i in range(len(padded) - n + 1):
+            # 파이썬 hash()는 프로세스마다 달라지지만 캐시도 프로세스 안에서만 쓰므로 괜찮음
+            vector[hash(padded[i:i + n]) % VECTOR_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Entry:
+    __slots__ = ("reply", "expires", "vector")
+
+    def __init__(self, reply, expires, vector):
+        self.reply = reply
+        self.expires = expires
+        self.vector = vector
+
+
+class ReplyCache:
+    def __init__(self, max_entries=512, max_chars=1_000_000, ttl=7 * 24 * 3600, similarity=0.0, enabled=True):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self.similarity = similarity
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (plant, question) -> _Entry, 오래 안 쓴 것부터
+        self._chars = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _key(self, plant_type, question):
+        return normalize(plant_type), normalize(question)
+
+    def get(self, plant_type, question):
+        """A cached reply for the question, or None."""
+        if not self.enabled:
+            return None
+        key = self._key(plant_type, question)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                self._remove(key)
+                entry = None
+            if entry is None and self.similarity > 0:
+                key, entry = self._most_similar(key, now)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if key == self._key(plant_type, question):
+                self.hits += 1
+            else:
+                self.similar_hits += 1
+            return entry.reply
+
+    def _most_similar(self, key, now):
+        plant, question = key
+        keys = [k for k, e in self._entries.items() if k[0] == plant and e.expires > now]
+        if not keys:
+            return None, None
+        scores = np.stack([self._entries[k].vector for k in keys]) @ vectorize(question)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None, None
+        return keys[best], self._entries[keys[best]]
+
+    def put(self, plant_type, question, reply):
+        if not self.enabled or not reply or len(reply) > self.max_chars:
+            return
+        key = self._key(plant_type, question)
+        vector = vectorize(key[1]) if self.similarity > 0 else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(reply, time.monotonic() + self.ttl, vector)
+            self._chars += len(reply)
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._chars -= len(entry.reply)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "chars": self._chars,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.similar_hits) / lookups, 3) if lookups else None,
+            }
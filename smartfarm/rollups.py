@@ -0,0 +1,147 @@
+"""
+Minute / hour / day rollups of sensor_logs.
+
+Each level is a table of (device_id, field, bucket_ms) -> count, sum, min,
+max in the main database file. SqliteSink updates all levels in the same
+transaction as the raw insert into a day partition, aggregating only the
+rows that batch added, so a late sample just folds into its (old) bucket.
+Rollups outlive the raw partitions they were built from.
+query_series() answers range queries from the coarsest level that still
+meets the requested resolution.
+"""
+import time
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# 일 단위 버킷은 서버의 로컬 자정 기준으로 자름
+TZ_OFFSET_MS = time.localtime().tm_gmtoff * 1000
+
+# (테이블, 버킷 크기) - 세밀한 것부터
+LEVELS = (
+    ("sensor_rollup_1m", MINUTE_MS),
+    ("sensor_rollup_1h", HOUR_MS),
+    ("sensor_rollup_1d", DAY_MS),
+)
+
+# 집계 대상 필드 (정규화된 이름, sensor_logs 컬럼 이름)
+FIELDS = (
+    ("temp_air", "temp_air"),
+    ("humidity", "humidity"),
+    ("temp_water", "temp_water"),
+    ("soil_pct", "soil_moisture"),
+    ("cds_raw", "cds1"),
+    ("light_pct", "light_pct"),
+    ("soil_raw", "soil_raw"),
+)
+FIELD_COLUMNS = dict(FIELDS)
+
+
+def bucket_sql(size_ms):
+    if size_ms == DAY_MS and TZ_OFFSET_MS:
+        return f"(ts_ms + {TZ_OFFSET_MS}) - (ts_ms + {TZ_OFFSET_MS}) % {size_ms} - {TZ_OFFSET_MS}"
+    return f"ts_ms - ts_ms % {size_ms}"
+
+
+def create_tables(conn):
+    """Create missing rollup tables; returns True if any was new."""
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    created = False
+    for table, _ in LEVELS:
+        if table in existing:
+            continue
+        conn.execute(
+            f'''
+            CREATE TABLE {table} (
+                device_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                bucket_ms INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                sum REAL NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                PRIMARY KEY (device_id, field, bucket_ms)
+            ) WITHOUT ROWID
+            '''
+        )
+        created = True
+    return created
+
+
+def _upsert_statements(source):
+    statements = []
+    for table, size_ms in LEVELS:
+        bucket = bucket_sql(size_ms)
+        for field, column in FIELDS:
+            statements.append(
+                f'''
+                INSERT INTO {table} (device_id, field, bucket_ms, count, sum, min, max)
+                SELECT device_id, '{field}', {bucket}, COUNT({column}), SUM({column}), MIN({column}), MAX({column})
+                FROM {source}
+                WHERE id > ? AND {column} IS NOT NULL AND ts_ms IS NOT NULL AND device_id IS NOT NULL
+                GROUP BY device_id, {bucket}
+                ON CONFLICT (device_id, field, bucket_ms) DO UPDATE SET
+                    count = count + excluded.count,
+                    sum = sum + excluded.sum,
+                    min = MIN(min, excluded.min),
+                    max = MAX(max, excluded.max)
+                '''
+            )
+    return statements
+
+
+# 원본 테이블(파티션)별로 만든 SQL 문장 캐시
+_statements = {}
+
+
+def update_rollups(conn, after_id, source="sensor_logs"):
+    """Fold rows of `source` with id > after_id into every rollup level (caller owns the transaction)."""
+    statements = _statements.get(source)
+    if statements is None:
+        statements = _statements[source] = _upsert_statements(source)
+    for sql in statements:
+        conn.execute(sql, (after_id,))
+
+
+def rebuild_rollups(conn, source="sensor_logs"):
+    """Recompute every rollup from `source` (used once when the tables are first created)."""
+    for table, _ in LEVELS:
+        conn.execute(f"DELETE FROM {table}")
+    update_rollups(conn, 0, source)
+
+
+def pick_level(resolution_ms):
+    """Coarsest rollup table whose bucket is no wider than resolution_ms, or None for raw rows."""
+    chosen = None
+    for table, size_ms in LEVELS:
+        if size_ms <= resolution_ms:
+            chosen = (table, size_ms)
+    return chosen
+
+
+def query_series(store, device_id, field, start_ms, end_ms, resolution_ms=0, raw=None):
+    """
+    [(bucket_ms, avg, min, max, count), ...] for one field over [start_ms, end_ms).
+    `store` is a sensor_db.PartitionedStore. With resolution_ms below one
+    minute raw readings are returned (count 1), read from `raw` (anything
+    with raw_series(), such as query.RawSeries; default `store`); raw data
+    past the SQLite retention period is gone, so those ranges come back
+    empty unless `raw` still has them.
+    """
+    level = pick_level(resolution_ms)
+    if level is None:
+        ts, values = (store if raw is None else raw).raw_series(device_id, field, start_ms, end_ms)
+        return [(t, v, v, v, 1) for t, v in zip(ts.tolist(), values.tolist())]
+
+    table, size_ms = level
+    with store.lock:
+        rows = store.conn.execute(
+            f'''
+            SELECT bucket_ms, sum / count, min, max, count FROM main.{table}
+            WHERE device_id = ? AND field = ? AND bucket_ms > ? AND bucket_ms < ?
+            ORDER BY bucket_ms
+            ''',
+            (device_id, field, start_ms - size_ms, end_ms),
+        )
+        return rows.fetchall()
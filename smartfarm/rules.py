@@ -0,0 +1,260 @@
+"""
+Automatic watering and lighting rules evaluated on the ingest stream.
+
+A RuleEngine is an Ingestor listener (subscribed with ordered=False, so
+it sees each reading as soon as it is accepted) that keeps a few numbers
+of state per (rule, device) and decides in constant time per reading:
+
+    on / off      thresholds with a hysteresis band between them
+                  (on=30, off=45: start below 30 %, stop above 45 %)
+    pulse_ms      the command runs the actuator for a fixed time (watering);
+                  while the value stays inside the band it is repeated,
+                  at most every min_interval_ms
+    min_interval  minimum time between two commands of a rule (soak time,
+                  no flapping)
+    duty          at most max_on_ms of actuator time in each window_ms
+                  (fixed windows aligned to the epoch, so the state is the
+                  window start and the time used in it)
+
+Every decision uses the reading's own ts_ms, never the wall clock, so
+replay() over stored history issues exactly the commands the live engine
+would have. Commands go to on_command(command) as
+{"ts_ms", "device_id", "rule", "cmd", "field", "value"}: MqttDispatcher
+publishes them to the device (smartfarm.actuators), PendingCommands
+holds them for HTTP devices until the response to their next reading.
+"""
+import logging
+import os
+import threading
+import uuid
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("SmartFarm")
+
+# SMARTFARM_RULES=0 이면 자동 제어를 끔 (수동 버튼만 사용)
+ENABLED = os.getenv("SMARTFARM_RULES", "1") != "0"
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+
+
+class Rule:
+    def __init__(self, name, field, on, off, on_cmd, off_cmd=None, pulse_ms=None, min_interval_ms=0,
+                 max_on_ms=None, window_ms=HOUR_MS, devices=None):
+        if on == off:
+            raise ValueError(f"{name}: on and off thresholds must differ (hysteresis band)")
+        if pulse_ms is None and off_cmd is None:
+            raise ValueError(f"{name}: a rule without pulse_ms needs an off_cmd")
+        self.name = name
+        self.field = field
+        self.on = on
+        self.off = off
+        self.rising = on > off  # True: 값이 on 이상이면 켬 (환기 등), False: on 이하이면 켬 (급수, 조명)
+        self.on_cmd = on_cmd
+        self.off_cmd = off_cmd
+        self.pulse_ms = pulse_ms
+        self.min_interval_ms = min_interval_ms
+        self.max_on_ms = max_on_ms
+        self.window_ms = window_ms
+        self.devices = set(devices) if devices else None
+
+    def wants_on(self, value):
+        return value >= self.on if self.rising else value <= self.on
+
+    def wants_off(self, value):
+        return value <= self.off if self.rising else value >= self.off
+
+
+# 펌웨어 WATER_MS와 같은 값 (물주기 명령 한 번에 펌프가 켜지는 시간)
+WATER_PULSE_MS = 3000
+
+DEFAULT_RULES = (
+    # 토양 수분 30 % 이하이면 물주기, 45 %를 넘을 때까지 5분마다 반복 (1시간에 펌프 최대 15초)
+    Rule("watering", "soil_pct", on=30, off=45, on_cmd="water", pulse_ms=WATER_PULSE_MS,
+         min_interval_ms=5 * MINUTE_MS, max_on_ms=5 * WATER_PULSE_MS, window_ms=HOUR_MS),
+    # 조도 20 % 이하이면 식물등 켜고 40 % 이상이면 끔 (하루 최대 16시간)
+    # 조도 센서가 식물등 빛도 받으면 켜고 끄기를 반복할 수 있으므로 min_interval로 간격을 둠
+    Rule("lighting", "light_pct", on=20, off=40, on_cmd="light", off_cmd="light_off",
+         min_interval_ms=5 * MINUTE_MS, max_on_ms=16 * HOUR_MS, window_ms=24 * HOUR_MS),
+)
+
+
+class _State:
+    __slots__ = ("active", "last_ts", "last_cmd_ts", "window", "used")
+
+    def __init__(self):
+        self.active = False       # pulse 규칙: 구간 안(급수 중), 연속 규칙: 켜져 있음
+        self.last_ts = None
+        self.last_cmd_ts = None
+        self.window = None        # 작동 시간 한도를 세는 현재 구간의 시작 (ms)
+        self.used = 0             # 그 구간에서 작동한 시간 (ms)
+
+
+class RuleEngine:
+    def __init__(self, rules=DEFAULT_RULES, on_command=None):
+        self.rules = tuple(rules)
+        self.on_command = on_command
+        self._lock = threading.Lock()
+        self._states = {}  # (규칙 이름, device_id) -> _State
+        self.counts = Counter()
+
+    def __call__(self, rows):
+        """Ingestor listener: evaluate each row and hand the resulting commands to on_command."""
+        commands = []
+        with self._lock:
+            for row in rows:
+                commands.extend(self._evaluate(row))
+        if self.on_command is not None:
+            for command in commands:
+                try:
+                    self.on_command(command)
+                except Exception:
+                    log.exception(f"[RULES] failed to dispatch {command}")
+
+    def evaluate(self, row):
+        """Commands triggered by one reading (updates the engine's state)."""
+        with self._lock:
+            return self._evaluate(row)
+
+    def _evaluate(self, row):
+        commands = []
+        ts_ms, device_id = row["ts_ms"], row["device_id"]
+        for rule in self.rules:
+            value = row.get(rule.field)
+            if value is None or (rule.devices is not None and device_id not in rule.devices):
+                continue
+            key = (rule.name, device_id)
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _State()
+            elif ts_ms < state.last_ts:
+                self.counts["out_of_order"] += 1
+                continue  # 늦게 도착한 예전 측정값으로는 판단하지 않음
+            cmd = self._decide(rule, state, ts_ms, value)
+            state.last_ts = ts_ms
+            if cmd is not None:
+                state.last_cmd_ts = ts_ms
+                self.counts[f"{rule.name}.{cmd}"] += 1
+                commands.append({"ts_ms": ts_ms, "device_id": device_id, "rule": rule.name, "cmd": cmd,
+                                 "field": rule.field, "value": value})
+        return commands
+
+    def _decide(self, rule, state, ts_ms, value):
+        if rule.max_on_ms is not None:
+            window = ts_ms - ts_ms % rule.window_ms
+            on_since = state.last_ts
+            if window != state.window:
+                state.window, state.used = window, 0
+                on_since = window if on_since is not None else None
+            if rule.pulse_ms is None and state.active and on_since is not None:
+                state.used += ts_ms - on_since  # 지난 측정 이후 켜져 있던 시간
+        ready = state.last_cmd_ts is None or ts_ms - state.last_cmd_ts >= rule.min_interval_ms
+        has_budget = lambda need: rule.max_on_ms is None or rule.max_on_ms - state.used >= need
+
+        if rule.pulse_ms is not None:
+            if rule.wants_off(value):
+                state.active = False
+            elif rule.wants_on(value):
+                state.active = True
+            if state.active and ready and has_budget(rule.pulse_ms):
+                state.used += rule.pulse_ms
+                return rule.on_cmd
+            return None
+
+        if state.active:
+            # 작동 시간 한도를 다 쓰면 min_interval과 상관없이 끔
+            if (rule.wants_off(value) and ready) or not has_budget(1):
+                state.active = False
+                return rule.off_cmd
+        elif rule.wants_on(value) and ready and has_budget(max(rule.min_interval_ms, 1)):
+            state.active = True
+            return rule.on_cmd
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {"devices": len({device for _, device in self._states}), **self.counts}
+
+
+def attach(ingestor, on_command, rules=DEFAULT_RULES):
+    """Subscribe a RuleEngine sending to on_command to the ingestor; returns it, or None when disabled."""
+    if not ENABLED:
+        log.info("[RULES] automatic control disabled (SMARTFARM_RULES=0)")
+        return None
+    engine = RuleEngine(rules, on_command)
+    ingestor.subscribe(engine, ordered=False)
+    return engine
+
+
+def replay(rows, rules=DEFAULT_RULES):
+    """Commands a fresh engine issues for `rows` (dicts with ts_ms, device_id and fields, in ts_ms order)."""
+    engine = RuleEngine(rules)
+    commands = []
+    for row in rows:
+        commands.extend(engine.evaluate(row))
+    return commands
+
+
+def stored_rows(store, start_ms, end_ms, device_id=None, rules=DEFAULT_RULES):
+    """Stored readings over [start_ms, end_ms) as rows for replay(), with only the fields the rules use."""
+    from smartfarm import query
+
+    fields = sorted({rule.field for rule in rules})
+    for ts_ms, device, values in query.iter_readings(store, start_ms, end_ms, device_id, fields):
+        yield {"ts_ms": ts_ms, "device_id": device, **dict(zip(fields, values))}
+
+
+class MqttDispatcher:
+    """on_command that publishes each command to its device through a CommandChannel, off the ingest thread."""
+
+    def __init__(self, channel=None, workers=2):
+        if channel is None:
+            from smartfarm.actuators import CommandChannel
+
+            channel = CommandChannel()
+        self.channel = channel
+        # ack를 기다리는 동안 수집 스레드를 잡지 않도록 별도 스레드에서 전송
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rules")
+
+    def __call__(self, command):
+        self._pool.submit(self._send, command)
+
+    def _send(self, command):
+        result = self.channel.send(command["device_id"], command["cmd"], rule=command["rule"])
+        log.info(f"[RULES] {command['rule']}: {command['cmd']} -> {command['device_id']} "
+                 f"({command['field']}={command['value']}): {result['status']} {result['latency_ms']} ms")
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.channel.close()
+
+
+class PendingCommands:
+    """
+    on_command for HTTP devices, which cannot be reached between readings:
+    commands wait here and go back in the response to the device's next POST /log.
+    The engine runs inside ingest(), so a command triggered by a reading is
+    already waiting when the response to that same reading is built.
+    """
+
+    def __init__(self, max_per_device=8):
+        self.max_per_device = max_per_device
+        self._lock = threading.Lock()
+        self._pending = defaultdict(deque)
+
+    def __call__(self, command):
+        with self._lock:
+            queue = self._pending[command["device_id"]]
+            queue.append({"id": uuid.uuid4().hex[:12], "device_id": command["device_id"], "cmd": command["cmd"],
+                          "rule": command["rule"]})
+            while len(queue) > self.max_per_device:
+                queue.popleft()
+
+    def take(self, device_ids):
+        """Remove and return the commands waiting for these devices."""
+        commands = []
+        with self._lock:
+            for device_id in set(device_ids):
+                commands.extend(self._pending.pop(device_id, ()))
+        return commands
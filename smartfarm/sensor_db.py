@@ -0,0 +1,448 @@
+"""
+SQLite storage for normalized sensor readings.
+
+Raw readings are partitioned by (local) day into separate database files,
+
+    farm_data_partitions/sensor_20251201.db   -> table sensor_logs
+
+which are ATTACHed to the main connection on demand. The main file
+(farm_data.db) keeps the rollup tables (smartfarm.rollups). Expiring raw
+data older than the retention period is a DETACH plus unlinking whole
+files, so it never runs a DELETE or VACUUM against the live writer and
+the rollups stay intact.
+
+Partitions older than COLD_AFTER_DAYS are compacted: their rows are
+re-encoded per device into compressed blocks (smartfarm.blockcodec) in a
+sensor_blocks table and the partition file is vacuumed. Cold data keeps
+ts_ms and the field values; recv_ms and seq are dropped.
+
+Note: with WAL journaling a transaction touching several files is atomic
+per file; if the host crashes mid-commit a batch may be in a partition
+without being in the rollups.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from smartfarm import blockcodec, rollups
+
+log = logging.getLogger("SmartFarm")
+
+DB_FILE = "farm_data.db"
+
+# 원시 데이터 보관 기간 (롤업은 계속 유지)
+RAW_RETENTION_DAYS = 30
+# 이 기간이 지난 파티션은 압축 블록으로 변환
+COLD_AFTER_DAYS = 2
+# 한 연결에 동시에 ATTACH 해 두는 파티션 수 (SQLite 기본 한도는 10)
+MAX_ATTACHED = 8
+MAINTENANCE_INTERVAL = 3600
+
+# 정규화된 필드 이름 -> sensor_logs 컬럼 이름 (기존 컬럼 이름은 그대로 유지)
+COLUMN_MAP = (
+    ("device_id", "device_id"),
+    ("temp_air", "temp_air"),
+    ("humidity", "humidity"),
+    ("temp_water", "temp_water"),
+    ("soil_pct", "soil_moisture"),
+    ("cds_raw", "cds1"),
+    ("light_pct", "light_pct"),
+    ("soil_raw", "soil_raw"),
+)
+
+# 처음 만든 뒤에 추가된 컬럼들 (예전 DB 파일에는 ALTER TABLE로 붙임)
+ADDED_COLUMNS = (
+    ("device_id", "TEXT"),
+    ("light_pct", "INTEGER"),
+    ("soil_raw", "INTEGER"),
+    ("ts_ms", "INTEGER"),      # 측정 시각 (기기 시계, 없으면 서버 수신 시각)
+    ("recv_ms", "INTEGER"),    # 서버 수신 시각
+    ("seq", "INTEGER"),        # 기기별 일련번호
+)
+
+# 파티션에는 시각을 epoch ms 정수로만 저장 (예전 timestamp 문자열 컬럼은 쓰지 않음)
+INSERT_COLUMNS = ["ts_ms", "recv_ms", "seq"] + [col for _, col in COLUMN_MAP]
+
+PARTITION_DDL = (
+    '''
+    CREATE TABLE IF NOT EXISTS {schema}.sensor_logs (
+        id INTEGER PRIMARY KEY,
+        temp_air REAL,
+        humidity REAL,
+        temp_water REAL,
+        soil_moisture INTEGER,
+        cds1 INTEGER,
+        device_id TEXT,
+        light_pct INTEGER,
+        soil_raw INTEGER,
+        ts_ms INTEGER,
+        recv_ms INTEGER,
+        seq INTEGER
+    )
+    ''',
+    # 재전송된 측정값은 (device_id, seq)가 같으므로 한 번만 저장
+    "CREATE UNIQUE INDEX IF NOT EXISTS {schema}.sensor_logs_device_seq "
+    "ON sensor_logs (device_id, seq) WHERE seq IS NOT NULL",
+    # 시간 범위 조회용 커버링 인덱스: 테이블을 읽지 않고 (ts_ms, device_id, id) 순서로 바로 반환
+    "CREATE INDEX IF NOT EXISTS {schema}.sensor_logs_ts "
+    "ON sensor_logs (ts_ms, device_id, id, " + ", ".join(col for _, col in rollups.FIELDS) + ")",
+    "CREATE INDEX IF NOT EXISTS {schema}.sensor_logs_device_ts ON sensor_logs (device_id, ts_ms)",
+    # 압축된 기기별 블록 (시간 범위로 건너뛸 수 있도록 start/end를 컬럼으로 둠)
+    '''
+    CREATE TABLE IF NOT EXISTS {schema}.sensor_blocks (
+        id INTEGER PRIMARY KEY,
+        device_id TEXT NOT NULL,
+        start_ms INTEGER NOT NULL,
+        end_ms INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        data BLOB NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS {schema}.sensor_blocks_range ON sensor_blocks (device_id, start_ms)",
+)
+
+
+def connect(path=DB_FILE):
+    # 배치 쓰기는 BufferedWriter가 직렬화하므로 스레드 간에 연결을 넘겨도 안전
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def partition_dir_for(path):
+    return os.path.splitext(path)[0] + "_partitions"
+
+
+def day_of(ts_ms):
+    """Local day number (days since epoch) of a timestamp; partitions and day rollups share it."""
+    return (ts_ms + rollups.TZ_OFFSET_MS) // rollups.DAY_MS
+
+
+def day_label(day):
+    return datetime.fromtimestamp(day * 86400, tz=timezone.utc).strftime("%Y%m%d")
+
+
+def day_start_ms(day):
+    return day * rollups.DAY_MS - rollups.TZ_OFFSET_MS
+
+
+class PartitionedStore:
+    """One connection to the main file plus an LRU of attached day partitions."""
+
+    def __init__(self, path=DB_FILE, partition_dir=None, retention_days=RAW_RETENTION_DAYS,
+                 max_attached=MAX_ATTACHED):
+        self.path = path
+        self.partition_dir = partition_dir or partition_dir_for(path)
+        self.retention_days = retention_days
+        self.max_attached = max_attached
+        self.conn = connect(path)
+        self.lock = threading.RLock()
+        self._attached = OrderedDict()  # day -> schema alias
+        os.makedirs(self.partition_dir, exist_ok=True)
+
+    # ---------- partitions ----------
+    def partition_path(self, day):
+        return os.path.join(self.partition_dir, f"sensor_{day_label(day)}.db")
+
+    def days(self, start_ms=None, end_ms=None):
+        """Existing partition days overlapping [start_ms, end_ms), oldest first."""
+        days = []
+        for name in os.listdir(self.partition_dir):
+            if name.startswith("sensor_") and name.endswith(".db"):
+                label = name[7:-3]
+                day = int(datetime.strptime(label, "%Y%m%d").replace(tzinfo=timezone.utc).timestamp()) // 86400
+                days.append(day)
+        lo = day_of(start_ms) if start_ms is not None else None
+        hi = day_of(end_ms - 1) if end_ms is not None else None
+        return sorted(d for d in days if (lo is None or d >= lo) and (hi is None or d <= hi))
+
+    def attach(self, day, create=False):
+        """Schema alias of the day's partition, attaching it if needed; None if it does not exist."""
+        with self.lock:
+            alias = self._attached.get(day)
+            if alias is not None:
+                self._attached.move_to_end(day)
+                return alias
+
+            path = self.partition_path(day)
+            if not create and not os.path.exists(path):
+                return None
+            while len(self._attached) >= self.max_attached:
+                _, old = self._attached.popitem(last=False)
+                self.conn.execute(f"DETACH DATABASE {old}")
+
+            alias = f"p{day_label(day)}"
+            self.conn.execute("ATTACH DATABASE ? AS " + alias, (path,))
+            if create:
+                self.conn.execute(f"PRAGMA {alias}.journal_mode=WAL")
+            for ddl in PARTITION_DDL:
+                self.conn.execute(ddl.format(schema=alias))
+            self._attached[day] = alias
+            return alias
+
+    def detach(self, day):
+        with self.lock:
+            alias = self._attached.pop(day, None)
+            if alias is not None:
+                self.conn.execute(f"DETACH DATABASE {alias}")
+
+    def expire(self, now_ms=None):
+        """Drop raw partitions older than the retention period; returns the removed day labels."""
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        cutoff = day_of(now_ms) - self.retention_days
+        removed = []
+        with self.lock:
+            for day in self.days():
+                if day >= cutoff:
+                    break
+                self.detach(day)
+                path = self.partition_path(day)
+                for suffix in ("", "-wal", "-shm"):
+                    try:
+                        os.remove(path + suffix)
+                    except FileNotFoundError:
+                        pass
+                removed.append(day_label(day))
+        if removed:
+            log.info(f"[RETENTION] dropped raw partitions {removed}")
+        return removed
+
+    def compact(self, day):
+        """Re-encode a partition's rows into compressed blocks and vacuum it; returns the rows moved."""
+        fields = [field for field, _ in rollups.FIELDS]
+        columns = ", ".join(col for _, col in rollups.FIELDS)
+        with self.lock:
+            alias = self.attach(day)
+            if alias is None:
+                return 0
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    f"SELECT device_id, ts_ms, {columns} FROM {alias}.sensor_logs "
+                    "WHERE ts_ms IS NOT NULL AND device_id IS NOT NULL ORDER BY device_id, ts_ms"
+                ).fetchall()
+                if not rows:
+                    conn.rollback()
+                    return 0
+
+                blocks = []
+                start = 0
+                while start < len(rows):
+                    device = rows[start][0]
+                    end = start
+                    while end < len(rows) and end - start < blockcodec.BLOCK_ROWS and rows[end][0] == device:
+                        end += 1
+                    data = np.array([r[1:] for r in rows[start:end]], dtype=np.float64)
+                    ts = np.array([r[1] for r in rows[start:end]], dtype=np.int64)
+                    block = blockcodec.encode(ts, {f: data[:, i + 1] for i, f in enumerate(fields)})
+                    blocks.append((device, int(ts[0]), int(ts[-1]), end - start, block))
+                    start = end
+
+                conn.executemany(
+                    f"INSERT INTO {alias}.sensor_blocks (device_id, start_ms, end_ms, count, data) VALUES (?, ?, ?, ?, ?)",
+                    blocks,
+                )
+                conn.execute(f"DELETE FROM {alias}.sensor_logs")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.execute(f"VACUUM {alias}")
+            conn.execute(f"PRAGMA {alias}.wal_checkpoint(TRUNCATE)")
+        log.info(f"[COMPACT] {day_label(day)}: {len(rows)} rows -> {len(blocks)} blocks")
+        return len(rows)
+
+    def compact_cold(self, now_ms=None):
+        """Compact every partition older than COLD_AFTER_DAYS that still has plain rows."""
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        cutoff = day_of(now_ms) - COLD_AFTER_DAYS
+        moved = 0
+        for day in self.days():
+            if day >= cutoff:
+                break
+            with self.lock:
+                alias = self.attach(day)
+                pending = self.conn.execute(f"SELECT EXISTS (SELECT 1 FROM {alias}.sensor_logs)").fetchone()[0]
+            if pending:
+                moved += self.compact(day)
+        return moved
+
+    # ---------- write ----------
+    def insert(self, rows):
+        """Insert rows into their day partitions and fold them into the rollups, one transaction per group."""
+        by_day = {}
+        for r in rows:
+            by_day.setdefault(day_of(r["ts_ms"]), []).append(r)
+        days = sorted(by_day)
+
+        marks = ", ".join("?" * len(INSERT_COLUMNS))
+        with self.lock:
+            # ATTACH는 트랜잭션 안에서 할 수 없으므로 max_attached 개씩 묶어서 처리
+            for i in range(0, len(days), self.max_attached):
+                group = days[i:i + self.max_attached]
+                aliases = {day: self.attach(day, create=True) for day in group}
+                conn = self.conn
+                # 다른 프로세스가 끼어들지 않도록 쓰기 잠금을 먼저 잡고 마지막 id를 기준점으로 사용
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for day in group:
+                        table = f"{aliases[day]}.sensor_logs"
+                        after_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                        conn.executemany(
+                            f"INSERT OR IGNORE INTO {table} ({', '.join(INSERT_COLUMNS)}) VALUES ({marks})",
+                            [_params(r) for r in by_day[day]],
+                        )
+                        rollups.update_rollups(conn, after_id, table)
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+
+    # ---------- read ----------
+    def select_raw(self, sql, params, start_ms=None, end_ms=None):
+        """
+        Run `sql` (with {table} as the partition's sensor_logs) on every partition
+        overlapping the range, oldest first, yielding rows.
+        """
+        for day in self.days(start_ms, end_ms):
+            with self.lock:
+                alias = self.attach(day)
+                if alias is None:
+                    continue
+                rows = self.conn.execute(sql.format(table=f"{alias}.sensor_logs"), params).fetchall()
+            yield from rows
+
+    def raw_series(self, device_id, field, start_ms, end_ms):
+        """(ts_ms, value) arrays of one field over [start_ms, end_ms), from plain rows and compressed blocks."""
+        column = rollups.FIELD_COLUMNS[field]
+        ts_parts, value_parts = [], []
+        for day in self.days(start_ms, end_ms):
+            with self.lock:
+                alias = self.attach(day)
+                if alias is None:
+                    continue
+                rows = self.conn.execute(
+                    f"SELECT ts_ms, {column} FROM {alias}.sensor_logs "
+                    f"WHERE device_id = ? AND ts_ms >= ? AND ts_ms < ? AND {column} IS NOT NULL",
+                    (device_id, start_ms, end_ms),
+                ).fetchall()
+                blocks = self.conn.execute(
+                    f"SELECT data FROM {alias}.sensor_blocks WHERE device_id = ? AND start_ms < ? AND end_ms >= ?",
+                    (device_id, end_ms, start_ms),
+                ).fetchall()
+            if rows:
+                ts_parts.append(np.array([r[0] for r in rows], dtype=np.int64))
+                value_parts.append(np.array([r[1] for r in rows], dtype=np.float64))
+            for (data,) in blocks:
+                ts, values = blockcodec.decode(data, {field})
+                values = values.get(field)
+                if values is None:
+                    continue
+                keep = (ts >= start_ms) & (ts < end_ms) & ~np.isnan(values)
+                ts_parts.append(ts[keep])
+                value_parts.append(values[keep])
+
+        if not ts_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        ts = np.concatenate(ts_parts)
+        values = np.concatenate(value_parts)
+        order = np.argsort(ts, kind="stable")
+        return ts[order], values[order]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+            self._attached.clear()
+
+
+def _params(r):
+    return (r["ts_ms"], r.get("recv_ms"), r.get("seq")) + tuple(r.get(field) for field, _ in COLUMN_MAP)
+
+
+def _migrate_legacy_table(conn, store):
+    """Move rows of the old single sensor_logs table into day partitions, then drop it."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(sensor_logs)")}
+    for name, sql_type in ADDED_COLUMNS:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE sensor_logs ADD COLUMN {name} {sql_type}")
+    # 예전 행: 로컬 시각 문자열에서 ts_ms를 채움
+    conn.execute(
+        "UPDATE sensor_logs SET ts_ms = CAST(strftime('%s', timestamp, 'utc') AS INTEGER) * 1000 "
+        "WHERE ts_ms IS NULL AND timestamp IS NOT NULL"
+    )
+    conn.execute("UPDATE sensor_logs SET device_id = 'default' WHERE device_id IS NULL")
+    if rollups.create_tables(conn):
+        rollups.rebuild_rollups(conn, "main.sensor_logs")
+    conn.commit()
+
+    columns = ", ".join(INSERT_COLUMNS)
+    days = [d for (d,) in conn.execute(
+        f"SELECT DISTINCT (ts_ms + {rollups.TZ_OFFSET_MS}) / {rollups.DAY_MS} FROM sensor_logs WHERE ts_ms IS NOT NULL"
+    )]
+    for day in days:
+        alias = store.attach(day, create=True)
+        with conn:
+            conn.execute(
+                f"INSERT OR IGNORE INTO {alias}.sensor_logs ({columns}) SELECT {columns} FROM main.sensor_logs "
+                "WHERE ts_ms >= ? AND ts_ms < ?",
+                (day_start_ms(day), day_start_ms(day + 1)),
+            )
+    with conn:
+        conn.execute("DROP TABLE main.sensor_logs")
+    log.info(f"[MIGRATE] moved legacy sensor_logs into {len(days)} day partitions")
+
+
+def init_db(path=DB_FILE):
+    """Create the rollup tables and move any pre-partitioning sensor_logs rows into partitions."""
+    store = PartitionedStore(path)
+    try:
+        conn = store.conn
+        legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sensor_logs'").fetchone()
+        if legacy:
+            _migrate_legacy_table(conn, store)
+        else:
+            rollups.create_tables(conn)
+            conn.commit()
+    finally:
+        store.close()
+
+
+class SqliteSink:
+    """
+    Batch-insert normalized rows into the day partitions, one transaction per batch.
+    Rows whose (device_id, seq) is already stored are skipped. The same
+    transaction folds the newly inserted rows into the rollup tables.
+    About once an hour partitions past the retention period are dropped
+    and cold ones compacted.
+    """
+
+    def __init__(self, path=DB_FILE, retention_days=RAW_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        init_db(path)
+        self._store = None
+        self._next_maintenance = 0
+
+    def write(self, rows):
+        if self._store is None:
+            self._store = PartitionedStore(self.path, retention_days=self.retention_days)
+        self._store.insert(rows)
+        if time.monotonic() >= self._next_maintenance:
+            self._next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+            self._store.expire()
+            self._store.compact_cold()
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
@@ -0,0 +1,390 @@
+"""
+Write-ahead spool between ingestion and storage.
+
+Ingestion appends every batch to an append-only segment file first:
+
+    <root>/seg_000000000001.log    frames of  [u32 length][u32 crc32][JSON rows]
+    <root>/<consumer>.ckpt         last committed (segment, offset) per sink
+    <root>/<consumer>.dead         rows the sink rejected (one JSON line each)
+
+One replayer thread per storage sink reads frames from its checkpoint,
+writes them to the sink and only then advances the checkpoint. When the
+database is locked or the disk stalls (transient errors: OSError and the
+SQLite messages in TRANSIENT_SQLITE) the replayer backs off and retries
+the same frames, while ingestion keeps appending to the spool. Any other
+error (including a malformed or unopenable database) means the sink will never take some of the rows: the batch is split
+until the rejected rows are isolated, those go to the dead-letter file
+and the checkpoint moves past them. Segments every consumer has moved
+past are deleted. Delivery is at-least-once: a crash between a sink
+commit and its checkpoint, or a transient error after part of a split
+batch was stored, replays those rows.
+
+A spool directory belongs to one process; give each front end its own.
+"""
+import json
+import logging
+import os
+import sqlite3
+import struct
+import time
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: 한 프로세스만 쓴다고 가정
+    fcntl = None
+
+log = logging.getLogger("SmartFarm")
+
+HEADER = struct.Struct("<II")  # payload length, crc32
+
+SEGMENT_BYTES = 4 * 1024 * 1024
+RETRY_MIN = 0.5
+RETRY_MAX = 30.0
+
+# 잠시 뒤 다시 시도하면 되는 sqlite3.OperationalError 메시지 (정확히 일치하는 것만).
+# "database disk image is malformed", "unable to open database file" 등은 다시 해도 같으므로 제외
+TRANSIENT_SQLITE = (
+    "database is locked",
+    "database table is locked",
+    "database is busy",
+    "disk i/o error",
+    "database or disk is full",
+)
+
+
+def is_transient(error):
+    """Whether a sink error is worth retrying (the same rows may succeed later)."""
+    if isinstance(error, sqlite3.OperationalError):
+        return str(error).strip().lower() in TRANSIENT_SQLITE
+    return isinstance(error, OSError)
+
+
+def _segment_name(seg_id):
+    return f"seg_{seg_id:012d}.log"
+
+
+class Spool:
+    def __init__(self, root, segment_bytes=SEGMENT_BYTES, sync=False):
+        """sync=True fsyncs every append (survives power loss, not just process restarts)."""
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self.cond = threading.Condition()
+        self.appended_rows = 0
+        os.makedirs(root, exist_ok=True)
+
+        self._lock_fd = os.open(os.path.join(root, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(self._lock_fd)
+                raise RuntimeError(f"spool {root} is already in use by another process")
+
+        self.segments = self._list_segments()
+        if not self.segments:
+            self.segments = [1]
+        self.active = self.segments[-1]
+        self._recover(self.active)
+        self._file = open(self._path(self.active), "ab")
+        self._size = self._file.tell()
+        self._positions = {}
+
+    # ---------- files ----------
+    def _path(self, seg_id):
+        return os.path.join(self.root, _segment_name(seg_id))
+
+    def _list_segments(self):
+        ids = []
+        for name in os.listdir(self.root):
+            if name.startswith("seg_") and name.endswith(".log"):
+                ids.append(int(name[4:-4]))
+        return sorted(ids)
+
+    def _recover(self, seg_id):
+        """Truncate a torn or corrupt tail left by a crash mid-append."""
+        path = self._path(seg_id)
+        if not os.path.exists(path):
+            return
+        good = 0
+        with open(path, "rb") as f:
+            while True:
+                frame = self._read_frame(f)
+                if frame is None:
+                    break
+                good = f.tell()
+        if good != os.path.getsize(path):
+            log.warning(f"[SPOOL] truncating torn tail of {_segment_name(seg_id)} at {good} bytes")
+            with open(path, "r+b") as f:
+                f.truncate(good)
+
+    @staticmethod
+    def _read_frame(f):
+        """Return the decoded rows of the next frame, or None at end / on a bad frame."""
+        head = f.read(HEADER.size)
+        if len(head) < HEADER.size:
+            return None
+        length, crc = HEADER.unpack(head)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return None
+        return json.loads(payload)
+
+    # ---------- write side ----------
+    def append(self, rows):
+        payload = json.dumps(rows, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        frame = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.cond:
+            self._file.write(frame)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self._size += len(frame)
+            self.appended_rows += len(rows)
+            if self._size >= self.segment_bytes:
+                self._rotate()
+            self.cond.notify_all()
+
+    def _rotate(self):
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self.active += 1
+        self.segments.append(self.active)
+        self._file = open(self._path(self.active), "ab")
+        self._size = 0
+
+    # ---------- read side ----------
+    def _ckpt_path(self, consumer):
+        return os.path.join(self.root, f"{consumer}.ckpt")
+
+    def position(self, consumer):
+        with self.cond:
+            pos = self._positions.get(consumer)
+            if pos is None:
+                pos = (self.segments[0], 0)
+                path = self._ckpt_path(consumer)
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        saved = json.load(f)
+                    pos = max((saved["segment"], saved["offset"]), pos)
+                self._positions[consumer] = pos
+            return pos
+
+    def read(self, consumer, max_rows):
+        """Rows after the consumer's checkpoint (whole frames, about max_rows) and the position after them."""
+        seg_id, offset = self.position(consumer)
+        rows = []
+        while len(rows) < max_rows:
+            with self.cond:
+                active = self.active
+            try:
+                f = open(self._path(seg_id), "rb")
+            except FileNotFoundError:
+                if seg_id >= active:
+                    break
+                seg_id, offset = seg_id + 1, 0
+                continue
+            with f:
+                f.seek(offset)
+                while len(rows) < max_rows:
+                    frame = self._read_frame(f)
+                    if frame is None:
+                        break
+                    rows.extend(frame)
+                    offset = f.tell()
+                at_end = f.read(1) == b""
+
+            if len(rows) >= max_rows or seg_id >= active:
+                break
+            if not at_end:
+                log.error(f"[SPOOL] corrupt frame in {_segment_name(seg_id)} at {offset}, skipping rest of segment")
+            seg_id, offset = seg_id + 1, 0
+        return rows, (seg_id, offset)
+
+    def commit(self, consumer, position):
+        """Record that the consumer has stored everything before `position`; drop finished segments."""
+        tmp = self._ckpt_path(consumer) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segment": position[0], "offset": position[1]}, f)
+        os.replace(tmp, self._ckpt_path(consumer))
+
+        with self.cond:
+            self._positions[consumer] = position
+            oldest = min(seg for seg, _ in self._positions.values())
+            while self.segments and self.segments[0] < min(oldest, self.active):
+                seg_id = self.segments.pop(0)
+                try:
+                    os.remove(self._path(seg_id))
+                except FileNotFoundError:
+                    pass
+
+    def dead_letter(self, consumer, rejected):
+        """Append (row, error) pairs the consumer's sink rejected to <consumer>.dead."""
+        now_ms = int(time.time() * 1000)
+        with open(os.path.join(self.root, f"{consumer}.dead"), "a", encoding="utf-8") as f:
+            for row, error in rejected:
+                f.write(json.dumps({"ts_ms": now_ms, "error": f"{type(error).__name__}: {error}", "row": row},
+                                   ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def backlog_bytes(self, consumer):
+        seg_id, offset = self.position(consumer)
+        with self.cond:
+            segments = [s for s in self.segments if s >= seg_id]
+        total = -offset
+        for s in segments:
+            try:
+                total += os.path.getsize(self._path(s))
+            except FileNotFoundError:
+                pass
+        return max(total, 0)
+
+    def close(self):
+        with self.cond:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        os.close(self._lock_fd)
+
+
+class Replayer:
+    """Drain the spool into one sink, retrying with backoff while the sink fails transiently."""
+
+    def __init__(self, spool, sink, name, max_rows, interval):
+        self.spool = spool
+        self.sink = sink
+        self.name = name
+        self.max_rows = max_rows
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._closing = False
+        self._seen = 0
+        self.committed_rows = 0
+        self.dead_rows = 0
+        self._thread = threading.Thread(target=self._run, name=f"spool-{name}", daemon=True)
+        self._thread.start()
+
+    def drain_once(self):
+        """
+        Store one batch. Returns the number of rows consumed (stored or dead-lettered),
+        0 if none, None if the sink failed transiently.
+        """
+        with self._lock:
+            rows, position = self.spool.read(self.name, self.max_rows)
+            if not rows:
+                return 0
+            try:
+                rejected = self._write(rows)
+            except Exception as e:
+                log.warning(f"[SPOOL] {self.name}: write of {len(rows)} rows failed ({type(e).__name__}: {e}), will retry")
+                return None
+            if rejected:
+                self.spool.dead_letter(self.name, rejected)
+                self.dead_rows += len(rejected)
+                log.error(f"[SPOOL] {self.name}: {len(rejected)} of {len(rows)} rows rejected "
+                          f"({type(rejected[0][1]).__name__}: {rejected[0][1]}), moved to {self.name}.dead")
+            self.spool.commit(self.name, position)
+            self.committed_rows += len(rows)
+            return len(rows)
+
+    def _write(self, rows):
+        """
+        Write rows, splitting the batch in halves around rows the sink rejects for good.
+        Returns the rejected (row, error) pairs; transient errors are raised.
+        """
+        try:
+            self.sink.write(rows)
+            return []
+        except Exception as e:
+            if is_transient(e):
+                raise
+            if len(rows) == 1:
+                return [(rows[0], e)]
+        mid = len(rows) // 2
+        return self._write(rows[:mid]) + self._write(rows[mid:])
+
+    def _run(self):
+        backoff = RETRY_MIN
+        while True:
+            with self.spool.cond:
+                self.spool.cond.wait_for(
+                    lambda: self._closing or self.spool.appended_rows - self._seen >= self.max_rows,
+                    timeout=self.interval,
+                )
+                self._seen = self.spool.appended_rows
+                closing = self._closing
+
+            while True:
+                written = self.drain_once()
+                if written is None:
+                    if closing or self._closing:
+                        log.warning(f"[SPOOL] {self.name}: leaving backlog in spool for next start")
+                        return
+                    with self.spool.cond:
+                        self.spool.cond.wait_for(lambda: self._closing, timeout=backoff)
+                    backoff = min(backoff * 2, RETRY_MAX)
+                    continue
+                backoff = RETRY_MIN
+                if written < self.max_rows:
+                    break
+
+            if closing:
+                return
+
+    def close(self):
+        with self.spool.cond:
+            self._closing = True
+            self.spool.cond.notify_all()
+        self._thread.join()
+
+
+class SpooledWriter:
+    """
+    Drop-in replacement for BufferedWriter that spools to disk before storage.
+
+    put_many() returns once the rows are in the segment file; one Replayer
+    per sink moves them into storage in batches of up to max_rows, at least
+    every `interval` seconds.
+    """
+
+    def __init__(self, sinks, root, max_rows=200, interval=1.0, sync=False):
+        self.spool = Spool(root, sync=sync)
+        self.sinks = list(sinks)
+        names = [type(sink).__name__.lower() for sink in self.sinks]
+        # 모든 소비자의 체크포인트를 먼저 읽어 둬야 아직 안 읽은 세그먼트가 지워지지 않음
+        for name in names:
+            self.spool.position(name)
+        self.replayers = [
+            Replayer(self.spool, sink, name, max_rows, interval)
+            for sink, name in zip(self.sinks, names)
+        ]
+
+    def put(self, row):
+        self.put_many([row])
+
+    def put_many(self, rows):
+        self.spool.append(rows)
+
+    def pending(self):
+        """Rows put by this process that the slowest sink has not stored yet."""
+        committed = min(r.committed_rows for r in self.replayers)
+        return max(self.spool.appended_rows - committed, 0)
+
+    def backlog_bytes(self):
+        """Spool bytes the slowest sink has not stored yet, including backlog from earlier runs."""
+        return max(self.spool.backlog_bytes(r.name) for r in self.replayers)
+
+    def flush(self):
+        for r in self.replayers:
+            while True:
+                written = r.drain_once()
+                if not written:
+                    break
+
+    def close(self):
+        for r in self.replayers:
+            r.close()
+        for sink in self.sinks:
+            sink.close()
+        self.spool.close()
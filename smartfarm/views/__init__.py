@@ -0,0 +1,13 @@
+"""
+Smart Farm views, one module per page group.
+
+Importing this package loads only Django and the small smartfarm stores;
+cv2, the OpenAI client and matplotlib are imported by the views that use
+them, on first request (see smartfarm.views.resources).
+"""
+from smartfarm.views.api import alert_list, chart, current, devices, sensor_export, sensor_readings, sensor_series
+from smartfarm.views.camera import video_feed
+from smartfarm.views.control import control, control_stats
+from smartfarm.views.counseling import counseling_cache_stats, counseling_job, counseling_stream, plant_counseling
+from smartfarm.views.pages import current_plant, home, tips
+from smartfarm.views.report import plant_report
@@ -0,0 +1,216 @@
+"""
+Sensor data API: latest readings, paged/exported ranges, series, charts, alerts and
+device liveness.
+"""
+import hashlib
+import json
+import time
+
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+
+from smartfarm import query, rollups
+from smartfarm.views import resources
+
+DEFAULT_RANGE_MS = 24 * 60 * 60 * 1000  # 기본 조회 범위: 최근 24시간
+CHART_END_STEP_MS = 60 * 1000  # 차트의 기본 end는 분 단위로 올림 (같은 분 안의 요청은 캐시를 같이 씀)
+DEFAULT_ALERTS = 50
+MAX_ALERTS = 500
+
+
+def _bad_request(message):
+    return JsonResponse({"error": message}, status=400)
+
+
+def _range_params(request, end_step_ms=1):
+    """start/end(epoch ms), device, fields 쿼리 파라미터를 읽음. 잘못된 값이면 ValueError."""
+    now_ms = -(-int(time.time() * 1000) // end_step_ms) * end_step_ms
+    end_ms = int(request.GET.get("end") or now_ms)
+    start_ms = int(request.GET.get("start") or end_ms - DEFAULT_RANGE_MS)
+    if start_ms >= end_ms:
+        raise ValueError("start must be before end")
+    device_id = request.GET.get("device") or None
+    fields = query.check_fields([f for f in request.GET.get("fields", "").split(",") if f])
+    return start_ms, end_ms, device_id, fields
+
+
+# (최신값 스냅샷 ETag, NDVI 버전) -> /api/current 본문과 ETag. 둘 중 하나가 바뀔 때만 다시 만듦
+_current_cache = (None, None, None)
+
+
+def _current_body():
+    global _current_cache
+    snapshot_etag, snapshot, _ = resources.latest_reader().current()
+    store = resources.ndvi_store()
+    key = (snapshot_etag, store.version())
+    cached_key, etag, body = _current_cache
+    if cached_key != key:
+        sample = store.latest()
+        payload = json.loads(snapshot)
+        payload["ndvi"] = ({"ts_ms": sample["ts_ms"], "avg": sample["mean"], "median": sample["median"]}
+                           if sample else None)
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        _current_cache = (key, etag, body)
+    return etag, body
+
+
+def current(request):
+    """
+    GET /api/current : 기기별 최신 측정값과 최신 NDVI
+    {"ts_ms": ..., "devices": {id: {...}}, "ndvi": {"ts_ms", "avg", "median"} | null}.
+    If-None-Match가 현재 ETag와 같으면 304 (본문 없음).
+    """
+    etag, body = _current_body()
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def alert_list(request):
+    """
+    GET /api/alerts/?device=&limit=&before= : 최근 경보 (최신순).
+    이전 페이지는 응답의 마지막 id를 before로 넘겨서 요청.
+    """
+    try:
+        limit = min(int(request.GET.get("limit") or DEFAULT_ALERTS), MAX_ALERTS)
+        before = request.GET.get("before")
+        before_id = int(before) if before else None
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    items = resources.alert_store().recent(limit, request.GET.get("device") or None, before_id)
+    return JsonResponse({"alerts": items}, json_dumps_params={"ensure_ascii": False})
+
+
+def devices(request):
+    """
+    GET /api/devices/ : 기기별 마지막 수신 시각과 연결 상태.
+    {"ts_ms": 지금, "online": n, "offline": n, "devices": {id: {"last_seen_ms", "age_ms", "interval_ms", "timeout_ms", "online", "since_ms"}}}
+    """
+    from smartfarm.watchdog import is_online
+
+    now_ms = int(time.time() * 1000)
+    _, _, entries = resources.liveness_reader().current()
+    result = {}
+    for device_id, e in entries.items():
+        result[device_id] = {"last_seen_ms": e["ts_ms"], "age_ms": now_ms - e["ts_ms"],
+                             "interval_ms": e.get("interval_ms"), "timeout_ms": e["timeout_ms"],
+                             "online": is_online(e, now_ms), "since_ms": e.get("since_ms")}
+    online = sum(d["online"] for d in result.values())
+    return JsonResponse({"ts_ms": now_ms, "online": online, "offline": len(result) - online, "devices": result})
+
+
+def sensor_readings(request):
+    """
+    GET /api/readings/?start=&end=&device=&fields=temp_air,humidity&limit=&cursor=
+    다음 페이지는 응답의 next_cursor를 cursor로 넘겨서 요청.
+    """
+    try:
+        start_ms, end_ms, device_id, fields = _range_params(request)
+        limit = min(int(request.GET.get("limit") or query.DEFAULT_PAGE), query.MAX_PAGE)
+        cursor = request.GET.get("cursor") or None
+        if cursor:
+            query.decode_cursor(cursor)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    rows = query.stream_page(query.get_store(), start_ms, end_ms, device_id, fields, cursor, limit)
+    return StreamingHttpResponse(rows, content_type="application/json")
+
+
+def sensor_export(request):
+    """GET /api/readings/export/?start=&end=&device=&fields= : 범위 전체를 NDJSON으로 스트리밍."""
+    try:
+        start_ms, end_ms, device_id, fields = _range_params(request)
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    rows = query.stream_ndjson(query.get_store(), start_ms, end_ms, device_id, fields)
+    response = StreamingHttpResponse(rows, content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="sensor_{start_ms}_{end_ms}.ndjson"'
+    return response
+
+
+def sensor_series(request):
+    """
+    GET /api/series/?field=temp_air&device=&start=&end=&resolution=(ms)
+    resolution이 1분 이상이면 롤업 테이블에서 [bucket_ms, avg, min, max, count]를 반환.
+
+    points=N 을 주면 범위와 상관없이 약 N개의 [ts_ms, value]만 반환 (차트용).
+    method=lttb(기본) 또는 minmax(구간별 최저/최고).
+    """
+    try:
+        start_ms, end_ms, device_id, _ = _range_params(request)
+        field = request.GET.get("field", "")
+        query.check_fields([field])
+        resolution_ms = int(request.GET.get("resolution") or 0)
+        points = int(request.GET.get("points") or 0)
+        method = request.GET.get("method") or "lttb"
+        if method not in query.CHART_METHODS:
+            raise ValueError(f"method must be one of {', '.join(query.CHART_METHODS)}")
+        if points < 0:
+            raise ValueError("points must be positive")
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    device_id = device_id or "default"
+    result = {"device_id": device_id, "field": field, "start": start_ms, "end": end_ms}
+    if points:
+        points = min(max(points, 3), query.MAX_CHART_POINTS)
+        result["resolution"], result["points"] = query.chart_series(
+            query.get_store(), device_id, field, start_ms, end_ms, points, method, query.get_raw())
+        result["method"] = method
+    else:
+        result["points"] = rollups.query_series(query.get_store(), device_id, field, start_ms, end_ms, resolution_ms,
+                                                query.get_raw())
+    return JsonResponse(result, json_dumps_params={"separators": (",", ":")})
+
+
+def chart(request):
+    """
+    GET /api/chart/?kind=ndvi|sensor&start=&end=&width=&height=&format=png|json
+    kind=ndvi: camera=(기본 default), kind=sensor: device=, field=
+    요청한 범위/크기로 그래프를 그려서 반환 (format=json이면 그릴 데이터만).
+    같은 범위/크기/데이터 버전이면 캐시에서 바로 반환하고, If-None-Match가 맞으면 304.
+    """
+    from smartfarm import charts  # matplotlib은 차트를 처음 요청할 때 불러옴
+
+    try:
+        start_ms, end_ms, device_id, _ = _range_params(request, CHART_END_STEP_MS)
+        kind = request.GET.get("kind") or "ndvi"
+        fmt = request.GET.get("format") or "png"
+        width = int(request.GET.get("width") or charts.DEFAULT_SIZE[0])
+        height = int(request.GET.get("height") or charts.DEFAULT_SIZE[1])
+        charts.check_size(width, height)
+        if fmt not in charts.FORMATS:
+            raise ValueError(f"format must be one of {', '.join(charts.FORMATS)}")
+        if kind == "sensor":
+            field = request.GET.get("field", "")
+            query.check_fields([field])
+        elif kind != "ndvi":
+            raise ValueError("kind must be ndvi or sensor")
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    if kind == "ndvi":
+        camera_id = request.GET.get("camera") or "default"
+        etag, body = charts.ndvi_chart(resources.ndvi_store(), camera_id, start_ms, end_ms, width, height, fmt)
+    else:
+        etag, body = charts.sensor_chart(query.get_store(), resources.latest_reader(), device_id or "default", field,
+                                         start_ms, end_ms, width, height, fmt, query.get_raw())
+
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="image/png" if fmt == "png" else "application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
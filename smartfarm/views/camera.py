@@ -0,0 +1,103 @@
+"""
+Live camera stream (MJPEG).
+
+One SharedCamera per process reads the camera and JPEG-encodes each frame
+once for every viewer. cv2 is imported and the camera opened when the
+first viewer connects, and released when the last one disconnects.
+"""
+import threading
+import time
+
+from django.http import StreamingHttpResponse
+
+from smartfarm.views import resources
+
+CAMERA_INDEX = 0  # 0번 카메라 사용 (노트북 카메라 or USB 웹캠)
+FRAME_TIMEOUT = 5.0
+
+
+class SharedCamera:
+    def __init__(self, index=CAMERA_INDEX):
+        self.index = index
+        self._cond = threading.Condition()
+        self._viewers = 0
+        self._frame = None
+        self._seq = 0
+        self._thread = None
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="camera", daemon=True)
+        self._thread.start()
+
+    def frames(self):
+        """JPEG bytes of each new frame, until the viewer goes away (or the camera stops)."""
+        with self._cond:
+            self._viewers += 1
+            if self._thread is None:
+                self._start()
+        try:
+            seen = self._seq
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq != seen or self._thread is None, FRAME_TIMEOUT)
+                    if self._thread is None:
+                        return  # 카메라를 열지 못함
+                    if self._seq == seen:
+                        continue
+                    seen, frame = self._seq, self._frame
+                yield frame
+        finally:
+            with self._cond:
+                self._viewers -= 1
+
+    def _run(self):
+        import cv2
+
+        cap = cv2.VideoCapture(self.index)
+        opened = cap.isOpened()
+        if not opened:
+            print("카메라를 찾을 수 없습니다!")
+        try:
+            while opened:
+                with self._cond:
+                    if self._viewers == 0:
+                        break  # 보는 사람이 없으면 카메라를 놓아줌
+                ret, frame = cap.read()
+                if not ret:
+                    time.sleep(0.05)
+                    continue
+
+                # JPEG로 인코딩 (보는 사람이 여러 명이어도 프레임마다 한 번)
+                ret, jpeg = cv2.imencode('.jpg', frame)
+                if not ret:
+                    continue
+                with self._cond:
+                    self._frame = jpeg.tobytes()
+                    self._seq += 1
+                    self._cond.notify_all()
+        finally:
+            cap.release()
+            with self._cond:
+                self._thread = None
+                # 멈추는 사이에 새로 들어온 사람이 있으면 다시 시작
+                if opened and self._viewers:
+                    self._start()
+                self._cond.notify_all()
+
+
+# ---------- 실시간 카메라 스트림 ----------
+def generate_camera_stream():
+    for jpeg in resources.shared("camera", SharedCamera).frames():
+        # MJPEG 스트림 형식으로 yield
+        yield (b"--frame\r\n"
+               b"Content-Type: image/jpeg\r\n\r\n" +
+               jpeg +
+               b"\r\n\r\n")
+
+
+def video_feed(request):
+    return StreamingHttpResponse(
+        generate_camera_stream(),
+        content_type="multipart/x-mixed-replace; boundary=frame"
+    )
+
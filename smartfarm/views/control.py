@@ -0,0 +1,36 @@
+"""
+Watering / plant light buttons: commands to the ESP32 over MQTT (smartfarm.actuators).
+"""
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+from smartfarm.views import resources
+
+# 결과 status (smartfarm.actuators) -> HTTP 상태 코드
+CONTROL_STATUS_CODES = {
+    "ok": 200,
+    "failed": 502,     # 기기가 실행하지 못했다고 응답
+    "timeout": 504,    # 시간 안에 ack가 오지 않음
+    "offline": 503,    # 브로커에 연결되어 있지 않음
+}
+
+
+def control(request, cmd):
+    """
+    POST /control/<cmd>/?device= : 명령을 기기로 보내고 ack가 오거나 시간이 지나면 응답.
+    {"id", "device_id", "cmd", "status": ok|failed|timeout|offline, "latency_ms", "ack"}
+    """
+    from smartfarm import actuators  # paho-mqtt는 처음 명령을 보낼 때 불러옴
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    if cmd not in actuators.COMMANDS:
+        return JsonResponse({"error": f"cmd must be one of {', '.join(actuators.COMMANDS)}"}, status=400)
+
+    device_id = request.GET.get("device") or actuators.DEFAULT_DEVICE
+    result = resources.command_channel().send(device_id, cmd)
+    return JsonResponse(result, status=CONTROL_STATUS_CODES[result["status"]])
+
+
+def control_stats(request):
+    """GET /api/control/stats/ : 명령 결과별 횟수와 ack 왕복 지연시간 {"ok", "timeout", ..., "latency_ms": {"p50", "p95", "max"}}."""
+    return JsonResponse(resources.command_channel().stats())
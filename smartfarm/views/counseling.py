@@ -0,0 +1,284 @@
+"""
+Plant counseling chat: the page, its background LLM jobs and the reply stream.
+"""
+import asyncio
+import os
+import time
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+
+from smartfarm import conversations, jobs, push
+from smartfarm.reply_cache import ReplyCache
+from smartfarm.views import resources
+
+# 상담 답변 작업: 동시에 COUNSEL_WORKERS개까지 호출, 대기 포함 COUNSEL_PENDING개까지만 받음
+COUNSEL_WORKERS = 4
+COUNSEL_PENDING = 32
+COUNSEL_JOB_TIMEOUT = 60.0   # 이 시간 안에 답변이 없으면 실패로 안내
+LLM_TIMEOUT = 45.0           # API 호출 한 번의 제한 시간
+
+
+def openai_client():
+    """프로세스에서 같이 쓰는 OpenAI 클라이언트 (첫 상담 요청 때 만듦)."""
+    # OPENAI_API_KEY는 환경변수로 설정되어 있다고 가정
+    # (OPENAI_BASE_URL=http://127.0.0.1:8765/v1 로 llm_stub.py에 연결해서 테스트 가능)
+    from openai import OpenAI
+
+    return resources.shared("openai", lambda: OpenAI(timeout=LLM_TIMEOUT, max_retries=1))
+
+
+# 반복 질문 답변 캐시 (COUNSEL_CACHE=0 이면 끔, COUNSEL_CACHE_SIMILARITY=0.8 처럼 주면 비슷한 질문도 재사용)
+reply_cache = ReplyCache(
+    max_entries=512,
+    ttl=7 * 24 * 3600,
+    similarity=float(os.getenv("COUNSEL_CACHE_SIMILARITY", "0")),
+    enabled=os.getenv("COUNSEL_CACHE", "1") != "0",
+)
+
+
+CONVERSATION_KEY = "conversation_id"   # 세션에는 대화 id만 저장 (메시지는 DB, smartfarm.conversations)
+COUNSEL_JOB_KEY = "counsel_job"         # 세션에 저장하는, 답변을 기다리는 중인 작업 id
+
+COUNSEL_FAILED_REPLIES = {
+    jobs.TIMEOUT: "답변을 만드는 데 시간이 너무 오래 걸렸어요. 잠시 후에 다시 질문해 주세요.",
+    jobs.ERROR: "답변을 만드는 중에 문제가 생겼어요. 잠시 후에 다시 질문해 주세요.",
+}
+COUNSEL_BUSY_REPLY = "지금 상담 요청이 많아서 답변을 만들 수 없어요. 잠시 후에 다시 질문해 주세요."
+
+
+def _session_conversation(request):
+    """세션의 대화 (없으면 새로 만듦). 예전처럼 세션에 쌓아 둔 chat_messages가 있으면 한 번만 DB로 옮김."""
+    conversation = conversations.get_or_create(request.session.get(CONVERSATION_KEY))
+    if request.session.get(CONVERSATION_KEY) != conversation.id:
+        request.session[CONVERSATION_KEY] = conversation.id
+
+    legacy = request.session.pop("chat_messages", None)
+    plant_type = request.session.pop("plant_type", None)
+    if plant_type and not conversation.plant_type:
+        conversation.plant_type = plant_type
+        conversation.save(update_fields=["plant_type"])
+    for msg in legacy or []:
+        conversations.append(conversation.id, msg["sender"], msg["text"])
+    return conversation
+
+
+def _collect_reply(request, conversation):
+    """
+    기다리던 상담 작업이 끝났으면 None을, 아직 진행 중이면 그 작업 id를 반환.
+    답변은 작업이 끝날 때 대화에 저장되고, 여기서는 실패한 경우에만 안내 메시지를 붙임.
+    """
+    job_id = request.session.get(COUNSEL_JOB_KEY)
+    if not job_id:
+        return None
+    job = counsel_jobs.status(job_id)
+    if job is not None and job["status"] not in jobs.FINISHED:
+        return job_id
+
+    # 작업을 못 찾으면(끝난 지 오래됐거나 서버 재시작) 답변은 대개 이미 저장됐으므로 안내 없이 정리만 함
+    if job is not None and job["status"] in COUNSEL_FAILED_REPLIES:
+        conversations.append(conversation.id, "bot", COUNSEL_FAILED_REPLIES[job["status"]])
+    counsel_jobs.forget(job_id)
+    del request.session[COUNSEL_JOB_KEY]
+    return None
+
+
+def plant_counseling(request):
+    conversation = _session_conversation(request)
+    plant_type = conversation.plant_type
+    pending_job = _collect_reply(request, conversation)
+
+    if request.method == "POST":
+        plant_type_input = request.POST.get("plant_type", "").strip()
+        user_message = request.POST.get("user_message", "").strip()
+
+        if plant_type_input and plant_type_input != plant_type:
+            plant_type = conversation.plant_type = plant_type_input
+            conversation.save(update_fields=["plant_type"])
+
+        # 이전 질문의 답변을 기다리는 중이면 새 질문은 받지 않음 (화면에서도 보내기 버튼을 막음)
+        if user_message and pending_job is None:
+            # 프롬프트에 넣을 최근 대화 (토큰 예산 안에서), 그다음 사용자 메시지 저장
+            history = conversations.prompt_history(conversation.id)
+            conversations.append(conversation.id, "user", user_message)
+
+            # 대화의 첫 질문이 같은(비슷한) 질문이면 저장해 둔 답변을 바로 사용
+            # (앞 대화가 있으면 답이 문맥에 따라 달라지므로 캐시를 쓰지 않음)
+            cached = reply_cache.get(plant_type, user_message) if not history else None
+            if cached is not None:
+                conversations.append(conversation.id, "bot", cached)
+            else:
+                # GPT 호출은 백그라운드 작업으로 넘기고 바로 응답 (답변은 작업이 끝날 때 대화에 저장)
+                try:
+                    request.session[COUNSEL_JOB_KEY] = counsel_jobs.submit(
+                        conversation.id, plant_type, user_message, history=history)
+                except jobs.QueueFull:
+                    conversations.append(conversation.id, "bot", COUNSEL_BUSY_REPLY)
+
+        return redirect("plant_counseling")
+
+    # 화면에는 최근 PAGE_SIZE개만, ?before=<메시지 id>로 그 이전 페이지
+    try:
+        before_id = int(request.GET["before"]) if request.GET.get("before") else None
+    except ValueError:
+        before_id = None
+    messages, has_older = conversations.page(conversation.id, before_id)
+
+    return render(request, "plant_counseling.html", {
+        "messages": messages,
+        "has_older": has_older,
+        "older_before": messages[0]["id"] if messages else None,
+        "plant_type": plant_type,
+        "pending_job": pending_job,
+    })
+
+
+def generate_bot_reply(plant_type, user_message, history=None, on_text=None):
+    """
+    GPT API를 이용해 식물 상담 답변 생성.
+    history: 이전 대화 [{"role": "user"|"assistant", "content": ...}, ...] (conversations.prompt_history)
+    on_text: 주면 답변을 스트리밍으로 받으면서 받은 조각마다 on_text(조각)을 호출
+    """
+    # 1) 역할 + 스타일 정의 (마크다운 금지)
+    system_prompt = (
+        "너는 한국어로 답변하는 식물 상담사야. "
+        "사용자가 키우는 실내식물, 허브, 관엽식물 등의 상태를 설명하면 "
+        "가능한 원인(물주기, 광량, 온도, 통풍, 병해충 등)을 추론하고, "
+        "집에서 따라 할 수 있는 구체적인 관리 방법을 알려줘.\n\n"
+        "답변 스타일 규칙:\n"
+        "- 마크다운을 쓰지 말 것. 별표(**), #, -, 번호 목록(1. 2. 3.)을 사용하지 말 것.\n"
+        "- 보고서 말투 대신, 상담하듯이 자연스러운 한국어 문장으로 답하기.\n"
+        "- 문단은 최대 2~3개 정도, 각 문단은 2~3문장 정도로 간결하게.\n"
+        "- 핵심만 말하고, 너무 장황하게 설명하지 말 것.\n"
+        "- 가능하면 오늘 당장 해볼 수 있는 행동 위주로 조언하기."
+    )
+
+    plant_info = f"키우는 식물: {plant_type}" if plant_type else "키우는 식물 종류는 아직 모름"
+
+    # 이전 대화는 토큰 예산 안의 최근 메시지만 그대로 넣음
+    user_content = (
+        f"{plant_info}\n\n"
+        f"사용자 고민:\n{user_message}\n\n"
+        "위 고민을 바탕으로, 원인 추측과 오늘 당장 해볼 수 있는 관리 방법, "
+        "앞으로의 관리 방향을 차분하게 설명해줘."
+    )
+
+    request = dict(
+        model="gpt-4.1-mini",  # 가벼운 모델
+        input=[
+            {"role": "system", "content": system_prompt},
+            *(history or []),
+            {"role": "user", "content": user_content},
+        ],
+        max_output_tokens=400,  # 너무 길게 안 나오게 제한
+    )
+
+    if on_text is not None:
+        chunks = []
+        for event in openai_client().responses.create(stream=True, **request):
+            if event.type == "response.output_text.delta":
+                chunks.append(event.delta)
+                on_text(event.delta)
+        return "".join(chunks).strip()
+
+    resp = openai_client().responses.create(**request)
+
+    try:
+        reply_text = resp.output_text
+    except AttributeError:
+        reply_text = resp.output[0].content[0].text
+
+    return reply_text.strip()
+
+
+def counsel_reply(conversation_id, plant_type, user_message, history=None, on_text=None):
+    """상담 작업: generate_bot_reply로 답변 생성 (저장은 제시간에 끝난 경우에만 save_reply에서)."""
+    return generate_bot_reply(plant_type, user_message, history=history, on_text=on_text)
+
+
+def save_reply(reply, conversation_id, plant_type, user_message, history=None):
+    """상담 작업의 on_done: 답변을 대화에 저장하고, 첫 질문이면 reply_cache에도 저장."""
+    conversations.append(conversation_id, "bot", reply)
+    if not history:
+        reply_cache.put(plant_type, user_message, reply)
+
+
+# 시간 초과로 안내한 작업의 답변은 늦게 도착해도 저장하지 않음 (on_done이 실행되지 않음)
+counsel_jobs = jobs.JobQueue(counsel_reply, workers=COUNSEL_WORKERS, max_pending=COUNSEL_PENDING,
+                             timeout=COUNSEL_JOB_TIMEOUT, stream=True, on_done=save_reply)
+
+REPLY_POLL_INTERVAL = 0.05   # 스트리밍 중 새 조각을 확인하는 간격 (초)
+REPLY_KEEPALIVE = 15.0
+
+
+def counseling_job(request, job_id):
+    """GET /plant_counseling/jobs/<id>/ : 상담 작업 상태 {"id", "status", "result"|"error"} (자기 세션의 작업만)."""
+    job = counsel_jobs.status(job_id) if request.session.get(COUNSEL_JOB_KEY) == job_id else None
+    if job is None:
+        return JsonResponse({"error": "unknown job"}, status=404)
+    return JsonResponse(job)
+
+
+def counseling_cache_stats(request):
+    """GET /plant_counseling/cache/ : 답변 캐시 적중률 등 {"hits", "similar_hits", "misses", "hit_rate", ...}."""
+    return JsonResponse(reply_cache.stats())
+
+
+def _reply_events(job_id):
+    """
+    작업이 받은 답변 조각을 "delta" 이벤트로, 끝나면 "done" 이벤트를 보냄.
+    새 조각이 없을 때는 None을 내보내고, 기다리는 방법(sleep)은 아래 두 래퍼가 정함.
+    """
+    offset = 0
+    last_sent = time.monotonic()
+    while True:
+        state = counsel_jobs.output(job_id, offset)
+        if state is None:
+            yield push.sse_event("done", {"status": "gone"})
+            return
+        status, text, offset = state
+        if text:
+            yield push.sse_event("delta", {"text": text})
+            last_sent = time.monotonic()
+        if status in jobs.FINISHED:
+            yield push.sse_event("done", {"status": status})
+            return
+        if time.monotonic() - last_sent > REPLY_KEEPALIVE:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        yield None
+
+
+def _reply_stream_sync(job_id):
+    """WSGI(runserver 등): 요청 스레드에서 기다림 (Django가 동기 이터레이터는 버퍼링 없이 바로 보냄)."""
+    for event in _reply_events(job_id):
+        if event is None:
+            time.sleep(REPLY_POLL_INTERVAL)
+        else:
+            yield event
+
+
+async def _reply_stream_async(job_id):
+    """ASGI: 기다리는 동안 스레드를 잡지 않음."""
+    for event in _reply_events(job_id):
+        if event is None:
+            await asyncio.sleep(REPLY_POLL_INTERVAL)
+        else:
+            yield event
+
+
+def counseling_stream(request, job_id):
+    """
+    GET /plant_counseling/jobs/<id>/stream/ : 답변을 받는 대로 SSE로 전달 (text/event-stream).
+    완성된 답변은 작업이 끝날 때 대화에 저장되고, done 이벤트를 받은 페이지가 새로고침해서 보여줌.
+    ASGI에서는 비동기 이터레이터, WSGI(runserver)에서는 동기 이터레이터로 보냄
+    (WSGI에서 비동기 이터레이터를 주면 Django가 끝까지 모았다가 한 번에 보냄).
+    """
+    if request.session.get(COUNSEL_JOB_KEY) != job_id or counsel_jobs.status(job_id) is None:
+        return JsonResponse({"error": "unknown job"}, status=404)
+    events = _reply_stream_async(job_id) if isinstance(request, ASGIRequest) else _reply_stream_sync(job_id)
+    response = StreamingHttpResponse(events, content_type="text/event-stream; charset=utf-8")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,13 @@
+from django.shortcuts import render
+
+
+def home(request):
+    return render(request, "home.html")
+
+def current_plant(request):
+    return render(request, "current_plant.html")
+
+
+
+def tips(request):
+    return render(request, "tips.html", {"title": "식물관리팁", "desc": "식물관리 꿀팁"})
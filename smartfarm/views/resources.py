@@ -0,0 +1,56 @@
+"""
+Process-wide resources shared by the views, created on first use.
+
+Importing the views costs nothing beyond Django: the OpenAI client, the
+NDVI store, the latest-reading and device-liveness readers, the alert
+log and the MQTT command channel are
+built the first time a view asks for them (and an OpenAI key is only
+needed by the counseling pages). The camera is opened for the first viewer and released when the
+last one leaves.
+"""
+import threading
+
+_lock = threading.Lock()
+_instances = {}
+
+
+def shared(name, factory):
+    """The process-wide instance called `name`, made with factory() the first time."""
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+
+def ndvi_store():
+    from smartfarm.ndvi_store import NdviStore
+
+    return shared("ndvi_store", NdviStore)  # ndvi.py가 기록하는 ndvi.db (같은 위치에 있다고 가정)
+
+
+def latest_reader():
+    from smartfarm.latest import SnapshotReader
+
+    return shared("latest_reader", SnapshotReader)  # 수집 프로세스들이 쓰는 latest/*.json 을 합쳐서 캐시
+
+
+def liveness_reader():
+    from smartfarm.latest import SnapshotReader
+    from smartfarm.watchdog import LIVENESS_DIR
+
+    return shared("liveness_reader", lambda: SnapshotReader(LIVENESS_DIR))  # 수집 프로세스의 watchdog이 쓰는 liveness/*.json
+
+
+def command_channel():
+    from smartfarm.actuators import CommandChannel
+
+    return shared("command_channel", CommandChannel)  # 브로커 연결은 한 번 만들어서 계속 사용
+
+
+def alert_store():
+    from smartfarm.alerts import AlertStore
+
+    return shared("alert_store", AlertStore)  # 수집 프로세스가 기록하는 alerts.db
@@ -0,0 +1,228 @@
+"""
+Stale-device watchdog: notices devices that stop sending.
+
+A Watchdog is an Ingestor listener (ordered=False, so it sees each
+reading on arrival) keeping a last-seen index in memory: per device the
+server arrival time (recv_ms) of its newest reading and an EWMA of the
+gaps between readings. A device is offline once
+
+    now > last_seen + max(STALE_MIN_MS, STALE_FACTOR * interval)
+
+Each online device has an entry in a heap ordered by deadline. A
+reading only updates the index (and pushes a new entry in the rare case
+its deadline moved earlier, when the interval shrinks); the deadline is
+checked when the device's entry reaches the top of the heap: if it has
+been seen since, it goes back with its new deadline, otherwise it is
+marked offline. That is O(log n) per timer event, with no scan of the
+devices or the database, and the watchdog thread sleeps until the
+earliest deadline.
+
+Going offline and coming back are passed to on_change(event); attach()
+writes them to the alert log, so send_alerts.py notifies about them. The
+index is published to <LIVENESS_DIR>/<name>.json the same way as the
+latest readings (smartfarm.latest), where /api/devices/ reads it. It is
+also reloaded from there on start, so a device that stopped while the
+process was down is still noticed.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from smartfarm.latest import LatestSnapshot
+
+log = logging.getLogger("SmartFarm")
+
+LIVENESS_DIR = "liveness"
+
+STALE_FACTOR = 3.0
+STALE_MIN_MS = 30 * 1000
+DEFAULT_INTERVAL_MS = 60 * 1000  # 전송 간격을 아직 모르는 기기 (첫 측정값만 받은 상태)
+INTERVAL_ALPHA = 0.2
+
+
+def timeout_ms(interval_ms):
+    """How long after its last reading a device with this usual interval counts as offline."""
+    interval_ms = DEFAULT_INTERVAL_MS if interval_ms is None else interval_ms
+    return int(max(STALE_MIN_MS, STALE_FACTOR * interval_ms))
+
+
+def is_online(entry, now_ms):
+    """Whether a published index entry is online at now_ms (also false when the watchdog itself stopped)."""
+    return bool(entry.get("online")) and now_ms <= entry["ts_ms"] + entry["timeout_ms"]
+
+
+class _Device:
+    __slots__ = ("last_ms", "interval", "online", "since_ms", "due")
+
+    def __init__(self, last_ms, interval=None, online=True, since_ms=None):
+        self.last_ms = last_ms
+        self.interval = interval
+        self.online = online
+        self.since_ms = last_ms if since_ms is None else since_ms  # online/offline 상태가 바뀐 시각
+        self.due = None  # heap에 있는 이 기기 항목의 마감 시각 (다른 값의 항목은 지난 것이라 무시)
+
+    def deadline(self):
+        return self.last_ms + timeout_ms(self.interval)
+
+
+class Watchdog:
+    def __init__(self, path=None, on_change=None):
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._heap = []  # (deadline_ms, device_id)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counts = Counter()
+        self.snapshot = None
+        if path:
+            self.snapshot = LatestSnapshot(path)
+            for device_id, entry in self.snapshot.items():
+                device = self._devices[device_id] = _Device(entry["ts_ms"], entry.get("interval_ms"),
+                                                            entry.get("online", True), entry.get("since_ms"))
+                if device.online:
+                    self._queue(device_id, device)
+
+    def __call__(self, rows):
+        """Ingestor listener: record the arrival of each row."""
+        events, published = [], {}
+        with self._lock:
+            top = self._heap[0][0] if self._heap else None
+            for row in rows:
+                device_id, recv_ms = row["device_id"], row["recv_ms"]
+                device = self._devices.get(device_id)
+                if device is None:
+                    device = self._devices[device_id] = _Device(recv_ms)
+                    self.counts["devices"] += 1
+                elif recv_ms <= device.last_ms:
+                    continue  # 같은 배치의 나머지 측정값
+                else:
+                    gap = recv_ms - device.last_ms
+                    if device.online:
+                        # 끊겼다가 돌아온 간격은 평소 전송 간격에 넣지 않음
+                        device.interval = gap if device.interval is None else \
+                            device.interval + INTERVAL_ALPHA * (gap - device.interval)
+                    else:
+                        device.online, device.since_ms = True, recv_ms
+                        self.counts["online"] += 1
+                        events.append(self._event(device_id, device, "online", recv_ms, gap))
+                    device.last_ms = recv_ms
+                if device.due is None or device.deadline() < device.due:
+                    self._queue(device_id, device)
+                published[device_id] = device
+            rows = [self._entry(device_id, device) for device_id, device in published.items()]
+            if self._heap and self._heap[0][0] != top:
+                self._wake.set()  # 더 이른 마감 시각이 생김 (새 기기)
+        if self.snapshot is not None and rows:
+            self.snapshot(rows)
+        self._dispatch(events)
+
+    def check(self, now_ms=None):
+        """Mark the devices whose deadline has passed offline; returns the next deadline (ms) or None."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        events, rows = [], []
+        with self._lock:
+            while self._heap and self._heap[0][0] < now_ms:
+                due, device_id = heapq.heappop(self._heap)
+                device = self._devices[device_id]
+                if due != device.due:
+                    continue  # 더 이른 마감 시각으로 다시 넣은 항목이 있음
+                device.due = None
+                if device.deadline() > now_ms:
+                    self._queue(device_id, device)  # 그 사이에 측정값이 들어옴
+                    continue
+                device.online, device.since_ms = False, now_ms
+                self.counts["offline"] += 1
+                events.append(self._event(device_id, device, "offline", now_ms, now_ms - device.last_ms))
+                rows.append(self._entry(device_id, device))
+            # 맨 앞의 지난 항목은 버려서 다음 마감 시각이 실제 마감 시각이 되게 함
+            while self._heap and self._heap[0][0] != self._devices[self._heap[0][1]].due:
+                heapq.heappop(self._heap)
+            next_ms = self._heap[0][0] if self._heap else None
+        if self.snapshot is not None and rows:
+            self.snapshot(rows)
+        self._dispatch(events)
+        return next_ms
+
+    def _queue(self, device_id, device):
+        device.due = device.deadline()
+        heapq.heappush(self._heap, (device.due, device_id))
+
+    def _entry(self, device_id, device):
+        return {"device_id": device_id, "ts_ms": device.last_ms,
+                "interval_ms": None if device.interval is None else int(device.interval),
+                "timeout_ms": timeout_ms(device.interval), "online": device.online, "since_ms": device.since_ms}
+
+    def _event(self, device_id, device, state, ts_ms, gap_ms):
+        return {"ts_ms": ts_ms, "device_id": device_id, "state": state, "last_seen_ms": device.last_ms,
+                "gap_ms": gap_ms}
+
+    def _dispatch(self, events):
+        for event in events:
+            log.warning(f"[WATCHDOG] {event['device_id']} {event['state']} "
+                        f"(no reading for {event['gap_ms'] / 1000:.0f}s)")
+            if self.on_change is not None:
+                try:
+                    self.on_change(event)
+                except Exception:
+                    log.exception(f"[WATCHDOG] on_change failed for {event}")
+
+    def devices(self, now_ms=None):
+        """{device_id: index entry} with "online" as of now_ms."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._lock:
+            entries = [self._entry(device_id, device) for device_id, device in self._devices.items()]
+        return {e.pop("device_id"): {**e, "online": is_online(e, now_ms)} for e in entries}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()  # check() 전에 지워야 그 사이에 생긴 새 기기를 놓치지 않음
+            next_ms = self.check()
+            wait = None if next_ms is None else max(next_ms - time.time() * 1000, 0) / 1000 + 0.01
+            self._wake.wait(wait)
+
+    def stats(self):
+        with self._lock:
+            online = sum(device.online for device in self._devices.values())
+            return {"online": online, "offline": len(self._devices) - online, "heap": len(self._heap),
+                    "went_offline": self.counts["offline"], "came_back": self.counts["online"]}
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.snapshot is not None:
+            self.snapshot.close()
+
+
+def _alert(event):
+    minutes = round(event["gap_ms"] / 60000, 1)
+    if event["state"] == "offline":
+        message = f"{event['device_id']}: 연결 끊김 ({minutes:g}분 동안 측정값 수신 없음)"
+    else:
+        message = f"{event['device_id']}: 다시 연결됨 ({minutes:g}분 만에 수신)"
+    return {"ts_ms": event["ts_ms"], "device_id": event["device_id"], "field": "device", "kind": event["state"],
+            "value": minutes, "message": message}
+
+
+def attach(ingestor, name, store=None):
+    """
+    Subscribe a running Watchdog publishing to <LIVENESS_DIR>/<name>.json and writing
+    offline/online alerts to `store` (default: a new AlertStore on alerts.db).
+    """
+    from smartfarm.alerts import AlertStore
+
+    store = store if store is not None else AlertStore()
+    watchdog = Watchdog(os.path.join(LIVENESS_DIR, f"{name}.json"), lambda event: store.add([_alert(event)]))
+    ingestor.subscribe(watchdog, ordered=False)
+    return watchdog.start()
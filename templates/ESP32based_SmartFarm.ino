@@ -16,6 +16,8 @@ const char* mqtt_server = "192.168.1.100";     // 라즈베리파이 IP
 const int mqtt_port = 1883;
 const char* mqtt_client_id = "smartfarm_esp32_001";
 const char* mqtt_topic = "smartfarm/lab/esp32_001/telemetry/sensors";
+const char* cmd_topic = "smartfarm/lab/esp32_001/cmd";        // 서버 -> 기기 명령 {"id", "cmd"}
+const char* ack_topic = "smartfarm/lab/esp32_001/cmd/ack";    // 기기 -> 서버 응답 {"id", "ok", "state"}
 const char* device_id = "esp32_001";
 
 #define DHT_PIN 4
@@ -23,6 +25,7 @@ const char* device_id = "esp32_001";
 #define CDS_PIN_1 0
 #define CDS_PIN_2 1
 #define PUMP_PIN 10
+#define LIGHT_PIN 11      // 식물등 릴레이
 #define DHT_TYPE AM2302
 
 #define TEMP_MIN 10.0
@@ -34,6 +37,9 @@ const char* device_id = "esp32_001";
 #define LUX_MIN 100.0
 #define LUX_MAX 50000.0
 
+#define PUBLISH_INTERVAL 5000   // 센서값 전송 간격 (ms)
+#define WATER_MS 3000           // 물주기 명령 한 번에 펌프를 켜는 시간 (ms)
+
 DHT dht(DHT_PIN, DHT_TYPE);
 OneWire oneWire(ONE_WIRE_BUS);
 DallasTemperature sensors(&oneWire);
@@ -48,6 +54,10 @@ unsigned long alertStartTime = 0;
 bool alertActive = false;
 String alertMessage = "";
 
+unsigned long lastPublish = 0;
+unsigned long manualPumpUntil = 0;   // 물주기 명령으로 켠 펌프를 끌 시각 (0이면 없음)
+bool lightOn = false;
+
 void setup_wifi() {
   delay(10);
   Serial.println();
@@ -80,6 +90,7 @@ void reconnect() {
     
     if (client.connect(mqtt_client_id)) {
       Serial.println("연결 성공!");
+      client.subscribe(cmd_topic, 1);
     } else {
       Serial.print("연결 실패, rc=");
       Serial.print(client.state());
@@ -89,6 +100,47 @@ void reconnect() {
   }
 }
 
+// 서버 명령 처리: 실행하고 바로 같은 id로 ack를 보냄 (서버가 왕복 시간을 잼)
+void onCommand(char* topic, byte* payload, unsigned int length) {
+  StaticJsonDocument<256> cmd;
+  if (deserializeJson(cmd, payload, length)) {
+    Serial.println(">>> 명령 JSON 오류");
+    return;
+  }
+  const char* id = cmd["id"] | "";
+  const char* name = cmd["cmd"] | "";
+
+  StaticJsonDocument<128> ack;
+  ack["id"] = id;
+  if (strcmp(name, "water") == 0) {
+    digitalWrite(PUMP_PIN, HIGH);
+    manualPumpUntil = millis() + WATER_MS;
+    ack["ok"] = true;
+    ack["state"] = "pump_on";
+  } else if (strcmp(name, "light") == 0) {
+    lightOn = true;
+    digitalWrite(LIGHT_PIN, HIGH);
+    ack["ok"] = true;
+    ack["state"] = "light_on";
+  } else if (strcmp(name, "light_off") == 0) {
+    lightOn = false;
+    digitalWrite(LIGHT_PIN, LOW);
+    ack["ok"] = true;
+    ack["state"] = "light_off";
+  } else {
+    ack["ok"] = false;
+    ack["error"] = "unknown cmd";
+  }
+
+  char buffer[128];
+  serializeJson(ack, buffer);
+  client.publish(ack_topic, buffer);
+  Serial.print(">>> 명령 ");
+  Serial.print(name);
+  Serial.print(" -> ");
+  Serial.println(buffer);
+}
+
 void publishSensorData(float airTemp, float airHumidity, float waterTemp1, 
                        float waterTemp2, float lux1, float lux2, 
                        int cdsValue1, int cdsValue2, bool pumpStatus) {
@@ -209,6 +261,8 @@ void setup() {
   
   pinMode(PUMP_PIN, OUTPUT);
   digitalWrite(PUMP_PIN, LOW);
+  pinMode(LIGHT_PIN, OUTPUT);
+  digitalWrite(LIGHT_PIN, LOW);
   
   lcd.init();
   lcd.backlight();
@@ -221,6 +275,7 @@ void setup() {
   
   setup_wifi();
   client.setServer(mqtt_server, mqtt_port);
+  client.setCallback(onCommand);
   
   dht.begin();
   sensors.begin();
@@ -248,7 +303,19 @@ void loop() {
   if (!client.connected()) {
     reconnect();
   }
-  client.loop();
+  client.loop();   // 명령은 여기서 받아서 바로 처리 (onCommand)
+
+  // 물주기 명령 시간이 끝나면 펌프를 끄고 자동 제어로 돌아감
+  if (manualPumpUntil != 0 && (long)(millis() - manualPumpUntil) >= 0) {
+    manualPumpUntil = 0;
+    digitalWrite(PUMP_PIN, LOW);
+  }
+
+  // 센서 읽기/전송은 PUBLISH_INTERVAL마다 (delay로 기다리면 그동안 명령을 못 받음)
+  if (lastPublish != 0 && millis() - lastPublish < PUBLISH_INTERVAL) {
+    return;
+  }
+  lastPublish = millis();
   
   float airHumidity = dht.readHumidity();
   float airTemp = dht.readTemperature();
@@ -285,7 +352,10 @@ void loop() {
   Serial.println("============================");
   
   bool pumpStatus = false;
-  if (waterTemp1 < 20.0 && waterTemp1 > 0.0) {
+  if (manualPumpUntil != 0) {
+    Serial.println("-> 펌프 ON (물주기 명령)");
+    pumpStatus = true;
+  } else if (waterTemp1 < 20.0 && waterTemp1 > 0.0) {
     Serial.println("-> 펌프 ON");
     digitalWrite(PUMP_PIN, HIGH);
     pumpStatus = true;
@@ -301,5 +371,4 @@ void loop() {
                     lux1, lux2, cdsValue1, cdsValue2, pumpStatus);
   
   Serial.println("");
-  delay(5000);
 }
\ No newline at end of file
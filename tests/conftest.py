@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트의 스크립트(server_async.py 등)와 smartfarm 패키지를 import 할 수 있도록
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
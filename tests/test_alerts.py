@@ -0,0 +1,129 @@
+import time
+
+import send_alerts
+from smartfarm import alerts
+from smartfarm.alerts import AlertDetector, AlertStore, FieldCheck
+
+MINUTE_MS = alerts.MINUTE_MS
+HOUR_MS = alerts.HOUR_MS
+BASE_MS = (int(time.time() * 1000) // HOUR_MS - 24) * HOUR_MS
+
+
+def feed(detector, readings, device_id="d1"):
+    """readings: [(minute, {field: value}), ...]; returns [(minute, field, kind), ...] of the raised alerts."""
+    raised = []
+    for minute, fields in readings:
+        for alert in detector.check({"ts_ms": BASE_MS + minute * MINUTE_MS, "device_id": device_id, **fields}):
+            raised.append((minute, alert["field"], alert["kind"]))
+    return raised
+
+
+def steady(minutes, start=0, **fields):
+    return [(start + i, dict(fields)) for i in range(minutes)]
+
+
+def test_limit_is_raised_when_it_starts_and_not_again_within_cooldown():
+    detector = AlertDetector()
+    readings = steady(5, temp_air=25.0) + steady(5, 5, temp_air=8.0) + steady(5, 10, temp_air=25.0) \
+        + steady(3, 15, temp_air=8.0) + steady(40, 18, temp_air=25.0) + [(58, {"temp_air": 8.0})]
+    raised = [r for r in feed(detector, readings) if r[2] == "low"]
+    # 15분: 30분 안에 다시 시작해서 알리지 않음
+    assert raised == [(5, "temp_air", "low"), (58, "temp_air", "low")]
+    assert detector.stats()["suppressed_cooldown"] >= 1
+
+
+def test_zero_degrees_is_a_reading_not_a_sensor_fault():
+    detector = AlertDetector()
+    raised = feed(detector, steady(5, temp_air=0.0, humidity=0.0))
+    assert ("temp_air", "fault") not in {(f, k) for _, f, k in raised}
+    assert (0, "temp_air", "low") in raised and (0, "humidity", "low") in raised
+
+
+def test_missing_or_placeholder_values_raise_a_fault():
+    detector = AlertDetector()
+    readings = steady(3, temp_air=25.0, temp_water=20.0) + steady(4, 3, temp_air=None, temp_water=-127.0)
+    raised = feed(detector, readings)
+    assert [r for r in raised if r[2] == "fault"] == [(5, "temp_air", "fault"), (5, "temp_water", "fault")]
+
+
+def test_zscore_after_warmup_only():
+    detector = AlertDetector()
+    readings = [(i, {"temp_air": 25.0 + (i % 3) * 0.1}) for i in range(alerts.WARMUP_SAMPLES + 10)]
+    # 10분 간격으로 바뀌어 변화율 한도(1분에 5도)는 넘지 않음
+    readings.append((alerts.WARMUP_SAMPLES + 20, {"temp_air": 32.0}))
+    raised = [r for r in feed(detector, readings) if r[1] == "temp_air"]
+    assert raised == [(alerts.WARMUP_SAMPLES + 20, "temp_air", "zscore")]
+
+    early = AlertDetector()
+    assert feed(early, [(0, {"temp_air": 25.0}), (1, {"temp_air": 25.1}), (20, {"temp_air": 32.0})]) == []
+
+
+def test_rate_over_at_least_a_minute():
+    detector = AlertDetector()
+    # 10초 만에 2도는 1분으로 환산해서 2도/분 (한도 5도 미만), 1분 만에 7도는 급변
+    readings = [(0, {"temp_air": 20.0}), (1 / 6, {"temp_air": 22.0}), (1 + 1 / 6, {"temp_air": 29.0})]
+    assert feed(detector, readings) == [(1 + 1 / 6, "temp_air", "rate")]
+
+
+def test_stuck_sensor():
+    detector = AlertDetector()
+    raised = feed(detector, steady(150, temp_air=25.0))
+    assert raised == [(120, "temp_air", "stuck")]
+
+
+def test_dropout_uses_the_usual_interval():
+    detector = AlertDetector()
+    # 평소 1분 간격: 4분 늦은 것은 공백이 아님, 16분 공백은 알림 (값은 분 단위)
+    assert feed(detector, steady(10, soil_pct=50) + [(14, {"soil_pct": 50})]) == []
+    alert = detector.check({"ts_ms": BASE_MS + 30 * MINUTE_MS, "device_id": "d1", "soil_pct": 50})
+    assert [(a["field"], a["kind"], a["value"]) for a in alert] == [("device", "dropout", 16.0)]
+
+
+def test_alerts_per_device_are_rate_limited():
+    checks = {f"f{i}": FieldCheck(low=10) for i in range(7)}
+    detector = AlertDetector(checks=checks)
+    assert len(feed(detector, [(0, {name: 0 for name in checks})])) == alerts.ALERT_BURST
+    assert detector.stats()["suppressed_rate"] == 2
+    # 다른 기기는 따로 셈
+    assert len(feed(detector, [(0, {name: 0 for name in checks})], device_id="d2")) == alerts.ALERT_BURST
+    # 시간당 ALERTS_PER_HOUR개씩 다시 채워짐 (5분에 하나)
+    feed(detector, [(1, {name: 50 for name in checks})])
+    assert len(feed(detector, [(6, {name: 0 for name in checks})])) == 1
+
+
+def test_outbox_delivery_and_backoff(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts.db"))
+    try:
+        detector = AlertDetector(store)
+        detector([{"ts_ms": BASE_MS, "device_id": "d1", "temp_air": 45.0}])
+        [alert] = store.recent()
+        assert alert["kind"] == "high" and "고온" in alert["message"]
+
+        [entry] = store.pending()
+        store.mark_failed([entry["outbox_id"]])
+        assert store.pending() == []
+        now_ms = int(time.time() * 1000)
+        [retry] = store.pending(now_ms=now_ms + alerts.RETRY_MS)
+        assert retry["attempts"] == 1
+
+        for _ in range(alerts.MAX_ATTEMPTS - 1):
+            store.mark_failed([entry["outbox_id"]])
+        assert store.pending(now_ms=now_ms + 10 * HOUR_MS) == []  # 포기 (failed)
+
+        detector([{"ts_ms": BASE_MS + MINUTE_MS, "device_id": "d2", "temp_air": 45.0}])
+        assert send_alerts.drain(store, url=None) == (1, 0)
+        assert store.pending(now_ms=now_ms + 10 * HOUR_MS) == []
+    finally:
+        store.close()
+
+
+def test_failed_delivery_is_retried_later(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts.db"))
+    try:
+        store.add([{"ts_ms": BASE_MS, "device_id": "d1", "field": "temp_air", "kind": "high", "value": 45.0,
+                    "message": "d1: 고온"}])
+        assert send_alerts.drain(store, url="http://127.0.0.1:9/hook") == (0, 1)
+        assert store.pending() == []
+        assert store.pending(now_ms=int(time.time() * 1000) + alerts.RETRY_MS)[0]["attempts"] == 1
+    finally:
+        store.close()
@@ -0,0 +1,141 @@
+import time
+
+import numpy as np
+import pytest
+
+from smartfarm import blockcodec, rollups
+from smartfarm.ingest import normalize
+from smartfarm.sensor_db import PartitionedStore, day_of, day_start_ms, init_db
+
+FIELDS = [field for field, _ in rollups.FIELDS]
+
+
+def readings(count, seed=1, start_ms=1_790_000_000_000, step_ms=5000):
+    """ESP32-like block input: 5 s timestamps with jitter, 1-decimal temperatures, integer raw values."""
+    rng = np.random.default_rng(seed)
+    ts = start_ms + np.arange(count) * step_ms + rng.integers(-40, 40, count)
+    ts[0] = start_ms
+    walk = np.cumsum(rng.normal(0, 0.05, count))
+    fields = {
+        "temp_air": np.round(22 + walk, 1),
+        "humidity": np.round(55 - 3 * walk, 1),
+        "temp_water": np.round(19 + walk / 2, 2),
+        "soil_pct": np.round(40 + walk).astype(float),
+        "cds_raw": rng.integers(1800, 1900, count).astype(float),
+    }
+    fields["humidity"][::7] = np.nan  # 가끔 빠진 값
+    return ts, fields
+
+
+def assert_round_trip(ts, fields):
+    block = blockcodec.encode(ts, fields)
+    out_ts, out = blockcodec.decode(block)
+    np.testing.assert_array_equal(out_ts, ts)
+    assert set(out) == {name for name, v in fields.items() if not np.all(np.isnan(v))}
+    for name, values in out.items():
+        # NaN 위치까지 같고, 값은 비트 단위로 같음
+        expected = np.asarray(fields[name], dtype=np.float64)
+        np.testing.assert_array_equal(np.isnan(values), np.isnan(expected))
+        keep = ~np.isnan(expected)
+        assert np.array_equal(values[keep].view(np.uint64), expected[keep].view(np.uint64))
+    return block
+
+
+def field_encodings(block):
+    _, count, _, _, n_fields = blockcodec.HEADER.unpack_from(block)
+    _, ts_len = blockcodec.TS_HEADER.unpack_from(block, blockcodec.HEADER.size)
+    offset = blockcodec.HEADER.size + blockcodec.TS_HEADER.size + ts_len
+    return {f[0]: f[1] & ~blockcodec.DEFLATED for f in blockcodec._fields(block, count, offset, n_fields)}
+
+
+def test_short_decimal_block_round_trip():
+    ts, fields = readings(300)
+    block = assert_round_trip(ts, fields)
+    assert set(field_encodings(block).values()) == {blockcodec.DECIMAL}
+
+
+def test_xor_fallback_round_trip():
+    rng = np.random.default_rng(2)
+    ts = 1_790_000_000_000 + np.cumsum(rng.integers(1, 20_000, 200))
+    fields = {
+        "noise": rng.normal(0, 1, 200),
+        "special": np.tile([np.inf, -np.inf, 0.0, -0.0, np.nan, 1e-300, 2.0 ** 60, -(2.0 ** 62) + 1], 25),
+        "empty": np.full(200, np.nan),
+    }
+    block = assert_round_trip(ts, fields)
+    assert field_encodings(block) == {"noise": blockcodec.XOR, "special": blockcodec.XOR}
+
+
+def test_single_row_block():
+    assert_round_trip(np.array([1_790_000_000_000]), {"temp_air": [21.5], "cds_raw": [np.nan]})
+    assert_round_trip(np.array([5]), {"x": [np.pi]})
+
+
+def test_full_block_is_small_and_lossless():
+    ts, fields = readings(blockcodec.BLOCK_ROWS)
+    block = assert_round_trip(ts, fields)
+    # 5개 필드 float64 + ts = 48바이트/측정값 -> 실측 약 3바이트
+    assert len(block) / blockcodec.BLOCK_ROWS < 4
+
+
+def test_names_limit_the_decoded_fields():
+    ts, fields = readings(50)
+    _, out = blockcodec.decode(blockcodec.encode(ts, fields), {"temp_air"})
+    assert list(out) == ["temp_air"]
+
+
+def test_header_has_min_max_without_decoding():
+    ts, fields = readings(500)
+    block = bytearray(blockcodec.encode(ts, fields))
+    count, first, last, ranges = blockcodec.header(block)
+    assert (count, first, last) == (500, ts[0], ts[-1])
+    for name, values in fields.items():
+        assert ranges[name] == (np.nanmin(values), np.nanmax(values))
+    block[-20:] = b"\xff" * 20  # 마지막 필드의 값 부분만 망가뜨려도 헤더는 읽힘
+    assert blockcodec.header(block)[3] == ranges
+    with pytest.raises(ValueError):
+        blockcodec.header(b"XXXX" + bytes(block[4:]))
+
+
+def cold_rows(count, device_id="d1"):
+    """Readings every 5 s from the start of a day a week ago."""
+    start = day_start_ms(day_of(int(time.time() * 1000)) - 7)
+    ts, fields = readings(count, start_ms=start)
+    rows = []
+    for i in range(count):
+        payload = {"device_id": device_id, "seq": i, "ts": int(ts[i])}
+        payload.update({name: float(v[i]) for name, v in fields.items() if not np.isnan(v[i])})
+        rows.append(normalize(payload, int(ts[i]), []))
+    return rows
+
+
+def test_compaction_keeps_raw_series_identical(tmp_path, monkeypatch):
+    init_db(str(tmp_path / "farm.db"))
+    store = PartitionedStore(str(tmp_path / "farm.db"))
+    try:
+        rows = cold_rows(blockcodec.BLOCK_ROWS + 1000) + cold_rows(300, "d2")
+        store.insert(rows)
+        day = day_of(rows[0]["ts_ms"])
+        start, end = day_start_ms(day), day_start_ms(day + 1)
+        before = {(d, f): store.raw_series(d, f, start, end) for d in ("d1", "d2") for f in FIELDS}
+
+        assert store.compact(day) == len(rows)
+        alias = store.attach(day)
+        assert store.conn.execute(f"SELECT COUNT(*) FROM {alias}.sensor_logs").fetchone()[0] == 0
+        blocks = store.conn.execute(f"SELECT device_id, count FROM {alias}.sensor_blocks ORDER BY id").fetchall()
+        assert blocks == [("d1", blockcodec.BLOCK_ROWS), ("d1", 1000), ("d2", 300)]
+
+        for key, (ts, values) in before.items():
+            after_ts, after_values = store.raw_series(*key, start, end)
+            np.testing.assert_array_equal(after_ts, ts)
+            np.testing.assert_array_equal(after_values, values)
+
+        # 범위 밖의 블록은 풀지 않음 (블록의 start/end로 건너뜀)
+        decoded = []
+        decode = blockcodec.decode
+        monkeypatch.setattr(blockcodec, "decode", lambda data, names=None: decoded.append(1) or decode(data, names))
+        last_ts = rows[blockcodec.BLOCK_ROWS + 999]["ts_ms"]
+        ts, _ = store.raw_series("d1", "temp_air", last_ts - 60_000, last_ts + 1)
+        assert len(decoded) == 1 and ts[-1] == last_ts
+    finally:
+        store.close()
@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+
+from smartfarm import query, rollups
+from smartfarm.columnstore import SCHEMA, ColumnStore, import_csv
+from smartfarm.ingest import normalize
+from smartfarm.sensor_db import PartitionedStore, SqliteSink
+
+NOW_MS = int(time.time() * 1000) // 1000 * 1000
+
+
+def reading(device_id, ts_ms, **fields):
+    return normalize({"device_id": device_id, "ts": ts_ms, **fields}, ts_ms, [])
+
+
+def test_raw_series_reads_one_device(tmp_path):
+    store = ColumnStore(str(tmp_path / "store"), chunk_rows=4)
+    store.write([reading("a" if i % 2 else "b", NOW_MS + i * 1000, temp_air=20 + i / 10) for i in range(10)])
+    store.write([reading("a", NOW_MS + 11_000)])  # temp_air 없음
+
+    ts, values = store.raw_series("a", "temp_air", NOW_MS + 2000, NOW_MS + 20_000)
+    assert ts.tolist() == [NOW_MS + i * 1000 for i in (3, 5, 7, 9)]
+    assert values.tolist() == [20.3, 20.5, 20.7, 20.9]
+    assert len(store.read(["ts_ms"], device_id="b")["ts_ms"]) == 5
+    assert store.raw_series("c", "temp_air", NOW_MS, NOW_MS + 20_000)[0].size == 0
+
+    reader = ColumnStore(str(tmp_path / "store"), readonly=True)
+    assert reader.device_since("a") == NOW_MS + 1000
+    assert reader.raw_series("a", "temp_air", NOW_MS, NOW_MS + 20_000)[1].tolist()[0] == 20.1
+
+
+def test_new_schema_column_keeps_open_chunk_rows(tmp_path):
+    old = ColumnStore(str(tmp_path / "store"), schema=SCHEMA[:-1])
+    old.write([{"ts_ms": NOW_MS + i, "temp_air": 1.5} for i in range(3)])
+    old.close()
+
+    store = ColumnStore(str(tmp_path / "store"))
+    store.write([reading("a", NOW_MS + 10, temp_air=2.5)])
+    data = store.read(["temp_air", "device"])
+    assert data["temp_air"].tolist() == [1.5, 1.5, 1.5, 2.5]
+    assert store.raw_series("a", "temp_air", NOW_MS, NOW_MS + 100)[1].tolist() == [2.5]
+
+
+def test_raw_reads_come_from_the_column_store_after_sqlite(tmp_path):
+    db_file = str(tmp_path / "farm.db")
+    sink = SqliteSink(db_file)
+    sink.write([reading("a", NOW_MS - 60_000 + i * 1000, humidity=40 + i) for i in range(3)])
+    sink.close()
+    columns = ColumnStore(str(tmp_path / "store"))
+    columns.write([reading("a", NOW_MS + i * 1000, humidity=50 + i) for i in range(3)])
+
+    store = PartitionedStore(db_file)
+    raw = query.RawSeries(store, ColumnStore(str(tmp_path / "store"), readonly=True))
+    rows = rollups.query_series(store, "a", "humidity", NOW_MS - 120_000, NOW_MS + 60_000, 0, raw)
+    assert [v for _, v, _, _, _ in rows] == [40, 41, 42, 50, 51, 52]
+    # 컬럼 저장소에 없는 기기는 SQLite에서 읽음
+    assert raw.raw_series("z", "humidity", NOW_MS - 120_000, NOW_MS)[0].size == 0
+    store.close()
+
+
+def test_import_csv_rejects_misaligned_rows(tmp_path):
+    path = tmp_path / "sensor_data.csv"
+    path.write_text(
+        "timestamp,temp_air,humidity\n"
+        "2025-05-01T10:00:00,21.5,40\n"
+        "2025-05-01T10:01:00,21.6,41,999\n"   # 필드가 하나 더 많음
+        "2025-05-01T10:02:00,41\n"            # 하나 모자람
+        "not a time,21.8,43\n"
+        "2025-05-01T10:04:00,21.9,\n"
+    )
+    store = ColumnStore(str(tmp_path / "store"))
+    assert import_csv(store, str(path)) == (2, 3)
+    data = store.read(["temp_air", "humidity"], device_id="default")
+    assert data["temp_air"].tolist() == [21.5, np.float32(21.9)]
+    assert data["humidity"][0] == 40 and np.isnan(data["humidity"][1])
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from smartfarm import downsample
+
+
+def reference_lttb(x, y, n_out):
+    """Sequential LTTB as published (Steinarsson 2013), one bucket at a time."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    out, a = [0], 0
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        cx = sum(x[end:next_end]) / (next_end - end)
+        cy = sum(y[end:next_end]) / (next_end - end)
+        best, chosen = -1.0, start
+        for j in range(start, end):
+            area = abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a]))
+            if area > best:
+                best, chosen = area, j
+        out.append(chosen)
+        a = chosen
+    return out + [n - 1]
+
+
+def series(kind, n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.integers(1, 5, n)).astype(np.float64)
+    if kind == "walk":
+        return x, np.cumsum(rng.normal(0, 1, n))
+    if kind == "noise":
+        return x, rng.normal(0, 1, n)
+    return x, np.sin(np.arange(n) / 4)
+
+
+@pytest.mark.parametrize("kind", ["walk", "noise", "sine"])
+@pytest.mark.parametrize("n, n_out", [(10, 3), (50, 7), (300, 40), (1000, 999)])
+def test_lttb_keeps_the_ends_and_at_most_n_out_points(kind, n, n_out):
+    x, y = series(kind, n)
+    keep = downsample.lttb(x, y, n_out)
+    assert len(keep) == n_out
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_short_series_and_tiny_targets():
+    x, y = series("walk", 20)
+    assert downsample.lttb(x, y, 20).tolist() == list(range(20))
+    assert downsample.lttb(x, y, 50).tolist() == list(range(20))
+    assert downsample.lttb(x, y, 2).tolist() == [0, 19]
+    assert len(downsample.lttb(x, y, 1)) == 1 and len(downsample.lttb(x, y, 0)) == 0
+
+
+@pytest.mark.parametrize("kind", ["walk", "noise", "sine"])
+def test_lttb_matches_the_sequential_reference_with_enough_passes(kind):
+    x, y = series(kind, 300, seed=5)
+    expected = reference_lttb(x.tolist(), y.tolist(), 40)
+    assert downsample.lttb(x, y, 40, passes=38).tolist() == expected
+    # 기본 두 번: 앞의 두 버킷은 항상 같음 (나머지가 다를 수 있는 경우는 모듈 docstring)
+    assert downsample.lttb(x, y, 40).tolist()[:3] == expected[:3]
+
+
+def test_minmax_keeps_the_extremes_within_n_out():
+    x, y = series("noise", 5000, seed=2)
+    y[1234], y[4321] = 40.0, -40.0  # 한 점짜리 급변
+    for n_out in (2, 3, 10, 101, 1000):
+        xs, ys = downsample.minmax(x, y, y, n_out)
+        assert len(xs) <= n_out
+        assert np.all(np.diff(xs) >= 0)
+        assert ys.max() == 40.0 and ys.min() == -40.0
+        assert xs[ys.argmax()] == x[1234] and xs[ys.argmin()] == x[4321]
+    with pytest.raises(ValueError):
+        downsample.minmax(x, y, y, 1)
+
+
+def test_minmax_with_rollup_columns():
+    x = np.arange(100.0)
+    lo, hi = np.full(100, 10.0), np.full(100, 20.0)
+    lo[10], hi[90] = 1.0, 99.0
+    xs, ys = downsample.minmax(x, lo, hi, 4)
+    # 버킷 두 개, 버킷마다 최저와 최고 (같은 값이면 처음 것)
+    assert list(zip(xs.tolist(), ys.tolist())) == [(0.0, 20.0), (10.0, 1.0), (50.0, 10.0), (90.0, 99.0)]
+    # 목표보다 짧으면 그대로 (min/max의 가운데)
+    xs, ys = downsample.minmax(x[:3], lo[:3], hi[:3], 10)
+    assert xs.tolist() == [0.0, 1.0, 2.0] and ys.tolist() == [15.0, 15.0, 15.0]
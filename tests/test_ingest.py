@@ -0,0 +1,49 @@
+import pytest
+
+from smartfarm.ingest import build_ingestor, normalize
+
+RECV_MS = 1_790_000_000_000
+
+
+@pytest.mark.parametrize("field, value", [
+    ("cds_raw", 1e10),
+    ("cds_raw", 1e20),
+    ("soil_pct", 2**31),
+    ("light_pct", -2**31),   # int32 최솟값은 columnstore의 "값 없음" 표시
+    ("soil_raw", 10**30),
+])
+def test_out_of_range_int_is_bad_field(field, value):
+    bad = []
+    row = normalize({"device_id": "d1", field: value, "temp_air": 21.5}, RECV_MS, bad)
+    assert row[field] is None
+    assert bad == [field]
+    assert row["temp_air"] == 21.5
+
+
+def test_int32_limits_are_accepted():
+    bad = []
+    row = normalize({"cds_raw": 2**31 - 1, "soil_raw": -2**31 + 1, "soil_pct": 40.0}, RECV_MS, bad)
+    assert bad == []
+    assert (row["cds_raw"], row["soil_raw"], row["soil_pct"]) == (2**31 - 1, -2**31 + 1, 40)
+
+
+def test_out_of_range_seq_and_ts():
+    bad = []
+    row = normalize({"seq": 2**63, "ts_ms": 1e30}, RECV_MS, bad)
+    assert row["seq"] is None and row["ts_ms"] == RECV_MS
+    assert sorted(bad) == ["seq", "ts"]
+
+
+def test_out_of_range_reading_is_stored_without_the_field(tmp_path):
+    ingestor = build_ingestor(db_file=str(tmp_path / "farm.db"), store_dir=str(tmp_path / "store"),
+                              spool_dir=str(tmp_path / "spool"))
+    try:
+        ingestor.ingest({"device_id": "d1", "cds_raw": 1e20, "soil_pct": 33})
+        ingestor.ingest({"device_id": "d1", "cds_raw": 512, "soil_pct": 34})
+        ingestor.flush()
+        assert ingestor.stats()["bad_fields"] == 1
+        assert ingestor.writer.pending() == 0
+        store = ingestor.writer.sinks[1]
+        assert list(store.read(["cds_raw", "soil_pct"])["soil_pct"]) == [33, 34]
+    finally:
+        ingestor.close()
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from smartfarm import jobs
+
+
+def wait_finished(queue, job_id, limit=5.0):
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline:
+        job = queue.status(job_id)
+        if job is None or job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_late_reply_after_timeout_is_not_saved():
+    saved = []
+    release = threading.Event()
+    ran = threading.Event()
+
+    def slow(question):
+        release.wait(5)
+        ran.set()
+        return f"reply to {question}"
+
+    queue = jobs.JobQueue(slow, workers=1, timeout=0.1, on_done=lambda reply, question: saved.append(reply))
+    try:
+        job_id = queue.submit("q1")
+        assert wait_finished(queue, job_id)["status"] == jobs.TIMEOUT
+        release.set()
+        ran.wait(5)
+        time.sleep(0.05)
+        assert queue.status(job_id)["status"] == jobs.TIMEOUT
+        assert saved == []
+    finally:
+        queue.shutdown()
+
+
+def test_late_reply_nobody_polled_is_not_saved():
+    saved = []
+    queue = jobs.JobQueue(lambda: time.sleep(0.2) or "late", workers=1, timeout=0.05,
+                          on_done=lambda reply: saved.append(reply))
+    try:
+        job_id = queue.submit()
+        time.sleep(0.4)  # 그동안 status()를 부르지 않음
+        assert queue.status(job_id)["status"] == jobs.TIMEOUT
+        assert saved == []
+    finally:
+        queue.shutdown()
+
+
+def test_reply_in_time_is_saved_before_done():
+    saved = []
+
+    def on_done(reply, question):
+        time.sleep(0.2)  # 저장하는 동안에는 제한 시간이 지나도 timeout으로 바뀌지 않음
+        saved.append((question, reply))
+
+    queue = jobs.JobQueue(lambda question: "ok", workers=1, timeout=0.1, on_done=on_done)
+    try:
+        job_id = queue.submit("q1")
+        job = wait_finished(queue, job_id)
+        assert job == {"id": job_id, "status": jobs.DONE, "result": "ok"}
+        assert saved == [("q1", "ok")]
+    finally:
+        queue.shutdown()
+
+
+def test_failing_on_done_marks_error():
+    queue = jobs.JobQueue(lambda: "ok", on_done=lambda reply: 1 / 0)
+    try:
+        job = wait_finished(queue, queue.submit())
+        assert job["status"] == jobs.ERROR
+        assert job["error"].startswith("ZeroDivisionError")
+    finally:
+        queue.shutdown()
@@ -0,0 +1,114 @@
+"""Counseling jobs against llm_stub.py (the local Responses API stand-in), no key or network needed."""
+import os
+import threading
+import time
+
+import django
+import pytest
+from openai import OpenAI
+
+import llm_stub
+from smartfarm import jobs
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from smartfarm.views import counseling  # noqa: E402  (Django 설정 뒤에 import)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Start the stub on a free port and point generate_bot_reply at it; yields StubHandler (delay, peak, ...)."""
+    server = llm_stub.serve(0, delay=0.2, token_delay=0.01)
+    handler = llm_stub.StubHandler
+    handler.calls = handler.active = handler.peak = 0
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="stub",
+                    timeout=5.0, max_retries=0)
+    monkeypatch.setattr(counseling, "openai_client", lambda: client)
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+
+def reply(question, on_text=None):
+    return counseling.generate_bot_reply("몬스테라", question, on_text=on_text)
+
+
+def wait_finished(queue, job_id, limit=5.0):
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline:
+        job = queue.status(job_id)
+        if job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_reply_is_streamed_while_the_job_runs(llm):
+    queue = jobs.JobQueue(reply, workers=1, timeout=5.0, stream=True)
+    try:
+        job_id = queue.submit("잎이 노래져요")
+        partial = None
+        while partial is None:
+            status, text, _ = queue.output(job_id)
+            if status == jobs.RUNNING and text:
+                partial = text
+            assert status not in jobs.FINISHED, "no partial text before the job finished"
+            time.sleep(0.005)
+        assert llm_stub.REPLY.startswith(partial) and partial != llm_stub.REPLY
+        job = wait_finished(queue, job_id)
+        assert job == {"id": job_id, "status": jobs.DONE, "result": llm_stub.REPLY}
+        assert queue.output(job_id)[1] == llm_stub.REPLY
+    finally:
+        queue.shutdown()
+
+
+def test_at_most_workers_calls_run_at_once(llm):
+    queue = jobs.JobQueue(reply, workers=2, timeout=5.0)
+    try:
+        ids = [queue.submit(f"질문 {i}") for i in range(5)]
+        assert [wait_finished(queue, job_id)["status"] for job_id in ids] == [jobs.DONE] * 5
+        assert llm.calls == 5
+        assert llm.peak == 2
+    finally:
+        queue.shutdown()
+
+
+def test_submit_beyond_max_pending_is_refused(llm):
+    queue = jobs.JobQueue(reply, workers=1, max_pending=2, timeout=5.0)
+    try:
+        first, second = queue.submit("a"), queue.submit("b")
+        with pytest.raises(jobs.QueueFull):
+            queue.submit("c")
+        wait_finished(queue, first)
+        wait_finished(queue, second)
+        assert queue.status(queue.submit("d"))["status"] in (jobs.QUEUED, jobs.RUNNING)
+    finally:
+        queue.shutdown()
+
+
+def test_slow_llm_times_out_and_its_late_reply_is_dropped(llm):
+    llm.delay = 0.5
+    saved = []
+    answered = threading.Event()
+
+    def slow_reply(question, on_text=None):
+        try:
+            return reply(question, on_text)
+        finally:
+            answered.set()
+
+    queue = jobs.JobQueue(slow_reply, workers=1, timeout=0.2, stream=True,
+                          on_done=lambda text, question: saved.append(text))
+    try:
+        running = queue.submit("물을 얼마나 줘야 하나요")
+        waiting = queue.submit("두 번째 질문")  # 작업자가 하나뿐이라 대기 중에 시간 초과
+        assert wait_finished(queue, running)["status"] == jobs.TIMEOUT
+        assert wait_finished(queue, waiting)["status"] == jobs.TIMEOUT
+        assert answered.wait(5)
+        time.sleep(0.05)
+        assert queue.status(running)["status"] == jobs.TIMEOUT
+        assert saved == []
+        assert llm.calls == 1  # 대기 중에 시간 초과된 작업은 호출하지 않음
+    finally:
+        queue.shutdown()
@@ -0,0 +1,93 @@
+import random
+
+from smartfarm.ordering import ReorderBuffer, SeqTracker
+
+WINDOW = 4096
+NOW_MS = 1_790_000_000_000
+
+
+def seq(boot, count):
+    """final.ino: ((uint64_t)bootCount << 32) | sendCount."""
+    return boot << 32 | count
+
+
+def test_repeats_inside_the_window_are_duplicates():
+    tracker = SeqTracker()
+    assert tracker.window == WINDOW
+    assert [tracker.is_duplicate("d1", s) for s in (5, 6, 5, 7, 6)] == [False, False, True, False, True]
+    assert tracker.is_duplicate("d2", 5) is False  # 기기마다 따로
+
+    for s in range(8, 10_000):
+        if s != 5000:  # 전송에 실패해서 한참 뒤에 오는 측정값
+            tracker.is_duplicate("d1", s)
+    highest = 9999
+    assert tracker.is_duplicate("d1", highest - WINDOW) is True  # 창의 끝은 기억함
+    # 창보다 오래된 처음 보는 번호는 기억하지 않고 DB 유니크 인덱스에 맡김
+    assert highest - WINDOW > 5000
+    assert tracker.is_duplicate("d1", 5000) is False
+    assert tracker.is_duplicate("d1", 5000) is False
+
+
+def test_memory_per_device_stays_bounded():
+    tracker = SeqTracker()
+    for s in range(20 * WINDOW):
+        tracker.is_duplicate("d1", s)
+    highest, seen = tracker._devices["d1"]
+    assert highest == 20 * WINDOW - 1
+    assert len(seen) <= 2 * WINDOW + 1 and min(seen) >= highest - 2 * WINDOW
+
+
+def test_reboot_rolls_seq_over_to_the_next_boot():
+    tracker = SeqTracker()
+    for n in range(100):
+        assert tracker.is_duplicate("d1", seq(1, n)) is False
+    # 재부팅하면 sendCount가 0부터 다시 시작해도 bootCount가 올라서 새 번호
+    assert tracker.is_duplicate("d1", seq(2, 0)) is False
+    assert tracker.is_duplicate("d1", seq(2, 1)) is False
+    assert tracker.is_duplicate("d1", seq(2, 0)) is True
+    # 재부팅 전에 본 번호의 재전송은 아직 기억하고, 처음 보는 번호는 창 밖이라 DB에 맡김
+    assert tracker.is_duplicate("d1", seq(1, 99)) is True
+    assert tracker.is_duplicate("d1", seq(1, 150)) is False
+    assert tracker.is_duplicate("d1", seq(1, 150)) is False
+    assert tracker._devices["d1"][0] == seq(2, 1)
+
+
+def row(device_id, ts_ms, n=0):
+    return {"device_id": device_id, "ts_ms": ts_ms, "n": n}
+
+
+def test_reorder_releases_each_device_in_timestamp_order():
+    buffer = ReorderBuffer(window_ms=2000)
+    ts = list(range(0, 20_000, 100))
+    rng = random.Random(1)
+    shuffled = sorted(ts, key=lambda t: t + rng.uniform(0, 1900))  # 창(2초) 안에서만 섞음
+    released = []
+    for t in shuffled:
+        released += buffer.push(row("d1", t), NOW_MS)
+        released += buffer.push(row("d2", 50_000 + t), NOW_MS)  # 다른 기기의 시각과는 무관
+    released += buffer.drain()
+    assert [r["ts_ms"] for r in released if r["device_id"] == "d1"] == ts
+    assert [r["ts_ms"] for r in released if r["device_id"] == "d2"] == [50_000 + t for t in ts]
+    assert buffer.late == 0
+
+
+def test_hold_until_the_window_passes_in_device_or_wall_time():
+    buffer = ReorderBuffer(window_ms=2000)
+    assert buffer.push(row("d1", 5000), NOW_MS) == []
+    assert buffer.push(row("d1", 4000, 1), NOW_MS) == []
+    assert buffer.push(row("d1", 4000, 2), NOW_MS) == []
+    # 최신 기기 시각이 창만큼 지나면 꺼냄; 같은 시각은 들어온 순서
+    assert [(r["ts_ms"], r["n"]) for r in buffer.push(row("d1", 6000), NOW_MS)] == [(4000, 1), (4000, 2)]
+    assert buffer.drain(NOW_MS + 1999) == []
+    assert [r["ts_ms"] for r in buffer.drain(NOW_MS + 2000)] == [5000, 6000]  # 실제 시간으로 창만큼 기다림
+
+
+def test_late_readings_pass_through():
+    buffer = ReorderBuffer(window_ms=1000)
+    buffer.push(row("d1", 1000), NOW_MS)
+    assert [r["ts_ms"] for r in buffer.push(row("d1", 3000), NOW_MS)] == [1000]
+    late = row("d1", 500)
+    assert buffer.push(late, NOW_MS) == [late]
+    assert buffer.push(row("d1", 1000, 1), NOW_MS)[0]["n"] == 1  # 이미 내보낸 시각과 같아도 늦은 것
+    assert buffer.late == 2
+    assert [r["ts_ms"] for r in buffer.drain()] == [3000]
@@ -0,0 +1,88 @@
+import collections
+import json
+import os
+import time
+
+import django
+import pytest
+
+from smartfarm import blockcodec, query
+from smartfarm.ingest import normalize
+from smartfarm.sensor_db import PartitionedStore, day_of, day_start_ms, init_db
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.test import Client  # noqa: E402  (Django 설정 뒤에 import)
+
+DAY_MS = 24 * 60 * 60 * 1000
+# 같은 ts_ms에 기기별로 3개씩: BLOCK_ROWS(4096)가 3의 배수가 아니라서 같은 시각의 행이 두 블록에 걸침
+PER_TS = 3
+ROWS_BEFORE = 4500  # 기기별로 경계 전날에 (압축하면 블록 2개)
+ROWS_AFTER = 600
+
+
+def reading(device_id, seq, ts_ms):
+    return normalize({"device_id": device_id, "seq": seq, "ts": ts_ms, "soil_raw": seq, "temp_air": 20.5}, ts_ms, [])
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    init_db(str(tmp_path / "farm.db"))
+    store = PartitionedStore(str(tmp_path / "farm.db"))
+    monkeypatch.setattr(query, "_store", store)
+    yield store
+    store.close()
+
+
+def fill(store):
+    """Rows with repeated timestamps on both sides of a day boundary; the older day compacted, plus late rows."""
+    boundary = day_start_ms(day_of(int(time.time() * 1000)) - 6)
+    first = boundary - ROWS_BEFORE // PER_TS * 1000
+    rows = [reading(device_id, i, first + i // PER_TS * 1000)
+            for device_id in ("a", "b") for i in range(ROWS_BEFORE + ROWS_AFTER)]
+    store.insert(rows)
+    assert store.compact(day_of(first)) == 2 * ROWS_BEFORE
+    alias = store.attach(day_of(first))
+    assert store.conn.execute(f"SELECT count FROM {alias}.sensor_blocks WHERE device_id = 'a'").fetchall() == \
+        [(blockcodec.BLOCK_ROWS,), (ROWS_BEFORE - blockcodec.BLOCK_ROWS,)]
+    # 압축 뒤에 늦게 온 행: 블록의 행과 같은 시각, 블록이 나뉘는 시각, 경계 바로 앞
+    late = [reading("a", 10_000 + i, ts) for i, ts in enumerate(
+        [first, first + blockcodec.BLOCK_ROWS // PER_TS * 1000, boundary - 1000, boundary - 1000])]
+    store.insert(late)
+    return boundary, [(r["ts_ms"], r["device_id"], r["seq"]) for r in rows + late]
+
+
+def pages(params):
+    client = Client(HTTP_HOST="127.0.0.1")
+    out, cursor, count = [], None, 0
+    while True:
+        response = client.get("/api/readings/", {**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = json.loads(b"".join(response.streaming_content))
+        assert page["fields"] == ["soil_raw", "temp_air"]
+        out += [(ts, device, soil_raw) for ts, device, soil_raw, _ in page["rows"]]
+        cursor, count = page["next_cursor"], count + 1
+        if cursor is None:
+            return out, count
+
+
+@pytest.mark.parametrize("limit", [250, 1000])
+def test_paging_with_equal_timestamps_has_no_duplicates_or_gaps(store, limit):
+    boundary, expected = fill(store)
+    params = {"start": boundary - 2 * DAY_MS, "end": boundary + DAY_MS, "fields": "soil_raw,temp_air", "limit": limit}
+    rows, count = pages(params)
+    assert count == -(-len(expected) // limit)
+    assert collections.Counter(rows) == collections.Counter(expected)
+    assert [r[0] for r in rows] == sorted(r[0] for r in expected)
+
+    # 기기 하나만
+    rows, _ = pages({**params, "device": "a"})
+    assert collections.Counter(rows) == collections.Counter(r for r in expected if r[1] == "a")
+
+
+@pytest.mark.parametrize("cursor", ["bad", "1.x", "1.-1", "1.2.3", ".", "١x"])
+def test_malformed_cursor_is_a_bad_request(store, cursor):
+    response = Client(HTTP_HOST="127.0.0.1").get("/api/readings/", {"cursor": cursor})
+    assert response.status_code == 400
+    assert "error" in response.json()
@@ -0,0 +1,77 @@
+from smartfarm import reply_cache
+from smartfarm.reply_cache import ReplyCache
+
+QUESTION = "몬스테라 잎이 노래져요 어떻게 해야 하나요"
+# 해시 버킷이 프로세스마다 달라서 유사도는 조금씩 흔들림: 비슷한 질문 약 0.95, 다른 증상 약 0.8, 다른 주제 약 0.4
+SIMILARITY = 0.9
+
+
+def test_same_question_after_normalization_hits():
+    cache = ReplyCache()
+    cache.put("몬스테라", "잎이 노래져요!", "물을 줄이세요.")
+    assert cache.get("몬스테라", "잎이  노래져요") == "물을 줄이세요."
+    assert cache.get("몬스테라 ", "잎이 노래져요！") == "물을 줄이세요."  # 전각 느낌표 (NFKC)
+    assert cache.get("몬스테라", "잎이 말라요") is None
+    assert cache.stats() == {"enabled": True, "entries": 1, "chars": 8, "hits": 2, "similar_hits": 0,
+                             "misses": 1, "hit_rate": 0.667}
+
+
+def test_near_duplicate_korean_question_hits():
+    cache = ReplyCache(similarity=SIMILARITY)
+    cache.put("몬스테라", QUESTION, "과습일 수 있어요.")
+    assert cache.get("몬스테라", "몬스테라 잎이 노래졌어요. 어떻게 해야 하나요?") == "과습일 수 있어요."
+    assert cache.stats()["similar_hits"] == 1 and cache.stats()["hits"] == 0
+
+
+def test_different_question_or_plant_misses():
+    cache = ReplyCache(similarity=SIMILARITY)
+    cache.put("몬스테라", QUESTION, "과습일 수 있어요.")
+    assert cache.get("몬스테라", "몬스테라 잎이 갈색으로 말라요 어떻게 해야 하나요") is None
+    assert cache.get("몬스테라", "물은 얼마나 자주 줘야 하나요") is None
+    assert cache.get("스투키", QUESTION) is None  # 같은 질문이어도 식물이 다르면 다른 답
+    assert cache.stats()["misses"] == 3
+
+    exact = ReplyCache()  # 유사도를 끄면 비슷한 질문도 빗나감
+    exact.put("몬스테라", QUESTION, "과습일 수 있어요.")
+    assert exact.get("몬스테라", "몬스테라 잎이 노래졌어요 어떻게 해야 하나요") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ReplyCache(max_entries=3)
+    for i in range(3):
+        cache.put("몬스테라", f"질문 {i}", f"답변 {i}")
+    assert cache.get("몬스테라", "질문 0") == "답변 0"  # 0을 쓰면 1이 가장 오래 안 쓴 것
+    cache.put("몬스테라", "질문 3", "답변 3")
+    assert cache.get("몬스테라", "질문 1") is None
+    assert [cache.get("몬스테라", f"질문 {i}") for i in (0, 2, 3)] == ["답변 0", "답변 2", "답변 3"]
+
+
+def test_total_reply_size_is_bounded():
+    cache = ReplyCache(max_chars=10)
+    cache.put("몬스테라", "a", "12345")
+    cache.put("몬스테라", "b", "12345")
+    cache.put("몬스테라", "c", "123")
+    assert cache.get("몬스테라", "a") is None and cache.stats()["chars"] == 8
+    cache.put("몬스테라", "b", "1")  # 같은 질문은 바꿔 씀
+    assert cache.stats()["chars"] == 4
+    cache.put("몬스테라", "d", "x" * 11)  # 한도보다 긴 답변은 넣지 않음
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(reply_cache.time, "monotonic", lambda: now[0])
+    cache = ReplyCache(ttl=60, similarity=SIMILARITY)
+    cache.put("몬스테라", QUESTION, "과습일 수 있어요.")
+    now[0] += 59
+    assert cache.get("몬스테라", QUESTION) == "과습일 수 있어요."
+    now[0] += 1
+    assert cache.get("몬스테라", QUESTION) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ReplyCache(enabled=False)
+    cache.put("몬스테라", QUESTION, "과습일 수 있어요.")
+    assert cache.get("몬스테라", QUESTION) is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["hit_rate"] is None
@@ -0,0 +1,146 @@
+import random
+import time
+
+import pytest
+
+from smartfarm import rollups
+from smartfarm.ingest import normalize
+from smartfarm.rollups import DAY_MS, HOUR_MS, MINUTE_MS
+from smartfarm.sensor_db import PartitionedStore, day_of, day_start_ms, init_db
+
+FIELDS = [field for field, _ in rollups.FIELDS]
+KST_MS = 9 * HOUR_MS
+
+
+def reading(device_id, seq, ts_ms, **fields):
+    return normalize({"device_id": device_id, "seq": seq, "ts": ts_ms, **fields}, ts_ms, [])
+
+
+def history(start_ms, devices=("a", "b"), count=400, seed=3):
+    """Readings every 37-ish minutes over about ten days, with missing fields."""
+    rng = random.Random(seed)
+    rows = []
+    for seq in range(count):
+        for n, device_id in enumerate(devices):
+            ts_ms = start_ms + seq * 37 * MINUTE_MS + rng.randrange(MINUTE_MS) + n
+            fields = {"temp_air": round(rng.uniform(5, 35), 1), "soil_pct": rng.randrange(100)}
+            if seq % 5:
+                fields["humidity"] = round(rng.uniform(30, 90), 1)
+            rows.append(reading(device_id, seq, ts_ms, **fields))
+    return rows
+
+
+def bucket_of(ts_ms, size_ms):
+    offset = rollups.TZ_OFFSET_MS if size_ms == DAY_MS else 0
+    return (ts_ms + offset) - (ts_ms + offset) % size_ms - offset
+
+
+def brute_force(rows, size_ms):
+    """{(device_id, field, bucket_ms): (count, sum, min, max)} aggregated in Python from the raw rows."""
+    values = {}
+    for r in rows:
+        for field in FIELDS:
+            if r.get(field) is not None:
+                values.setdefault((r["device_id"], field, bucket_of(r["ts_ms"], size_ms)), []).append(r[field])
+    return {key: (len(v), sum(v), min(v), max(v)) for key, v in values.items()}
+
+
+def stored(store, table):
+    rows = store.conn.execute(f"SELECT device_id, field, bucket_ms, count, sum, min, max FROM main.{table}")
+    return {tuple(r[:3]): tuple(r[3:]) for r in rows}
+
+
+def assert_matches_raw(store, rows):
+    for table, size_ms in rollups.LEVELS:
+        expected, actual = brute_force(rows, size_ms), stored(store, table)
+        assert actual.keys() == expected.keys(), table
+        for key, (count, total, low, high) in expected.items():
+            assert actual[key] == (count, pytest.approx(total), low, high), (table, key)
+
+
+@pytest.fixture
+def store(tmp_path):
+    init_db(str(tmp_path / "farm.db"))
+    store = PartitionedStore(str(tmp_path / "farm.db"))
+    yield store
+    store.close()
+
+
+def start_of_recent_day():
+    # 보존 기간 안에 들어오도록 며칠 전 자정
+    return day_start_ms(day_of(int(time.time() * 1000)) - 12)
+
+
+def test_rollups_match_a_brute_force_aggregation(store):
+    rows = history(start_of_recent_day())
+    shuffled = rows[:]
+    random.Random(4).shuffle(shuffled)  # 늦게 온 측정값이 섞인 배치
+    for i in range(0, len(shuffled), 50):
+        store.insert(shuffled[i:i + 50])
+    store.insert(shuffled[:30])  # 이미 저장된 (device_id, seq)는 다시 세지 않음
+    assert_matches_raw(store, rows)
+
+
+def test_late_sample_folds_into_its_old_bucket(store):
+    start = start_of_recent_day() + 5 * HOUR_MS
+    store.insert([reading("a", i, start + i * MINUTE_MS // 4, temp_air=20.0 + i) for i in range(8)])
+    store.insert([reading("a", 100 + i, start + 3 * HOUR_MS + i * MINUTE_MS, temp_air=25.0) for i in range(3)])
+    minutes = len(stored(store, "sensor_rollup_1m"))
+
+    # 세 시간 늦게 온, 첫 분의 새 최솟값과 두 번째 분의 새 최댓값
+    store.insert([reading("a", 50, start + 10_000, temp_air=-3.5), reading("a", 51, start + 70_000, temp_air=40.0)])
+    rollup = stored(store, "sensor_rollup_1m")
+    assert len(rollup) == minutes
+    assert rollup[("a", "temp_air", start)] == (5, 20 + 21 + 22 + 23 - 3.5, -3.5, 23.0)
+    assert rollup[("a", "temp_air", start + MINUTE_MS)] == (5, 24 + 25 + 26 + 27 + 40.0, 24.0, 40.0)
+    assert stored(store, "sensor_rollup_1h")[("a", "temp_air", start)] == (10, 224.5, -3.5, 40.0)
+
+
+def test_day_buckets_start_at_local_midnight(store, monkeypatch):
+    monkeypatch.setattr(rollups, "TZ_OFFSET_MS", KST_MS)
+    monkeypatch.setattr(rollups, "_statements", {})  # 캐시된 SQL에는 이전 오프셋이 들어 있음
+    midnight = start_of_recent_day()
+    assert midnight % DAY_MS == DAY_MS - KST_MS  # 로컬 자정은 UTC 15:00
+    rows = [reading("a", 0, midnight - 1, temp_air=10.0), reading("a", 1, midnight, temp_air=20.0),
+            reading("a", 2, midnight + DAY_MS - 1, temp_air=30.0)]
+    store.insert(rows)
+    days = stored(store, "sensor_rollup_1d")
+    assert days == {("a", "temp_air", midnight - DAY_MS): (1, 10.0, 10.0, 10.0),
+                    ("a", "temp_air", midnight): (2, 50.0, 20.0, 30.0)}
+    # 분/시간 버킷은 시간대와 무관
+    assert ("a", "temp_air", midnight - HOUR_MS) in stored(store, "sensor_rollup_1h")
+    assert_matches_raw(store, rows)
+
+    more = history(midnight - 3 * DAY_MS, count=300)
+    store.insert(more)
+    assert_matches_raw(store, rows + more)
+
+
+def test_pick_level_boundaries():
+    assert rollups.pick_level(0) is None
+    assert rollups.pick_level(MINUTE_MS - 1) is None
+    assert rollups.pick_level(MINUTE_MS) == ("sensor_rollup_1m", MINUTE_MS)
+    assert rollups.pick_level(HOUR_MS - 1) == ("sensor_rollup_1m", MINUTE_MS)
+    assert rollups.pick_level(HOUR_MS) == ("sensor_rollup_1h", HOUR_MS)
+    assert rollups.pick_level(DAY_MS - 1) == ("sensor_rollup_1h", HOUR_MS)
+    assert rollups.pick_level(DAY_MS) == ("sensor_rollup_1d", DAY_MS)
+    assert rollups.pick_level(30 * DAY_MS) == ("sensor_rollup_1d", DAY_MS)
+
+
+def test_query_series_returns_the_buckets_overlapping_the_range(store):
+    start = start_of_recent_day()
+    store.insert([reading("a", h, start + h * HOUR_MS + 60_000, temp_air=float(h)) for h in range(6)])
+
+    def hours(start_ms, end_ms):
+        return [(b - start) // HOUR_MS for b, *_ in rollups.query_series(store, "a", "temp_air", start_ms,
+                                                                           end_ms, HOUR_MS)]
+
+    # bucket_ms > start_ms - size_ms: 범위 시작을 걸친 버킷은 포함, 시작 바로 앞에서 끝나는 버킷은 제외
+    assert hours(start + 2 * HOUR_MS, start + 4 * HOUR_MS) == [2, 3]
+    assert hours(start + 2 * HOUR_MS - 1, start + 4 * HOUR_MS) == [1, 2, 3]
+    assert hours(start + 2 * HOUR_MS + 1, start + 4 * HOUR_MS + 1) == [2, 3, 4]
+    [(bucket, avg, low, high, count)] = rollups.query_series(store, "a", "temp_air", start + 5 * HOUR_MS,
+                                                             start + 6 * HOUR_MS, HOUR_MS)
+    assert (bucket, avg, low, high, count) == (start + 5 * HOUR_MS, 5.0, 5.0, 5.0, 1)
+    # 1분보다 세밀하면 원본 측정값
+    assert rollups.query_series(store, "a", "temp_air", start, start + HOUR_MS) == [(start + 60_000, 0.0, 0.0, 0.0, 1)]
@@ -0,0 +1,105 @@
+import math
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from smartfarm import rules
+from smartfarm.ingest import normalize
+from smartfarm.sensor_db import PartitionedStore, SqliteSink
+
+MINUTE_MS = rules.MINUTE_MS
+HOUR_MS = rules.HOUR_MS
+# 작동 시간 한도 구간(1시간)의 시작에 맞춘 몇 시간 전 시각
+BASE_MS = (int(time.time() * 1000) // HOUR_MS - 4) * HOUR_MS
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WATERING = rules.Rule("watering", "soil_pct", on=30, off=45, on_cmd="water", pulse_ms=3000,
+                      min_interval_ms=5 * MINUTE_MS, max_on_ms=15000, window_ms=HOUR_MS)
+LIGHTING = rules.Rule("lighting", "light_pct", on=20, off=40, on_cmd="light", off_cmd="light_off",
+                      min_interval_ms=5 * MINUTE_MS, max_on_ms=2 * HOUR_MS, window_ms=24 * HOUR_MS)
+
+
+def run(rule, values, step_ms=MINUTE_MS, field=None):
+    """(minute, cmd) of the commands for one reading per step_ms with these values."""
+    engine = rules.RuleEngine((rule,))
+    out = []
+    for i, value in enumerate(values):
+        for command in engine.evaluate({"ts_ms": BASE_MS + i * step_ms, "device_id": "d1", rule.field: value}):
+            out.append((i * step_ms // MINUTE_MS, command["cmd"]))
+    return out
+
+
+def test_watering_repeats_inside_the_hysteresis_band():
+    # 30 이하에서 시작, 45를 넘을 때까지 5분마다 반복; 다시 35가 되어도 30 이하가 될 때까지는 주지 않음
+    values = [25] + [35] * 10 + [50] + [35] * 10 + [28]
+    assert run(WATERING, values) == [(0, "water"), (5, "water"), (10, "water"), (22, "water")]
+
+
+def test_min_interval_spaces_commands():
+    assert run(WATERING, [20] * 12) == [(0, "water"), (5, "water"), (10, "water")]
+
+
+def test_duty_limit_per_window():
+    # 1시간에 15초 = 3초 물주기 5번; 다음 구간(60분)부터 다시
+    commands = run(WATERING, [20] * 80)
+    assert [m for m, _ in commands] == [0, 5, 10, 15, 20, 60, 65, 70, 75]
+
+
+def test_lighting_turns_off_when_on_time_is_used_up():
+    # 계속 어두우면 2시간 뒤 한도 때문에 끄고, 그날 구간이 끝날 때까지 다시 켜지 않음
+    commands = run(LIGHTING, [10] * 180)
+    assert commands == [(0, "light"), (120, "light_off")]
+    assert run(LIGHTING, [10, 10, 50, 50, 50, 50, 50, 50, 10]) == [(0, "light"), (5, "light_off")]
+
+
+def test_late_reading_is_ignored():
+    engine = rules.RuleEngine((WATERING,))
+    assert engine.evaluate({"ts_ms": BASE_MS, "device_id": "d1", "soil_pct": 50}) == []
+    assert engine.evaluate({"ts_ms": BASE_MS - 1000, "device_id": "d1", "soil_pct": 10}) == []
+    assert engine.stats()["out_of_order"] == 1
+
+
+def history(hours=4, devices=("a", "b")):
+    """One normalized reading per minute per device, soil drying and refilled, light following the day."""
+    rows = []
+    for i in range(hours * 60):
+        for n, device_id in enumerate(devices):
+            soil = 55 - (i + 17 * n) % 50
+            light = 50 + 45 * math.sin((i + 40 * n) / 30)
+            payload = {"device_id": device_id, "seq": i, "ts": BASE_MS + i * MINUTE_MS + n,
+                       "soil_pct": soil, "light_pct": round(light)}
+            rows.append(normalize(payload, payload["ts"], []))
+    return rows
+
+
+def test_replay_of_stored_history_matches_the_live_engine(tmp_path):
+    rows = history()
+    live = []
+    engine = rules.RuleEngine(on_command=live.append)
+    for i in range(0, len(rows), 7):
+        engine(rows[i:i + 7])  # Ingestor listener처럼 배치로
+    assert {c["cmd"] for c in live} == {"water", "light", "light_off"}
+
+    db_file = str(tmp_path / "farm.db")
+    sink = SqliteSink(db_file)
+    sink.write(rows)
+    sink.close()
+    store = PartitionedStore(db_file)
+    try:
+        stored = list(rules.stored_rows(store, BASE_MS, BASE_MS + 4 * HOUR_MS))
+        assert len(stored) == len(rows)
+        assert rules.replay(stored) == live
+        assert rules.replay(rules.stored_rows(store, BASE_MS, BASE_MS + 4 * HOUR_MS, "b")) == \
+            [c for c in live if c["device_id"] == "b"]
+    finally:
+        store.close()
+
+    def iso(ts_ms):
+        return datetime.fromtimestamp(ts_ms / 1000).isoformat()
+
+    out = subprocess.run([sys.executable, os.path.join(REPO, "replay_rules.py"), "--db", db_file, "--quiet",
+                          "--start", iso(BASE_MS), "--end", iso(BASE_MS + 4 * HOUR_MS)],
+                         cwd=tmp_path, capture_output=True, text=True, check=True).stdout
+    assert f"{len(rows)} readings" in out and f"{len(live)} commands" in out
@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from smartfarm import rollups, sensor_db
+from smartfarm.ingest import normalize
+from smartfarm.sensor_db import PartitionedStore, day_label, day_of, day_start_ms, init_db
+
+HOUR_MS = rollups.HOUR_MS
+TODAY = day_of(int(time.time() * 1000))
+
+
+def readings(days, per_day=24, device_id="d1"):
+    """One reading per hour (by default) on each of `days`, soil_raw = running number."""
+    rows = []
+    for day in days:
+        for h in range(per_day):
+            ts_ms = day_start_ms(day) + h * HOUR_MS
+            n = len(rows)
+            rows.append(normalize({"device_id": device_id, "seq": n, "ts": ts_ms, "temp_air": 20 + h / 10,
+                                   "soil_raw": n}, ts_ms, []))
+    return rows
+
+
+def open_store(tmp_path, **kwargs):
+    path = str(tmp_path / "farm.db")
+    init_db(path)
+    return PartitionedStore(path, **kwargs)
+
+
+def attached(store):
+    return [name for _, name, _ in store.conn.execute("PRAGMA database_list") if name not in ("main", "temp")]
+
+
+def test_expire_unlinks_partitions_past_retention(tmp_path):
+    store = open_store(tmp_path, retention_days=3)
+    try:
+        days = range(TODAY - 6, TODAY + 1)
+        store.insert(readings(days))
+        assert store.days() == list(days)
+        store.attach(TODAY - 6)
+        files = os.listdir(store.partition_dir)
+        assert f"sensor_{day_label(TODAY - 6)}.db-wal" in files  # WAL 파일도 같이 지워야 함
+
+        now_ms = int(time.time() * 1000)
+        assert store.expire(now_ms) == [day_label(d) for d in (TODAY - 6, TODAY - 5, TODAY - 4)]
+        assert store.days() == list(range(TODAY - 3, TODAY + 1))
+        assert not [f for f in os.listdir(store.partition_dir) if day_label(TODAY - 6) in f]
+        assert f"p{day_label(TODAY - 6)}" not in attached(store)
+        assert store.expire(now_ms) == []
+
+        # 원시 데이터가 없어도 롤업은 남음
+        ts, _ = store.raw_series("d1", "temp_air", day_start_ms(TODAY - 6), day_start_ms(TODAY - 3))
+        assert len(ts) == 0
+        series = rollups.query_series(store, "d1", "temp_air", day_start_ms(TODAY - 6), day_start_ms(TODAY - 3),
+                                      rollups.DAY_MS)
+        assert [count for *_, count in series] == [24, 24, 24]
+    finally:
+        store.close()
+
+
+def test_queries_over_more_days_than_can_be_attached(tmp_path):
+    store = open_store(tmp_path)
+    assert store.max_attached == sensor_db.MAX_ATTACHED == 8
+    try:
+        days = range(TODAY - 11, TODAY + 1)
+        rows = readings(days)
+        store.insert(rows)  # 한 번에 8일씩 묶어서 씀
+        assert len(attached(store)) == 8
+        assert store.days() == list(days)
+
+        start, end = day_start_ms(TODAY - 11), day_start_ms(TODAY + 1)
+        for _ in range(2):
+            ts, values = store.raw_series("d1", "soil_raw", start, end)
+            assert ts.tolist() == [r["ts_ms"] for r in rows]
+            assert values.tolist() == list(range(len(rows)))
+            assert len(attached(store)) == 8
+        # 가장 최근에 쓴 8일이 붙어 있음 (LRU)
+        assert sorted(attached(store)) == [f"p{day_label(d)}" for d in days[-8:]]
+        store.attach(TODAY - 11)  # 가장 오래 안 쓴 날을 뗌
+        assert sorted(attached(store)) == [f"p{day_label(d)}" for d in [TODAY - 11] + list(days[-7:])]
+
+        # 압축된 날과 섞여 있어도 같음
+        assert store.compact(TODAY - 10) == 24
+        assert store.raw_series("d1", "soil_raw", start, end)[1].tolist() == list(range(len(rows)))
+    finally:
+        store.close()
+
+
+def legacy_db(path, days):
+    """The original single-table schema from connect.py.py with local-time strings."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        '''
+        CREATE TABLE sensor_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME,
+            temp_air REAL,
+            humidity REAL,
+            temp_water REAL,
+            soil_moisture INTEGER,
+            cds1 INTEGER
+        )
+        '''
+    )
+    expected = []
+    for day in days:
+        for h in (0, 6, 23):
+            ts_ms = day_start_ms(day) + h * HOUR_MS
+            stamp = datetime.fromtimestamp(ts_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+            conn.execute("INSERT INTO sensor_logs (timestamp, temp_air, humidity, temp_water, soil_moisture, cds1) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (stamp, 20.0 + h, 50.0, 18.5, 40, 1800 + h))
+            expected.append((ts_ms, 20.0 + h))
+    conn.commit()
+    conn.close()
+    return expected
+
+
+def test_legacy_table_is_moved_into_partitions(tmp_path):
+    path = str(tmp_path / "farm.db")
+    days = range(TODAY - 9, TODAY + 1)
+    expected = legacy_db(path, days)
+
+    init_db(path)
+    conn = sqlite3.connect(path)
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    assert "sensor_logs" not in tables
+    assert {table for table, _ in rollups.LEVELS} <= tables
+
+    store = PartitionedStore(path)
+    try:
+        assert store.days() == list(days)
+        start, end = day_start_ms(TODAY - 9), day_start_ms(TODAY + 1)
+        ts, values = store.raw_series("default", "temp_air", start, end)
+        assert list(zip(ts.tolist(), values.tolist())) == expected
+        [(count, total)] = store.conn.execute(
+            "SELECT SUM(count), SUM(sum) FROM sensor_rollup_1d WHERE device_id = 'default' AND field = 'cds_raw'"
+        ).fetchall()
+        assert (count, total) == (3 * len(days), (1800 + 1806 + 1823) * len(days))
+    finally:
+        store.close()
+
+    init_db(path)  # 두 번째는 아무것도 하지 않음
+    store = PartitionedStore(path)
+    assert store.days() == list(days)
+    store.close()
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import server_async
+from smartfarm.ingest import build_ingestor
+
+
+class SlowIngestor:
+    """Ingestor that blocks like a stalled spool write."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def ingest(self, data, source="http", recv_ms=None):
+        time.sleep(self.delay)
+        return {"device_id": "d1"}
+
+
+async def request(port, raw):
+    r, w = await asyncio.open_connection("127.0.0.1", port)
+    w.write(raw)
+    await w.drain()
+    head = await r.readuntil(b"\r\n\r\n")
+    length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+    body = json.loads(await r.readexactly(length))
+    w.close()
+    return int(head.split(b" ")[1]), body
+
+
+def post(body, content_length=None):
+    length = len(body) if content_length is None else content_length
+    return (f"POST /log HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\nConnection: close\r\n\r\n"
+            .encode() + body)
+
+
+def run_server(ingestor, scenario):
+    async def main():
+        server_obj = server_async.IngestServer(ingestor)
+        server = await asyncio.start_server(server_obj.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.wait_for(scenario(port), 10)
+        finally:
+            server.close()
+            server_obj.executor.shutdown(wait=True)
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    ingestor = build_ingestor(db_file=str(tmp_path / "farm.db"), store_dir=str(tmp_path / "store"),
+                              spool_dir=str(tmp_path / "spool"))
+    yield ingestor
+    ingestor.close()
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-1", "1.5"])
+def test_malformed_content_length_is_400(ingestor, content_length):
+    async def scenario(port):
+        return await request(port, post(b"{}", content_length))
+
+    assert run_server(ingestor, scenario) == (400, {"status": "error", "reason": "bad_content_length"})
+
+
+def test_valid_request_after_bad_one(ingestor):
+    async def scenario(port):
+        await request(port, post(b"{}", "abc"))
+        return await request(port, post(json.dumps({"device_id": "d1", "soil_pct": 40}).encode()))
+
+    assert run_server(ingestor, scenario) == (200, {"status": "ok"})
+
+
+def test_ingest_does_not_block_the_event_loop():
+    async def scenario(port):
+        loop_ticks = 0
+        stop = threading.Event()
+
+        async def ticker():
+            nonlocal loop_ticks
+            while not stop.is_set():
+                loop_ticks += 1
+                await asyncio.sleep(0.01)
+
+        tick = asyncio.ensure_future(ticker())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request(port, post(b'{"device_id": "d1"}')) for _ in range(4)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await tick
+        return results, elapsed, loop_ticks
+
+    results, elapsed, loop_ticks = run_server(SlowIngestor(0.3), scenario)
+    assert all(status == 200 for status, _ in results)
+    assert elapsed < 0.9          # 4개가 스레드에서 동시에 처리됨 (루프에서 차례로 하면 1.2초)
+    assert loop_ticks >= 15       # 그동안 이벤트 루프는 계속 돌았음
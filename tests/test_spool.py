@@ -0,0 +1,109 @@
+import json
+import sqlite3
+
+from smartfarm.spool import Replayer, Spool, is_transient
+
+
+class FlakySink:
+    """Rejects rows with "bad" for good; fails with `transient` errors that many times first."""
+
+    def __init__(self, transient=0):
+        self.rows = []
+        self.transient = transient
+
+    def write(self, rows):
+        if self.transient:
+            self.transient -= 1
+            raise sqlite3.OperationalError("database is locked")
+        if any(r.get("bad") for r in rows):
+            raise OverflowError("Python int too large to convert to C long")
+        self.rows.extend(rows)
+
+    def close(self):
+        pass
+
+
+def make_replayer(tmp_path, sink):
+    spool = Spool(str(tmp_path / "spool"))
+    return spool, Replayer(spool, sink, "sink", max_rows=100, interval=3600)
+
+
+def test_rejected_rows_are_dead_lettered_and_skipped(tmp_path):
+    sink = FlakySink()
+    spool, replayer = make_replayer(tmp_path, sink)
+    try:
+        spool.append([{"n": 1}, {"n": 2}])
+        spool.append([{"n": 3}, {"n": 4, "bad": True}, {"n": 5}])
+        spool.append([{"n": 6}])
+        assert replayer.drain_once() == 6
+        assert replayer.drain_once() == 0  # 같은 배치를 다시 시도하지 않음
+        assert [r["n"] for r in sink.rows] == [1, 2, 3, 5, 6]
+        assert replayer.dead_rows == 1
+        with open(tmp_path / "spool" / "sink.dead", encoding="utf-8") as f:
+            dead = [json.loads(line) for line in f]
+        assert [d["row"]["n"] for d in dead] == [4]
+        assert dead[0]["error"].startswith("OverflowError")
+    finally:
+        replayer.close()
+        spool.close()
+
+
+def test_transient_errors_are_retried(tmp_path):
+    sink = FlakySink(transient=2)
+    spool, replayer = make_replayer(tmp_path, sink)
+    try:
+        spool.append([{"n": 1}, {"n": 2}])
+        assert replayer.drain_once() is None
+        assert replayer.drain_once() is None
+        assert replayer.drain_once() == 2
+        assert [r["n"] for r in sink.rows] == [1, 2]
+        assert replayer.dead_rows == 0
+    finally:
+        replayer.close()
+        spool.close()
+
+
+def test_checkpoint_moves_past_rejected_rows_across_restarts(tmp_path):
+    sink = FlakySink()
+    spool, replayer = make_replayer(tmp_path, sink)
+    spool.append([{"n": 1, "bad": True}])
+    replayer.drain_once()
+    replayer.close()
+    spool.close()
+
+    spool, replayer = make_replayer(tmp_path, FlakySink())
+    try:
+        spool.append([{"n": 2}])
+        assert replayer.drain_once() == 1
+        assert [r["n"] for r in replayer.sink.rows] == [2]
+    finally:
+        replayer.close()
+        spool.close()
+
+
+def test_is_transient():
+    assert is_transient(sqlite3.OperationalError("database is locked"))
+    assert is_transient(OSError(28, "No space left on device"))
+    assert is_transient(sqlite3.OperationalError("database table is locked"))
+    assert is_transient(sqlite3.OperationalError("disk I/O error"))
+    assert is_transient(sqlite3.OperationalError("database or disk is full"))
+    assert not is_transient(sqlite3.OperationalError("no such column: foo"))
+    assert not is_transient(sqlite3.OperationalError("database disk image is malformed"))
+    assert not is_transient(sqlite3.OperationalError("unable to open database file"))
+    assert not is_transient(OverflowError())
+
+
+def test_malformed_database_is_not_retried_forever(tmp_path):
+    class MalformedSink(FlakySink):
+        def write(self, rows):
+            raise sqlite3.OperationalError("database disk image is malformed")
+
+    spool, replayer = make_replayer(tmp_path, MalformedSink())
+    try:
+        spool.append([{"n": 1}, {"n": 2}])
+        assert replayer.drain_once() == 2
+        assert replayer.drain_once() == 0
+        assert replayer.dead_rows == 2
+    finally:
+        replayer.close()
+        spool.close()
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+import django
+
+from smartfarm import watchdog
+from smartfarm.latest import SnapshotReader
+from smartfarm.watchdog import Watchdog, timeout_ms
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.test import Client  # noqa: E402  (Django 설정 뒤에 import)
+
+from smartfarm.views import resources  # noqa: E402
+
+SECOND_MS = 1000
+BASE_MS = 1_790_000_000_000
+
+
+def seen(dog, device_id, *seconds):
+    for s in seconds:
+        dog([{"device_id": device_id, "recv_ms": BASE_MS + s * SECOND_MS}])
+
+
+def test_timeout_follows_the_learned_interval():
+    dog = Watchdog()
+    seen(dog, "d1", 0)
+    assert dog.devices(BASE_MS)["d1"]["timeout_ms"] == timeout_ms(None) == 3 * watchdog.DEFAULT_INTERVAL_MS
+    seen(dog, "d1", 20)
+    assert dog.devices(BASE_MS)["d1"]["interval_ms"] == 20_000
+    seen(dog, "d1", 50)  # EWMA: 20 s + 0.2 * (30 s - 20 s)
+    entry = dog.devices(BASE_MS)["d1"]
+    assert entry["interval_ms"] == 22_000 and entry["timeout_ms"] == 66_000
+    seen(dog, "d1", 51)  # 짧은 간격이어도 STALE_MIN_MS 아래로는 내려가지 않음
+    assert timeout_ms(1000) == watchdog.STALE_MIN_MS
+
+
+def test_device_goes_offline_after_its_deadline():
+    events = []
+    dog = Watchdog(on_change=events.append)
+    seen(dog, "d1", 0, 20)
+    deadline = BASE_MS + 20 * SECOND_MS + 60_000
+    assert dog.check(deadline) == deadline  # 아직 (마감 시각은 포함)
+    assert events == []
+    assert dog.check(deadline + 1) is None
+    assert [(e["device_id"], e["state"], e["gap_ms"]) for e in events] == [("d1", "offline", 60_001)]
+    assert dog.devices(deadline + 1)["d1"]["online"] is False
+    assert dog.stats() == {"online": 0, "offline": 1, "heap": 0, "went_offline": 1, "came_back": 0}
+
+
+def test_device_comes_back_without_learning_the_outage_gap():
+    events = []
+    dog = Watchdog(on_change=events.append)
+    seen(dog, "d1", 0, 20)
+    dog.check(BASE_MS + 200 * SECOND_MS)
+    seen(dog, "d1", 600)
+    assert [e["state"] for e in events] == ["offline", "online"]
+    assert events[1]["gap_ms"] == 580_000
+    entry = dog.devices(BASE_MS + 600 * SECOND_MS)["d1"]
+    assert entry["online"] and entry["since_ms"] == BASE_MS + 600 * SECOND_MS
+    assert entry["interval_ms"] == 20_000  # 끊긴 동안의 간격은 평소 간격에 넣지 않음
+    assert dog.check(BASE_MS + 600 * SECOND_MS + 60_000) == BASE_MS + 600 * SECOND_MS + 60_000
+
+
+def test_heap_entries_are_reused_and_stale_ones_skipped():
+    events = []
+    dog = Watchdog(on_change=events.append)
+    seen(dog, "d1", *range(0, 300, 30))
+    # 측정값마다 새 항목을 넣지 않음: 마감 시각이 앞당겨질 때만 (두 번째 측정값에서 간격을 처음 알게 됨)
+    assert dog.stats()["heap"] == 2
+    # 첫 항목의 마감 시각(0 s + 180 s)이 지나도 그 뒤에 측정값이 있으면 다시 넣을 뿐 offline이 아님
+    assert dog.check(BASE_MS + 200 * SECOND_MS) == BASE_MS + 270 * SECOND_MS + 90_000
+    assert events == [] and dog.stats()["heap"] == 1
+    # 간격이 줄면 더 이른 마감 시각으로 하나 더 넣고, 늦은 항목은 꺼낼 때 무시
+    seen(dog, "d1", 271, 272, 273)
+    assert dog.check(BASE_MS + 273 * SECOND_MS + timeout_ms(dog.devices(0)["d1"]["interval_ms"]) + 1) is None
+    assert [e["state"] for e in events] == ["offline"]
+    assert dog.check(BASE_MS + 10_000 * SECOND_MS) is None and len(events) == 1
+
+
+def test_liveness_is_published_and_reloaded(tmp_path):
+    path = str(tmp_path / "liveness" / "http.json")
+    dog = Watchdog(path)
+    seen(dog, "d1", 0, 20)
+    seen(dog, "d2", 0)
+    dog.close()
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"d1", "d2"}
+
+    # 프로세스가 꺼져 있는 동안 멈춘 기기도 다시 시작하면 알아챔
+    events = []
+    restarted = Watchdog(path, on_change=events.append)
+    assert restarted.check(BASE_MS + 10 * 60 * SECOND_MS) is None
+    assert sorted(e["device_id"] for e in events) == ["d1", "d2"]
+    restarted.close()
+
+
+def test_devices_api_reads_the_published_index(tmp_path, monkeypatch):
+    now_ms = int(time.time() * 1000)
+    dog = Watchdog(str(tmp_path / "mqtt.json"))
+    dog([{"device_id": "up", "recv_ms": now_ms - 20_000}, {"device_id": "down", "recv_ms": now_ms - 400_000}])
+    dog([{"device_id": "up", "recv_ms": now_ms - 1000}])
+    dog.close()
+    monkeypatch.setattr(resources, "liveness_reader", lambda: SnapshotReader(str(tmp_path)))
+
+    data = Client(HTTP_HOST="127.0.0.1").get("/api/devices/").json()
+    assert (data["online"], data["offline"]) == (1, 1)
+    up, down = data["devices"]["up"], data["devices"]["down"]
+    assert up["online"] and up["interval_ms"] == 19_000 and up["timeout_ms"] == 57_000
+    assert not down["online"] and down["last_seen_ms"] == now_ms - 400_000